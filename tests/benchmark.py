@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Benchmarks for the CLI operations, running against a local mock of the jobs API.
+
+Results are written as JSON, and can be compared with the results of a previous run:
+
+  $ tests/benchmark.py --output new.json --compare old.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+import yaml
+from toolforge_weld.api_client import ToolforgeClient
+from toolforge_weld.kubernetes_config import fake_kube_config
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_jobs_api import MockJobsApi, make_job  # noqa: E402
+from tjf_cli import cli  # noqa: E402
+from tjf_cli.api import handle_http_exception  # noqa: E402
+from tjf_cli.loader import JobSelector  # noqa: E402
+
+LOGGER = logging.getLogger("benchmark")
+
+JOB_COUNTS = [10, 100, 1000]
+
+
+@dataclass
+class Result:
+    name: str
+    runs: int
+    min: float
+    median: float
+    mean: float
+    max: float
+    requests: float
+    throughput: Optional[float] = None
+
+
+def make_client(server: MockJobsApi) -> ToolforgeClient:
+    client = ToolforgeClient(
+        server=server.url,
+        user_agent="benchmark",
+        kubeconfig=fake_kube_config(),
+        exception_handler=handle_http_exception,
+    )
+    # the fake kubeconfig points to client certificates that don't exist
+    client.session.cert = None
+    return client
+
+
+def make_jobs(count: int) -> List[Dict]:
+    return [make_job(f"job-{i}", continuous=True) for i in range(count)]
+
+
+def write_jobs_file(directory: str, count: int, suffix: str = "") -> str:
+    path = os.path.join(directory, f"jobs-{count}{suffix}.yaml")
+    jobs = [
+        {"name": f"job-{i}", "command": f"./job-{i}.sh{suffix}", "image": "bullseye"}
+        for i in range(count)
+    ]
+    for job in jobs:
+        job["continuous"] = True
+    with open(path, "w") as f:
+        yaml.safe_dump(jobs, f)
+    return path
+
+
+def measure(
+    name: str,
+    server: MockJobsApi,
+    func: Callable[[], Optional[int]],
+    runs: int,
+    setup: Optional[Callable[[], None]] = None,
+) -> Result:
+    durations = []
+    requests = []
+    items = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        server.requests = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            count = func()
+            durations.append(time.perf_counter() - start)
+        requests.append(server.requests)
+        if count:
+            items.append(count / durations[-1])
+
+    result = Result(
+        name=name,
+        runs=runs,
+        min=min(durations),
+        median=statistics.median(durations),
+        mean=statistics.mean(durations),
+        max=max(durations),
+        requests=statistics.mean(requests),
+        throughput=statistics.mean(items) if items else None,
+    )
+    LOGGER.info(
+        f"{name}: median {result.median * 1000:.2f}ms, {result.requests:.0f} request(s)"
+        + (f", {result.throughput:.0f} items/s" if result.throughput else "")
+    )
+    return result
+
+
+def run_benchmarks(server: MockJobsApi, runs: int, job_counts: List[int]) -> List[Result]:
+    api = make_client(server)
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        # keep the snapshots and cache entries saved by each load out of the user directories
+        os.environ["XDG_STATE_HOME"] = os.path.join(directory, "state")
+        os.environ["XDG_CACHE_HOME"] = os.path.join(directory, "cache")
+
+        for count in job_counts:
+            jobs = make_jobs(count)
+
+            def setup_jobs(jobs=jobs):
+                server.reset([dict(job) for job in jobs])
+
+            for mode in cli.ListDisplayMode:
+                results.append(
+                    measure(
+                        f"list-{mode}-{count}",
+                        server,
+                        lambda mode=mode: cli.op_list(api, mode),
+                        runs,
+                        setup_jobs,
+                    )
+                )
+
+            results.append(
+                measure(
+                    f"show-{count}", server, lambda: cli.op_show(api, ["job-0"]), runs, setup_jobs
+                )
+            )
+
+            same_file = write_jobs_file(directory, count)
+            changed_file = write_jobs_file(directory, count, suffix="-v2")
+
+            results.append(
+                measure(
+                    f"load-add-{count}",
+                    server,
+                    lambda: cli.op_load(api, same_file, JobSelector()),
+                    runs,
+                    lambda: server.reset(),
+                )
+            )
+            results.append(
+                measure(
+                    f"load-noop-{count}",
+                    server,
+                    lambda: cli.op_load(api, same_file, JobSelector()),
+                    runs,
+                    setup_jobs,
+                )
+            )
+            results.append(
+                measure(
+                    f"load-modify-{count}",
+                    server,
+                    lambda: cli.op_load(api, changed_file, JobSelector()),
+                    runs,
+                    setup_jobs,
+                )
+            )
+            results.append(
+                measure(
+                    f"load-single-job-{count}",
+                    server,
+                    lambda: cli.op_load(api, changed_file, JobSelector(patterns=["job-0"])),
+                    runs,
+                    setup_jobs,
+                )
+            )
+
+        def run_and_wait():
+            cli.op_run(
+                api=api,
+                name="waited-job",
+                command="./waited.sh",
+                schedule=None,
+                continuous=False,
+                image="bullseye",
+                wait=True,
+                no_filelog=False,
+                filelog_stdout=None,
+                filelog_stderr=None,
+                mem=None,
+                cpu=None,
+                retry=0,
+                emails="none",
+            )
+
+        results.append(measure("run-wait", server, run_and_wait, runs, lambda: server.reset()))
+
+        def follow_logs():
+            cli.op_logs(api, "job-0", follow=True, last=None)
+            return server.log_lines
+
+        results.append(
+            measure(
+                f"logs-follow-{server.log_lines}",
+                server,
+                follow_logs,
+                runs,
+                lambda: server.reset(make_jobs(1)),
+            )
+        )
+
+    return results
+
+
+def compare(results: List[Result], previous_file: str, threshold: float) -> bool:
+    with open(previous_file) as f:
+        previous = {result["name"]: result for result in json.load(f)["results"]}
+
+    regressions = False
+    for result in results:
+        old = previous.get(result.name, None)
+        if old is None:
+            continue
+
+        change = (result.median - old["median"]) / old["median"] if old["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = " REGRESSION"
+            regressions = True
+        LOGGER.info(
+            f"{result.name}: {old['median'] * 1000:.2f}ms -> {result.median * 1000:.2f}ms "
+            f"({change:+.1%}){flag}"
+        )
+
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the CLI against a mock jobs API")
+    parser.add_argument("--runs", type=int, default=5, help="runs per benchmark")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds to delay each API request"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        nargs="+",
+        default=JOB_COUNTS,
+        help="job counts to benchmark with (default: %(default)s)",
+    )
+    parser.add_argument("--log-lines", type=int, default=10000, help="log lines for logs -f")
+    parser.add_argument("--output", required=False, help="write the results to this JSON file")
+    parser.add_argument("--compare", required=False, help="compare with a previous JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slowdown reported as a regression (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--exit-code-fail", action="store_true", help="report regressions in the exit code"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(format="%(message)s", level=logging.INFO, stream=sys.stderr)
+
+    # only show warnings from the CLI itself, to not slow down the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    LOGGER.setLevel(logging.INFO)
+    cli.WAIT_SLEEP = 0.01
+
+    with MockJobsApi(latency=args.latency, log_lines=args.log_lines, complete_after=0.05) as srv:
+        results = run_benchmarks(srv, args.runs, args.jobs)
+
+    data = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "latency": args.latency,
+        "runs": args.runs,
+        "results": [asdict(result) for result in results],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+
+    regressions = False
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+
+    sys.exit(1 if regressions and args.exit_code_fail else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,21 +26,46 @@
 #        retcode: 0
 #        stdout: "expected stdout from cmd2"
 #        stderr: "expected stderr from cmd2"
+#      # run cmd3 until it succeeds (with backoff), failing after 'timeout' seconds
+#      - wait_until: cmd3
+#        retcode: 0
+#        timeout: 60
+#  - name: "this test can run at the same time as other tests in other groups"
+#    group: "mygroup"
+#    envvars:
+#      - MYVAR: "value only used by this test"
+#    tests:
+#      - cmd: cmd4
+#
+# Consecutive tests with a 'group' are run concurrently with each other, except for tests in the
+# same group, which run one after the other. 'envvars' in a test only apply to that test, which
+# can be used to give each group its own job names.
 #
 
 import os
+import re
 import socket
+import time
 import platform
 import sys
 import argparse
 import subprocess
 import yaml
 import logging
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from enum import Enum, auto
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pathlib import Path
 
+# for wait_until: default timeout, and backoff between attempts
+WAIT_UNTIL_TIMEOUT = 120
+WAIT_UNTIL_INITIAL_SLEEP = 0.5
+WAIT_UNTIL_MAX_SLEEP = 5
+WAIT_UNTIL_BACKOFF = 1.5
+
+ENVVAR_REGEX = re.compile(r"\$(\w+|\{[^}]*\})")
+
 
 class InvalidConfigError(Exception):
     """Class to represent an invalid configuration error."""
@@ -65,6 +90,8 @@ class Command:
     retcode: Optional[int]
     stdout: Optional[str]
     stderr: Optional[str]
+    wait_until: bool = False
+    timeout: Optional[float] = None
 
 
 @dataclass()
@@ -74,6 +101,9 @@ class Test:
     name: str
     spec: List[Command]
     result: Optional[TestResult]
+    group: Optional[str] = None
+    envvars: Dict[str, str] = field(default_factory=dict)
+    duration: Optional[float] = None
 
     def get_prometheus_labels(self) -> str:
         return f'test_name="{self.name}", test_result="{self.result}"'
@@ -124,6 +154,7 @@ class Runner:
     tests: List[Test]
     exit_code_fail: Optional[bool] = False
     prometheus_file: Optional[str] = None
+    max_workers: int = 1
     system_information: SystemInformation = field(init=False)
     _PROMETHEUS_METRIC: str = field(init=False, default="cmd_checklist_runner")
 
@@ -134,12 +165,15 @@ class Runner:
     def _get_prometheus_file_content(self) -> str:
         content = ""
         for test in self.tests:
-            content += f"{self._PROMETHEUS_METRIC}{{"
-            content += f'config_file="{self.config_file}", '
-            content += test.get_prometheus_labels()
-            content += ", "
-            content += self.system_information.get_prometheus_labels()
-            content += "} 1\n"
+            labels = f'config_file="{self.config_file}", '
+            labels += test.get_prometheus_labels()
+            labels += ", "
+            labels += self.system_information.get_prometheus_labels()
+
+            content += f"{self._PROMETHEUS_METRIC}{{{labels}}} 1\n"
+            if test.duration is not None:
+                content += f"{self._PROMETHEUS_METRIC}_duration_seconds{{{labels}}} "
+                content += f"{test.duration:.3f}\n"
 
         return content
 
@@ -207,17 +241,32 @@ def stage_validate_config(args) -> Runner:
 
                 test_cmds = []
                 for test in definition["tests"]:
-                    validate_dictionary(test, ["cmd"])
+                    if isinstance(test, dict) and test.get("wait_until", None) is not None:
+                        validate_dictionary(test, ["wait_until"])
+                    else:
+                        validate_dictionary(test, ["cmd"])
                     cmd = Command(
-                        cmd=test.get("cmd"),
+                        cmd=test.get("cmd", test.get("wait_until")),
                         retcode=test.get("retcode", None),
                         stdout=test.get("stdout", None),
                         stderr=test.get("stderr", None),
+                        wait_until="wait_until" in test,
+                        timeout=test.get("timeout", None),
                     )
 
                     test_cmds.append(cmd)
 
-                test = Test(name=definition.get("name"), spec=test_cmds, result=TestResult.NOTRUN)
+                test_envvars = {}
+                for envvar in definition.get("envvars", None) or []:
+                    test_envvars.update({key: str(value) for key, value in envvar.items()})
+
+                test = Test(
+                    name=definition.get("name"),
+                    spec=test_cmds,
+                    result=TestResult.NOTRUN,
+                    group=definition.get("group", None),
+                    envvars=test_envvars,
+                )
                 tests.append(test)
 
     logging.debug(f"'{args.config_file}' seems valid")
@@ -227,20 +276,31 @@ def stage_validate_config(args) -> Runner:
         tests=tests,
         exit_code_fail=args.exit_code_fail,
         prometheus_file=args.prometheus_output_file,
+        max_workers=args.max_workers,
     )
 
 
-def cmd_run(command: Command) -> bool:
+def expand_vars(value: str, env: Dict[str, str]) -> str:
+    """Like os.path.expandvars(), but using the given environment."""
+
+    def substitute(match: re.Match) -> str:
+        name = match.group(1)
+        if name.startswith("{"):
+            name = name[1:-1]
+        return env.get(name, match.group(0))
+
+    return ENVVAR_REGEX.sub(substitute, value)
+
+
+def cmd_check(command: Command, expanded_cmd: str, env: Dict[str, str], log) -> bool:
     success = True
 
-    expanded_cmd = os.path.expandvars(command.cmd)
-    logging.debug(f"running command: {expanded_cmd}")
-    r = subprocess.run(expanded_cmd, capture_output=True, shell=True)
+    r = subprocess.run(expanded_cmd, capture_output=True, shell=True, env=env)
 
     expected_retcode = command.retcode
     if expected_retcode is not None:
         if r.returncode != expected_retcode:
-            logging.warning(
+            log(
                 f"cmd '{expanded_cmd}', expected return code '{expected_retcode}', "
                 f"but got '{r.returncode}'"
             )
@@ -252,9 +312,7 @@ def cmd_run(command: Command) -> bool:
     if expected_stdout is not None:
         stdout = r.stdout.decode("utf-8").strip()
         if stdout != expected_stdout:
-            logging.warning(
-                f"cmd '{expanded_cmd}', expected stdout '{expected_stdout}', but got '{stdout}'"
-            )
+            log(f"cmd '{expanded_cmd}', expected stdout '{expected_stdout}', but got '{stdout}'")
             success = False
     else:
         logging.debug("no stdout defined for command, ignoring")
@@ -263,9 +321,7 @@ def cmd_run(command: Command) -> bool:
     if expected_stderr is not None:
         stderr = r.stderr.decode("utf-8").strip()
         if stderr != expected_stderr:
-            logging.warning(
-                f"cmd '{expanded_cmd}', expected stderr '{expected_stderr}', but got '{stderr}'"
-            )
+            log(f"cmd '{expanded_cmd}', expected stderr '{expected_stderr}', but got '{stderr}'")
             success = False
     else:
         logging.debug("no stderr defined for command, ignoring")
@@ -273,25 +329,95 @@ def cmd_run(command: Command) -> bool:
     return success
 
 
+def cmd_wait_until(command: Command, expanded_cmd: str, env: Dict[str, str]) -> bool:
+    timeout = command.timeout if command.timeout is not None else WAIT_UNTIL_TIMEOUT
+    sleep = WAIT_UNTIL_INITIAL_SLEEP
+    starttime = time.time()
+
+    while True:
+        if cmd_check(command, expanded_cmd, env, logging.debug):
+            return True
+
+        elapsed = time.time() - starttime
+        if elapsed >= timeout:
+            # run it once more, to log why it's failing
+            if cmd_check(command, expanded_cmd, env, logging.warning):
+                return True
+            logging.warning(f"cmd '{expanded_cmd}', timed out after {timeout} seconds")
+            return False
+
+        time.sleep(min(sleep, timeout - elapsed))
+        sleep = min(sleep * WAIT_UNTIL_BACKOFF, WAIT_UNTIL_MAX_SLEEP)
+
+
+def cmd_run(command: Command, env: Optional[Dict[str, str]] = None) -> bool:
+    if env is None:
+        env = dict(os.environ)
+
+    expanded_cmd = expand_vars(command.cmd, env)
+    logging.debug(f"running command: {expanded_cmd}")
+
+    if command.wait_until:
+        if command.retcode is None and command.stdout is None and command.stderr is None:
+            command = replace(command, retcode=0)
+        return cmd_wait_until(command, expanded_cmd, env)
+
+    return cmd_check(command, expanded_cmd, env, logging.warning)
+
+
 def test_run(test: Test):
     logging.info(f"running: {test.name}")
 
-    for command in test.spec:
-        if cmd_run(command):
-            continue
+    env = dict(os.environ)
+    for key, value in test.envvars.items():
+        env[key] = expand_vars(value, env)
+
+    starttime = time.time()
+    try:
+        for command in test.spec:
+            if cmd_run(command, env):
+                continue
 
-        logging.warning(f"failed test: {test.name}")
-        test.result = TestResult.FAILED
-        return
+            logging.warning(f"failed test: {test.name}")
+            test.result = TestResult.FAILED
+            return
+
+        test.result = TestResult.OK
+    finally:
+        test.duration = time.time() - starttime
 
-    test.result = TestResult.OK
+
+def group_run(tests: List[Test]):
+    for test in tests:
+        test_run(test)
 
 
 def stage_run_tests(runner: Runner):
     load_envs(runner)
 
+    # split the tests in stages: ungrouped tests run alone, consecutive grouped tests together
+    stages: List[List[Test]] = []
     for test in runner.tests:
-        test_run(test)
+        if test.group and stages and stages[-1][0].group:
+            stages[-1].append(test)
+        else:
+            stages.append([test])
+
+    for stage in stages:
+        groups: Dict[str, List[Test]] = {}
+        for test in stage:
+            groups.setdefault(test.group or "", []).append(test)
+
+        if len(groups) == 1 or runner.max_workers <= 1:
+            group_run(stage)
+            continue
+
+        logging.info(f"running {len(groups)} test groups concurrently: {', '.join(groups)}")
+        with ThreadPoolExecutor(
+            max_workers=runner.max_workers, thread_name_prefix="group"
+        ) as executor:
+            for future in [executor.submit(group_run, tests) for tests in groups.values()]:
+                future.result()
 
 
 def stage_report(runner: Runner):
@@ -336,6 +462,13 @@ def parse_args():
         required=False,
         help="If provided, generate a prom file with results from the testsuite",
     )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help="how many test groups to run at the same time, 1 to run everything serially. "
+        "Defaults to '%(default)s'",
+    )
     return parser.parse_args()
 
 
@@ -347,7 +480,7 @@ def stage_report_node_info(runner: Runner):
 def main():
     args = parse_args()
 
-    logging_format = "[%(asctime)s] %(levelname)s: %(message)s"
+    logging_format = "[%(asctime)s] [%(threadName)s] %(levelname)s: %(message)s"
     date_format = "%Y-%m-%d %H:%M:%S"
     if args.debug:
         logging_level = logging.DEBUG
@@ -0,0 +1,271 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+A local, in-process stand-in for the jobs API, for benchmarks and local experiments.
+
+It implements just enough of the API for the CLI to work, keeping the jobs in memory.
+Every request is delayed by a configurable latency to simulate the network and the server.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+JOB_ROUTE = re.compile(r"^/jobs/(?P<name>[^/]+)(?P<action>/restart|/logs)?$")
+
+DEFAULT_QUOTA = {
+    "categories": [
+        {
+            "name": "Running jobs",
+            "items": [
+                {
+                    "name": "Total running jobs at once (Kubernetes pods)",
+                    "limit": "1000",
+                    "used": "0",
+                },
+                {"name": "Running one-off and cron jobs", "limit": "1000", "used": "0"},
+                {"name": "CPU", "limit": "1000", "used": "0"},
+                {"name": "Memory", "limit": "1000Gi", "used": "0"},
+            ],
+        },
+        {
+            "name": "Per-job limits",
+            "items": [{"name": "CPU", "limit": "3"}, {"name": "Memory", "limit": "8Gi"}],
+        },
+        {
+            "name": "Job definitions",
+            "items": [
+                {"name": "Cron jobs", "limit": "2000", "used": "0"},
+                {"name": "Continuous jobs (including web services)", "limit": "2000", "used": "0"},
+            ],
+        },
+    ]
+}
+
+
+def make_job(name: str, **kwargs) -> Dict[str, Any]:
+    """Returns a job object as emitted by the API."""
+    job = {
+        "name": name,
+        "cmd": f"./{name}.sh",
+        "image": "bullseye",
+        "image_state": "stable",
+        "filelog": "True",
+        "filelog_stdout": None,
+        "filelog_stderr": None,
+        "status_short": "Running",
+        "status_long": (
+            "Last run at 2022-10-08T09:28:37Z. Pod in 'Running' phase. "
+            "State 'running'. Started at '2022-10-08T09:28:39Z'."
+        ),
+        "emails": "none",
+        "retry": 0,
+    }
+    job.update(kwargs)
+    return job
+
+
+def job_from_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts a POST /jobs/ payload into the object returned by the API."""
+    extra = {}
+    for key in ("schedule", "continuous", "memory", "cpu", "filelog_stdout", "filelog_stderr"):
+        if key in payload:
+            extra[key] = payload[key]
+
+    return make_job(
+        payload["name"],
+        cmd=payload["cmd"],
+        image=payload["imagename"],
+        emails=payload.get("emails", "none"),
+        retry=payload.get("retry", 0),
+        filelog=str(payload.get("filelog", True)),
+        status_short="Running" if payload.get("continuous") else "Pending",
+        **extra,
+    )
+
+
+class MockJobsApi:
+    """The state of the mock API, and the HTTP server serving it."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        log_lines: int = 100,
+        complete_after: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.log_lines = log_lines
+        self.complete_after = complete_after
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.created_at: Dict[str, float] = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self, jobs: Optional[List[Dict[str, Any]]] = None) -> None:
+        with self.lock:
+            self.jobs = {job["name"]: job for job in jobs or []}
+            self.created_at = {name: time.time() for name in self.jobs}
+            self.requests = 0
+
+    def start(self) -> "MockJobsApi":
+        api = self
+
+        class Handler(RequestHandler):
+            state = api
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockJobsApi":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _current_job(self, name: str) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(name, None)
+        if job is None:
+            return None
+
+        normal = not job.get("schedule") and not job.get("continuous")
+        if normal and time.time() - self.created_at[name] >= self.complete_after:
+            job["status_short"] = "Completed"
+        return job
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    state: MockJobsApi
+    protocol_version = "HTTP/1.1"
+    # avoid the delayed ACK penalty when headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send_json(self, data: Any, status: int = 200) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _begin(self) -> str:
+        with self.state.lock:
+            self.state.requests += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        return urlparse(self.path).path
+
+    def do_GET(self) -> None:
+        path = self._begin()
+        state = self.state
+
+        if path in ("/jobs/", "/list/"):
+            with state.lock:
+                jobs = [state._current_job(name) for name in list(state.jobs)]
+            return self._send_json(jobs)
+        if path == "/quota/":
+            return self._send_json(DEFAULT_QUOTA)
+        if path == "/images/":
+            return self._send_json([{"shortname": "bullseye", "image": "bullseye:latest"}])
+
+        match = JOB_ROUTE.match(path)
+        if not match:
+            return self._send_json({"error": "not found"}, 404)
+
+        with state.lock:
+            job = state._current_job(match.group("name"))
+        if job is None:
+            return self._send_json({"error": "Job not found"}, 404)
+
+        if match.group("action") == "/logs":
+            return self._send_logs(match.group("name"))
+        return self._send_json(job)
+
+    def _send_logs(self, name: str) -> None:
+        params = parse_qs(urlparse(self.path).query)
+        lines = int(params.get("lines", [self.state.log_lines])[0])
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(lines):
+            line = json.dumps(
+                {
+                    "pod": f"{name}-abcde",
+                    "container": "job",
+                    "datetime": "2022-10-08T09:28:39Z",
+                    "message": f"log line number {i}",
+                }
+            )
+            data = f"{line}\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self) -> None:
+        path = self._begin()
+        state = self.state
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        if path == "/jobs/":
+            payload = json.loads(body)
+            with state.lock:
+                if payload["name"] in state.jobs:
+                    return self._send_json({"error": "already exists"}, 409)
+                state.jobs[payload["name"]] = job_from_payload(payload)
+                state.created_at[payload["name"]] = time.time()
+            return self._send_json({}, 201)
+
+        match = JOB_ROUTE.match(path)
+        if match and match.group("action") == "/restart":
+            with state.lock:
+                found = match.group("name") in state.jobs
+            return self._send_json({}) if found else self._send_json({"error": "not found"}, 404)
+
+        return self._send_json({"error": "not found"}, 404)
+
+    def do_DELETE(self) -> None:
+        path = self._begin()
+        state = self.state
+
+        if path == "/jobs/":
+            with state.lock:
+                state.jobs.clear()
+            return self._send_json({})
+
+        match = JOB_ROUTE.match(path)
+        if match and not match.group("action"):
+            with state.lock:
+                job = state.jobs.pop(match.group("name"), None)
+            if job is not None:
+                return self._send_json({})
+
+        return self._send_json({"error": "not found"}, 404)
@@ -0,0 +1,623 @@
+import json
+import re
+
+import pytest
+import requests
+from toolforge_weld.api_client import ToolforgeClient
+from toolforge_weld.kubernetes_config import fake_kube_config
+
+from tjf_cli import cli
+from tjf_cli.api import handle_http_exception
+from tjf_cli.errors import TjfCliError, TjfCliUserError
+from tjf_cli.loader import JobSelector
+
+SERVER = "http://nonexistent"
+
+
+def api_job(name: str, **kwargs):
+    job = {
+        "name": name,
+        "cmd": f"./{name}.sh",
+        "image": "bullseye",
+        "image_state": "stable",
+        "filelog": "True",
+        "status_short": "Running",
+        "status_long": "Pod in 'Running' phase.",
+        "emails": "none",
+        "retry": 0,
+    }
+    job.update(kwargs)
+    return job
+
+
+JOBS = [
+    api_job("crawler-1", continuous=True),
+    api_job("crawler-2", continuous=True),
+    api_job("cleanup", schedule="@daily", status_short="Waiting for scheduled time"),
+]
+
+
+@pytest.fixture()
+def mock_api(requests_mock) -> ToolforgeClient:
+    requests_mock.get(f"{SERVER}/jobs/", json=JOBS)
+    for job in JOBS:
+        requests_mock.get(f"{SERVER}/jobs/{job['name']}", json=job)
+        requests_mock.delete(f"{SERVER}/jobs/{job['name']}", json={})
+        requests_mock.post(f"{SERVER}/jobs/{job['name']}/restart", json={})
+    requests_mock.get(f"{SERVER}/jobs/missing", status_code=404, json={"error": "not found"})
+
+    yield ToolforgeClient(
+        server=SERVER,
+        user_agent="xyz",
+        kubeconfig=fake_kube_config(),
+        exception_handler=handle_http_exception,
+    )
+
+
+def request_paths(requests_mock, method="GET"):
+    return sorted(
+        request.path for request in requests_mock.request_history if request.method == method
+    )
+
+
+def test_show_names_fetches_each_job(requests_mock, mock_api: ToolforgeClient, capsys):
+    cli.op_show(mock_api, ["crawler-1", "cleanup"])
+
+    output = capsys.readouterr().out
+    assert "./crawler-1.sh" in output and "./cleanup.sh" in output
+    assert "./crawler-2.sh" not in output
+    assert request_paths(requests_mock) == ["/jobs/cleanup", "/jobs/crawler-1"]
+
+
+def test_show_glob_lists_jobs_once(requests_mock, mock_api: ToolforgeClient, capsys):
+    cli.op_show(mock_api, ["crawler-*"], output_json=True)
+
+    output = json.loads(capsys.readouterr().out)
+    assert [job["name"] for job in output] == ["crawler-1", "crawler-2"]
+    assert request_paths(requests_mock) == ["/jobs/"]
+
+
+def test_show_missing(mock_api: ToolforgeClient):
+    with pytest.raises(TjfCliUserError, match="'missing' does not exist"):
+        cli.op_show(mock_api, ["missing"])
+
+    with pytest.raises(TjfCliUserError, match="No jobs match"):
+        cli.op_show(mock_api, ["nothing-*"])
+
+
+def test_delete_glob(requests_mock, mock_api: ToolforgeClient):
+    cli.op_delete(mock_api, JobSelector(patterns=["crawler-*"]))
+
+    assert request_paths(requests_mock) == ["/jobs/"]
+    assert request_paths(requests_mock, "DELETE") == ["/jobs/crawler-1", "/jobs/crawler-2"]
+
+
+def test_delete_requires_selection(mock_api: ToolforgeClient):
+    with pytest.raises(TjfCliUserError, match="flush"):
+        cli.op_delete(mock_api, JobSelector())
+
+
+def test_restart_type(requests_mock, mock_api: ToolforgeClient):
+    cli.op_restart(mock_api, JobSelector(job_type="schedule"))
+
+    assert request_paths(requests_mock, "POST") == ["/jobs/cleanup/restart"]
+
+
+def test_restart_wait(requests_mock, mock_api: ToolforgeClient, monkeypatch):
+    monkeypatch.setattr(cli, "WAIT_SLEEP", 0)
+    running = "Pod in 'Running' phase. State 'running'. Started at '{}'."
+    before = [api_job("crawler-1", continuous=True, status_long=running.format("t1"))]
+    restarting = [api_job("crawler-1", continuous=True, status_short="Not running")]
+    after = [api_job("crawler-1", continuous=True, status_long=running.format("t2"))]
+    requests_mock.get(f"{SERVER}/jobs/", [{"json": before}, {"json": restarting}, {"json": after}])
+
+    cli.op_restart(mock_api, JobSelector(patterns=["crawler-1"]), wait=True)
+
+    assert request_paths(requests_mock) == ["/jobs/", "/jobs/", "/jobs/"]
+
+
+def run_job(api: ToolforgeClient, **kwargs):
+    args = {
+        "name": "new-job",
+        "command": "./new.sh",
+        "schedule": None,
+        "continuous": True,
+        "image": "bullseye",
+        "wait": False,
+        "no_filelog": False,
+        "filelog_stdout": None,
+        "filelog_stderr": None,
+        "mem": None,
+        "cpu": None,
+        "retry": 0,
+        "emails": "none",
+    }
+    args.update(kwargs)
+    cli.op_run(api, **args)
+
+
+def test_run_checks_quota(requests_mock, mock_api: ToolforgeClient):
+    requests_mock.get(
+        f"{SERVER}/quota/",
+        json={
+            "categories": [
+                {"name": "Per-job limits", "items": [{"name": "Memory", "limit": "4Gi"}]}
+            ]
+        },
+    )
+    requests_mock.post(f"{SERVER}/jobs/", json={})
+
+    with pytest.raises(TjfCliUserError, match="above the per-job limit of 4Gi"):
+        run_job(mock_api, mem="6Gi", check_quota=True)
+    assert request_paths(requests_mock, "POST") == []
+
+    run_job(mock_api, mem="2Gi", check_quota=True)
+    assert request_paths(requests_mock, "POST") == ["/jobs/"]
+
+
+def test_run_quota_unavailable(requests_mock, mock_api: ToolforgeClient, caplog):
+    requests_mock.get(f"{SERVER}/quota/", status_code=500, json={"error": "oops"})
+    requests_mock.post(f"{SERVER}/jobs/", json={})
+
+    run_job(mock_api, check_quota=True)
+
+    assert "unable to check the quota" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        {"json": {"categories": [{"items": []}]}},
+        {"json": ["unexpected"]},
+        {"exc": requests.exceptions.ConnectTimeout},
+    ],
+)
+def test_run_quota_unexpected(requests_mock, mock_api: ToolforgeClient, caplog, response):
+    requests_mock.get(f"{SERVER}/quota/", **response)
+    requests_mock.post(f"{SERVER}/jobs/", json={})
+
+    run_job(mock_api, check_quota=True)
+
+    assert "continuing anyway" in caplog.text
+    assert request_paths(requests_mock, "POST") == ["/jobs/"]
+
+
+def test_logs_output_file(mock_api, requests_mock, tmp_path, capsys):
+    lines = [
+        {"pod": "p", "container": "c", "datetime": "2024-01-01T10:00:00Z", "message": str(i)}
+        for i in range(3)
+    ]
+    requests_mock.get(
+        f"{SERVER}/jobs/crawler-1/logs", text="\n".join(json.dumps(line) for line in lines)
+    )
+    output = tmp_path / "logs.jsonl"
+
+    cli.op_logs(mock_api, "crawler-1", False, None, cli.RotatingLogWriter(str(output)))
+
+    assert capsys.readouterr().out == ""
+    assert [json.loads(raw) for raw in output.read_text().splitlines()] == lines
+
+
+def test_logs_filters(mock_api, requests_mock, capsys):
+    lines = [
+        {"pod": "p", "container": "c", "datetime": "2024-01-01T10:00:00Z", "message": message}
+        for message in ("starting", "ERROR: first", "working", "ERROR: second")
+    ]
+    requests_mock.get(
+        f"{SERVER}/jobs/crawler-1/logs", text="\n".join(json.dumps(line) for line in lines)
+    )
+
+    log_filter = cli.LogFilter(grep="ERROR", pod="p", max_matches=1)
+    cli.op_logs(mock_api, "crawler-1", False, None, log_filter=log_filter)
+
+    assert capsys.readouterr().out == "2024-01-01T10:00:00Z [p] ERROR: first\n"
+    assert requests_mock.last_request.qs == {
+        "follow": ["false"],
+        "grep": ["error"],
+        "pod": ["p"],
+    }
+
+
+def test_rollback(mock_api, requests_mock, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    history = cli.History()
+    previous = [cli.job_api_to_config(job) for job in JOBS]
+    history.record(previous, "jobs.yaml")
+    history.record(previous[:1] + [{**previous[1], "command": "./broken.sh"}], "jobs.yaml")
+
+    current = [JOBS[0], {**JOBS[1], "cmd": "./broken.sh"}]
+    requests_mock.get(f"{SERVER}/list/", json=current)
+    requests_mock.get(f"{SERVER}/jobs/", [{"json": current}, {"json": [JOBS[0]]}])
+    requests_mock.post(f"{SERVER}/jobs/", json={})
+    monkeypatch.setattr(cli, "WAIT_SLEEP", 0)
+
+    cli.op_rollback(mock_api, 1)
+
+    assert request_paths(requests_mock, "DELETE") == ["/jobs/crawler-2"]
+    created = sorted(
+        request.json()["name"]
+        for request in requests_mock.request_history
+        if request.method == "POST"
+    )
+    assert created == ["cleanup", "crawler-2"]
+
+    # the rollback is a new snapshot, with the same jobs as the one rolled back to
+    snapshots = history.snapshots()
+    assert len(snapshots) == 3
+    assert snapshots[0].jobs == snapshots[2].jobs
+    assert snapshots[0].source.startswith("rollback to")
+
+
+def test_rollback_doesnt_wait(mock_api, requests_mock, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    history = cli.History()
+    current = [cli.job_api_to_config(job) for job in JOBS]
+    oneoff = {"name": "oneoff", "command": "./oneoff.sh", "image": "bullseye", "wait": True}
+    history.record(current + [oneoff], "jobs.yaml")
+    history.record(current, "jobs.yaml")
+    requests_mock.get(f"{SERVER}/list/", json=JOBS)
+    requests_mock.post(f"{SERVER}/jobs/", json={})
+
+    cli.op_rollback(mock_api, 1)
+
+    assert request_paths(requests_mock, "POST") == ["/jobs/"]
+    # the job status is never polled
+    assert "/jobs/oneoff" not in request_paths(requests_mock)
+
+
+def test_rollback_without_history(mock_api, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    with pytest.raises(TjfCliUserError, match="the history has 0"):
+        cli.op_rollback(mock_api, 1)
+
+
+def test_load_records_snapshot(mock_api, requests_mock, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    requests_mock.get(f"{SERVER}/jobs/new-job", status_code=404, json={"error": "not found"})
+    requests_mock.post(f"{SERVER}/jobs/", json={})
+    jobs_file = tmp_path / "jobs.yaml"
+    jobs_file.write_text(
+        "- name: new-job\n  command: ./new.sh\n  image: bullseye\n  continuous: true\n"
+    )
+
+    # without a snapshot to update, the other jobs are not listed to save a new one
+    cli.op_load(mock_api, str(jobs_file), JobSelector(patterns=["new-job"]))
+    history = cli.History()
+    assert history.latest() is None
+    assert "/jobs/" not in request_paths(requests_mock)
+
+    history.record([cli.job_api_to_config(job) for job in JOBS], "jobs.yaml")
+    cli.op_load(mock_api, str(jobs_file), JobSelector(patterns=["new-job"]))
+
+    snapshot = history.latest()
+    assert snapshot.source == str(jobs_file)
+    # the jobs not loaded are kept as they were
+    assert sorted(snapshot.jobs) == ["cleanup", "crawler-1", "crawler-2", "new-job"]
+
+
+def test_load_transactional_rollback(requests_mock, tmp_path, monkeypatch, capsys):
+    from mock_jobs_api import job_from_payload
+
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(cli, "WAIT_SLEEP", 0)
+    state = {job["name"]: dict(job) for job in JOBS}
+
+    def create(request, context):
+        payload = request.json()
+        if payload["name"] == "broken":
+            context.status_code = 500
+            return {"error": "boom"}
+        state[payload["name"]] = job_from_payload(payload)
+        context.status_code = 201
+        return {}
+
+    def delete(request, context):
+        state.pop(request.path.rsplit("/", 1)[1])
+        return {}
+
+    job_url = re.compile(f"{SERVER}/jobs/[^/]+$")
+    requests_mock.get(f"{SERVER}/list/", json=lambda request, context: list(state.values()))
+    requests_mock.get(f"{SERVER}/jobs/", json=lambda request, context: list(state.values()))
+    requests_mock.post(f"{SERVER}/jobs/", json=create)
+    requests_mock.delete(job_url, json=delete)
+    api = ToolforgeClient(
+        server=SERVER,
+        user_agent="xyz",
+        kubeconfig=fake_kube_config(),
+        exception_handler=handle_http_exception,
+    )
+
+    previous = {name: dict(job) for name, job in state.items()}
+    jobs = [cli.job_api_to_config(job) for job in JOBS]
+    # crawler-1 modified, crawler-2 deleted, and two new jobs, the second failing
+    jobs[0]["command"] = "./new-crawler.sh"
+    new_job = {"name": "new-job", "command": "./new.sh", "image": "bullseye"}
+    broken = {"name": "broken", "command": "./broken.sh", "image": "bullseye"}
+    jobs = [jobs[0], jobs[2], new_job, broken]
+    jobs_file = tmp_path / "jobs.yaml"
+    jobs_file.write_text(json.dumps(jobs))
+
+    with pytest.raises(TjfCliError, match="Failed to load job broken"):
+        cli.op_load(api, str(jobs_file), JobSelector(), transactional=True)
+
+    assert sorted(state) == ["cleanup", "crawler-1", "crawler-2"]
+    for name in ("crawler-1", "crawler-2"):
+        assert cli.job_api_to_config(state[name]) == cli.job_api_to_config(previous[name])
+
+    report = capsys.readouterr().out
+    assert "new-job" in report and "removed new job" in report
+    assert report.count("restored previous definition") == 2
+    # nothing was recorded for the failed load
+    assert cli.History().latest() is None
+
+
+@pytest.fixture()
+def tool_apis(requests_mock):
+    apis = {}
+    for tool, jobs in (("alpha", JOBS[:2]), ("beta", JOBS[2:])):
+        server = f"http://{tool}.nonexistent"
+        requests_mock.get(f"{server}/jobs/", json=jobs)
+        requests_mock.get(
+            f"{server}/quota/",
+            json={
+                "categories": [
+                    {
+                        "name": "Running jobs",
+                        "items": [{"name": "Memory", "used": "1Gi", "limit": "8Gi"}],
+                    }
+                ]
+            },
+        )
+        apis[tool] = ToolforgeClient(
+            server=server,
+            user_agent="xyz",
+            kubeconfig=fake_kube_config(),
+            exception_handler=handle_http_exception,
+        )
+    yield apis
+
+
+def test_list_tools(tool_apis, capsys):
+    cli.op_list_tools(tool_apis, cli.ListDisplayMode.NAME)
+    assert capsys.readouterr().out == "alpha\tcrawler-1\nalpha\tcrawler-2\nbeta\tcleanup\n"
+
+    cli.op_list_tools(tool_apis, cli.ListDisplayMode.NORMAL)
+    lines = capsys.readouterr().out.splitlines()
+    rows = [[cell.strip() for cell in line.split("|")[1:3]] for line in lines if "|" in line]
+    assert rows == [
+        ["Tool:", "Job name:"],
+        ["alpha", "crawler-1"],
+        ["alpha", "crawler-2"],
+        ["beta", "cleanup"],
+    ]
+
+
+def test_tools_failures(tool_apis, requests_mock, capsys):
+    requests_mock.get("http://beta.nonexistent/jobs/", status_code=500, json={"error": "boom"})
+
+    with pytest.raises(TjfCliUserError, match="Failed for 1 of 2 tool"):
+        cli.op_list_tools(tool_apis, cli.ListDisplayMode.NAME)
+    # the other tools are still listed
+    assert capsys.readouterr().out == "alpha\tcrawler-1\nalpha\tcrawler-2\n"
+
+
+def test_quota_tools(tool_apis, capsys):
+    cli.op_quota_tools(tool_apis)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["Tool", "Running", "jobs", "Used", "Limit"]
+    assert [line.split() for line in lines[2:]] == [
+        ["alpha", "Memory", "1Gi", "8Gi"],
+        ["beta", "Memory", "1Gi", "8Gi"],
+    ]
+
+
+def test_show_tools(tool_apis, capsys):
+    cli.op_show_tools(tool_apis, ["crawler-*", "cleanup"], output_json=True)
+    output = json.loads(capsys.readouterr().out)
+    assert [(job["tool"], job["name"]) for job in output] == [
+        ("alpha", "crawler-1"),
+        ("alpha", "crawler-2"),
+        ("beta", "cleanup"),
+    ]
+
+    with pytest.raises(TjfCliUserError, match="in any tool"):
+        cli.op_show_tools(tool_apis, ["missing"])
+
+
+class EditingWatcher:
+    """Instead of waiting for changes, makes the next edit to the jobs file."""
+
+    def __init__(self, edits):
+        self.edits = list(edits)
+
+    def wait(self, paths, timeout):
+        if self.edits:
+            self.edits.pop(0)()
+
+    def close(self):
+        pass
+
+
+def test_load_watch(tmp_path, monkeypatch):
+    from mock_jobs_api import MockJobsApi, make_job
+
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(cli, "WAIT_SLEEP", 0)
+    jobs_file = tmp_path / "jobs.yaml"
+    job = "- name: {0}\n  command: ./{0}.sh\n  image: bullseye\n  continuous: true\n"
+    jobs_file.write_text(job.format("one") + job.format("two"))
+
+    with MockJobsApi() as server:
+        server.reset([make_job("stray", continuous=True)])
+        api = ToolforgeClient(
+            server=server.url,
+            user_agent="xyz",
+            kubeconfig=fake_kube_config(),
+            exception_handler=handle_http_exception,
+        )
+        api.session.cert = None
+
+        def edit():
+            jobs_file.write_text(job.format("one") + job.format("three"))
+            # changed by hand, left alone until the next resync
+            server.jobs["one"]["cmd"] = "./other.sh"
+
+        def broken():
+            jobs_file.write_text("- name: [")
+
+        monkeypatch.setattr(cli, "FileWatcher", lambda: EditingWatcher([edit, broken]))
+        cli.op_load_watch(api, str(jobs_file), poll_interval=0, iterations=3)
+
+        assert sorted(server.jobs) == ["one", "three"]
+        assert server.jobs["one"]["cmd"] == "./other.sh"
+
+        # the broken file keeps the jobs as they were, and the resync undoes the manual change
+        monkeypatch.setattr(cli, "FileWatcher", lambda: EditingWatcher([]))
+        cli.op_load_watch(api, str(jobs_file), resync_interval=0, poll_interval=0, iterations=1)
+        assert sorted(server.jobs) == ["one", "three"]
+        assert server.jobs["one"]["cmd"] == "./other.sh"
+
+        jobs_file.write_text(job.format("one") + job.format("three"))
+        cli.op_load_watch(api, str(jobs_file), poll_interval=0, iterations=1)
+        assert server.jobs["one"]["cmd"] == "./one.sh"
+
+    snapshots = cli.History().snapshots()
+    assert [sorted(snapshot.jobs) for snapshot in snapshots[:2]] == [
+        ["one", "three"],
+        ["one", "two"],
+    ]
+
+
+def test_load_watch_survives_network_errors(requests_mock, mock_api, tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(cli, "FileWatcher", lambda: EditingWatcher([]))
+    requests_mock.get(
+        f"{SERVER}/jobs/", [{"exc": requests.exceptions.ConnectionError}, {"json": JOBS}]
+    )
+    requests_mock.post(f"{SERVER}/jobs/", json={})
+    requests_mock.get(f"{SERVER}/jobs/new-job", json=api_job("new-job", cmd="./new.sh"))
+    jobs_file = tmp_path / "jobs.yaml"
+    configs = [cli.job_api_to_config(job) for job in JOBS]
+    configs.append({"name": "new-job", "command": "./new.sh", "image": "bullseye"})
+    jobs_file.write_text(json.dumps(configs))
+
+    cli.op_load_watch(mock_api, str(jobs_file), resync_interval=0, poll_interval=0, iterations=2)
+
+    assert [
+        request.json()["name"]
+        for request in requests_mock.request_history
+        if request.method == "POST"
+    ] == ["new-job"]
+
+
+@pytest.mark.parametrize(
+    "jobs, code, summary",
+    [
+        (JOBS, cli.CHECK_OK, "JOBS OK - 3 job(s) in sync"),
+        (
+            [JOBS[0], {**JOBS[1], "cmd": "./other.sh"}, JOBS[2], api_job("extra")],
+            cli.CHECK_DRIFTED,
+            "JOBS WARNING - 1 drifted (crawler-2); 1 not in file (extra)",
+        ),
+        (
+            [{**JOBS[1], "cmd": "./other.sh"}],
+            cli.CHECK_MISSING,
+            "JOBS CRITICAL - 2 missing (cleanup, crawler-1); 1 drifted (crawler-2)",
+        ),
+    ],
+)
+def test_check(requests_mock, mock_api, tmp_path, monkeypatch, capsys, jobs, code, summary):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    requests_mock.get(f"{SERVER}/list/", json=jobs)
+    jobs_file = tmp_path / "jobs.yaml"
+    jobs_file.write_text(json.dumps([cli.job_api_to_config(job) for job in JOBS]))
+
+    assert cli.op_check(mock_api, str(jobs_file)) == code
+
+    output = capsys.readouterr().out
+    assert output.startswith(f"{summary} | ")
+    assert len(requests_mock.request_history) == 1
+
+
+def test_export_metrics_interval_survives_network_errors(monkeypatch):
+    exports = []
+
+    def export():
+        exports.append(None)
+        if len(exports) == 1:
+            raise requests.exceptions.ReadTimeout()
+
+    def sleep(seconds):
+        if len(exports) == 2:
+            raise KeyboardInterrupt()
+
+    monkeypatch.setattr(cli.time, "sleep", sleep)
+    cli._repeat_export(export, 1)
+
+    assert len(exports) == 2
+
+
+def test_events_follow_survives_network_errors(requests_mock, mock_api, monkeypatch, capsys):
+    requests_mock.get(
+        f"{SERVER}/jobs/",
+        [{"json": []}, {"exc": requests.exceptions.ConnectionError}, {"json": JOBS[:1]}],
+    )
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 3:
+            raise KeyboardInterrupt()
+
+    monkeypatch.setattr(cli.time, "sleep", sleep)
+    cli.op_events(mock_api, [], follow=True, interval=1, output_json=True)
+
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [event["job"] for event in events] == ["crawler-1"]
+
+
+def test_check_configuration_failure(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("KUBECONFIG", str(tmp_path / "missing"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    jobs_file = tmp_path / "jobs.yaml"
+    jobs_file.write_text("[]")
+    monkeypatch.setattr(cli.sys, "argv", ["toolforge-jobs", "check", str(jobs_file)])
+
+    with pytest.raises(SystemExit) as exit:
+        cli.main()
+
+    assert exit.value.code == cli.CHECK_UNKNOWN
+    assert capsys.readouterr().out.splitlines()[0].startswith("JOBS UNKNOWN - ")
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        pytest.param(["check"], id="missing-file"),
+        pytest.param(["check", "jobs.yaml", "--bogus"], id="unknown-option"),
+        pytest.param(["--kubeconfig", "kubeconfig", "check", "jobs.yaml"], id="kubeconfig"),
+    ],
+)
+def test_check_usage_error(argv, monkeypatch, capsys):
+    monkeypatch.setattr(cli.sys, "argv", ["toolforge-jobs", *argv])
+
+    with pytest.raises(SystemExit) as exit:
+        cli.main()
+
+    assert exit.value.code == cli.CHECK_UNKNOWN
+    captured = capsys.readouterr()
+    assert captured.out.splitlines()[0].startswith("JOBS UNKNOWN - ")
+    assert captured.err.startswith("usage: ")
+
+
+def test_usage_error(monkeypatch):
+    monkeypatch.setattr(cli.sys, "argv", ["toolforge-jobs", "list", "--bogus"])
+
+    with pytest.raises(SystemExit) as exit:
+        cli.main()
+
+    assert exit.value.code == 2
@@ -0,0 +1,160 @@
+import os
+from pathlib import Path
+
+import pytest
+import toolforge_weld.config
+
+from tjf_cli import clientconfig, profiling
+from tjf_cli.clientconfig import load_client_config
+from tjf_cli.profiling import Profiler
+
+KUBECONFIG = """
+apiVersion: v1
+kind: Config
+current-context: default
+clusters:
+  - name: toolforge
+    cluster:
+      server: https://k8s.example.org:6443
+contexts:
+  - name: default
+    context:
+      cluster: toolforge
+      namespace: tool-test
+      user: tf-test
+users:
+  - name: tf-test
+    user:
+      client-certificate: client.crt
+      client-key: client.key
+"""
+
+
+@pytest.fixture()
+def config_files(tmp_path, monkeypatch):
+    kube_dir = tmp_path / "kube"
+    kube_dir.mkdir()
+    (kube_dir / "config").write_text(KUBECONFIG)
+    (kube_dir / "client.crt").write_text("cert")
+    (kube_dir / "client.key").write_text("key")
+
+    etc = tmp_path / "etc"
+    etc.mkdir()
+    (etc / "common.yaml").write_text("api_gateway:\n  url: https://api.example.org\n")
+
+    monkeypatch.setenv("KUBECONFIG", str(kube_dir / "config"))
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    monkeypatch.setattr(toolforge_weld.config, "CONFIGS_BASE_DIR", etc)
+    return tmp_path
+
+
+def count_loads(monkeypatch):
+    loads = []
+    load_config = clientconfig.load_config
+
+    def counting_load_config(*args, **kwargs):
+        loads.append(args)
+        return load_config(*args, **kwargs)
+
+    monkeypatch.setattr(clientconfig, "load_config", counting_load_config)
+    return loads
+
+
+def test_config_sources_match_load_config(config_files, monkeypatch):
+    # the cache is only invalidated by changes to these files, so they must be the ones
+    # load_config reads, in the same order
+    checked = []
+
+    class RecordingPath(type(Path())):
+        def exists(self):
+            checked.append(self)
+            return super().exists()
+
+    monkeypatch.setattr(toolforge_weld.config, "Path", RecordingPath)
+    clientconfig.load_config(clientconfig.CLIENT_NAME, extra_sections=[clientconfig.JobsConfig])
+
+    assert checked == clientconfig.config_sources()[1:]
+
+
+def test_load_client_config(config_files, monkeypatch):
+    loads = count_loads(monkeypatch)
+    cache_dir = config_files / "cache"
+
+    config = load_client_config(cache_dir=cache_dir)
+    assert config.server == "https://api.example.org/jobs/api/v1"
+    assert config.timeout == 30
+    assert config.kubeconfig.current_namespace == "tool-test"
+    assert config.kubeconfig.client_cert_file == config_files / "kube" / "client.crt"
+
+    assert load_client_config(cache_dir=cache_dir) == config
+    assert len(loads) == 1
+
+
+def test_load_client_config_profiling(config_files, monkeypatch):
+    profiler = Profiler()
+    monkeypatch.setattr(profiling, "_PROFILER", profiler)
+    cache_dir = config_files / "cache"
+
+    load_client_config(cache_dir=cache_dir)
+    load_client_config(cache_dir=cache_dir)
+
+    spans = [(span.name, span.args) for span in profiler.spans]
+    assert spans == [
+        ("read configuration cache", {"hit": False}),
+        ("load kubeconfig", {}),
+        ("load client configuration", {}),
+        ("read configuration cache", {"hit": True}),
+    ]
+
+
+def test_cache_invalidated_by_changes(config_files, monkeypatch):
+    loads = count_loads(monkeypatch)
+    cache_dir = config_files / "cache"
+    load_client_config(cache_dir=cache_dir)
+
+    # a config file that didn't exist before
+    (config_files / "config").mkdir()
+    (config_files / "config" / "toolforge.yaml").write_text("jobs:\n  timeout: 60\n")
+    assert load_client_config(cache_dir=cache_dir).timeout == 60
+    assert len(loads) == 2
+
+    kubeconfig = config_files / "kube" / "config"
+    kubeconfig.write_text(KUBECONFIG.replace("tool-test", "tool-other"))
+    stat = kubeconfig.stat()
+    os.utime(kubeconfig, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_client_config(cache_dir=cache_dir).kubeconfig.current_namespace == "tool-other"
+    assert len(loads) == 3
+
+
+def test_cache_not_used_for_missing_certificate(config_files, monkeypatch):
+    loads = count_loads(monkeypatch)
+    cache_dir = config_files / "cache"
+    load_client_config(cache_dir=cache_dir)
+
+    (config_files / "kube" / "client.key").unlink()
+    load_client_config(cache_dir=cache_dir)
+    assert len(loads) == 2
+
+
+def test_inline_credentials_not_cached(config_files, monkeypatch):
+    kubeconfig = config_files / "kube" / "config"
+    kubeconfig.write_text(
+        KUBECONFIG.replace("client-certificate: client.crt", "token: secret").replace(
+            "      client-key: client.key\n", ""
+        )
+    )
+    cache_dir = config_files / "cache"
+
+    assert load_client_config(cache_dir=cache_dir).kubeconfig.token == "secret"
+    assert not cache_dir.exists()
+
+
+def test_load_other_kubeconfig(config_files):
+    other = config_files / "kube" / "other"
+    other.write_text(KUBECONFIG.replace("tool-test", "tool-other"))
+
+    config = load_client_config(cache_dir=config_files / "cache", kubeconfig_path=other)
+    assert config.kubeconfig.current_namespace == "tool-other"
+    assert config.tool == "other"
+    assert load_client_config(cache_dir=config_files / "cache").tool == "test"
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from tjf_cli.cron import (
+    expand_hash_tokens,
+    format_time,
+    next_runs,
+    parse_schedule,
+    runs_between,
+    spread_schedule,
+)
+from tjf_cli.errors import TjfCliUserError
+
+NOW = datetime(2024, 2, 28, 10, 30, 15, tzinfo=timezone.utc)
+
+
+def runs(schedule, count=3):
+    return [format_time(run) for run in next_runs(schedule, count, NOW)]
+
+
+@pytest.mark.parametrize(
+    "schedule,expected",
+    [
+        ["* * * * *", ["2024-02-28T10:31:00Z", "2024-02-28T10:32:00Z", "2024-02-28T10:33:00Z"]],
+        ["*/20 * * * *", ["2024-02-28T10:40:00Z", "2024-02-28T11:00:00Z", "2024-02-28T11:20:00Z"]],
+        [
+            "5/30 9-10 * * *",
+            ["2024-02-28T10:35:00Z", "2024-02-29T09:05:00Z", "2024-02-29T09:35:00Z"],
+        ],
+        ["@daily", ["2024-02-29T00:00:00Z", "2024-03-01T00:00:00Z", "2024-03-02T00:00:00Z"]],
+        ["0 0 29 feb *", ["2024-02-29T00:00:00Z", "2028-02-29T00:00:00Z", "2032-02-29T00:00:00Z"]],
+        [
+            "0 12 * * sat,7",
+            ["2024-03-02T12:00:00Z", "2024-03-03T12:00:00Z", "2024-03-09T12:00:00Z"],
+        ],
+        # the day of month and the day of week are or-ed when both are restricted
+        ["0 0 1 * mon", ["2024-03-01T00:00:00Z", "2024-03-04T00:00:00Z", "2024-03-11T00:00:00Z"]],
+        ["0 0 31 2 *", []],
+    ],
+)
+def test_next_runs(schedule, expected):
+    assert runs(schedule) == expected
+
+
+@pytest.mark.parametrize(
+    "schedule", ["* * * *", "60 * * * *", "* * * * mon-foo", "*/0 * * * *", "5-1 * * * *"]
+)
+def test_parse_schedule_invalid(schedule):
+    with pytest.raises(TjfCliUserError):
+        parse_schedule(schedule)
+
+
+def test_runs_between():
+    schedules = {"a": parse_schedule("0 * * * *"), "b": parse_schedule("*/30 * * * *")}
+    start = datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 1, 11, 0, tzinfo=timezone.utc)
+
+    assert runs_between(schedules, start, end) == {
+        datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc): ["a", "b"],
+        datetime(2024, 1, 1, 10, 30, tzinfo=timezone.utc): ["b"],
+    }
+
+
+def test_expand_hash_tokens():
+    expanded = expand_hash_tokens("H H(2-4) * * H", "my-job")
+    minute, hour, _, _, weekday = expanded.split()
+
+    assert expanded == expand_hash_tokens("H H(2-4) * * H", "my-job")
+    assert 0 <= int(minute) <= 59 and 2 <= int(hour) <= 4 and 0 <= int(weekday) <= 6
+    assert expand_hash_tokens("0 0 * * THU", "my-job") == "0 0 * * THU"
+    parse_schedule(expand_hash_tokens("H/15 * * * *", "my-job"))
+
+
+def test_expand_hash_tokens_invalid():
+    with pytest.raises(TjfCliUserError):
+        expand_hash_tokens("H(50-70) * * * *", "my-job")
+
+
+def test_spread_schedule():
+    spread = {spread_schedule("0 * * * *", f"job-{i}").split()[0] for i in range(100)}
+    assert len(spread) > 30
+
+    assert spread_schedule("30 2 * * *", "job").split()[1:] == ["2", "*", "*", "*"]
+    assert spread_schedule("*/15 * * * *", "job").endswith("-59/15 * * * *")
+    assert spread_schedule("@daily", "job").endswith(" * * *")
+    assert spread_schedule("0,30 * * * *", "job") == "0,30 * * * *"
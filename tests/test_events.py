@@ -0,0 +1,55 @@
+from tjf_cli.events import JobStateTracker, utc_timestamp
+
+
+def job(name, status_short, started_at=None, **kwargs):
+    status_long = "Pod in 'Running' phase."
+    if started_at:
+        status_long += f" State 'running'. Started at '{started_at}'."
+    return {"name": name, "status_short": status_short, "status_long": status_long, **kwargs}
+
+
+def events(tracker, jobs):
+    return [(event.job, event.event) for event in tracker.update(jobs, "now")]
+
+
+def test_utc_timestamp():
+    assert utc_timestamp(0) == "1970-01-01T00:00:00Z"
+
+
+def test_tracker_reports_only_changes():
+    tracker = JobStateTracker()
+    assert events(tracker, [job("a", "Pending"), job("b", "Running", "t1")]) == [
+        ("a", "status"),
+        ("b", "status"),
+    ]
+    assert events(tracker, [job("a", "Pending"), job("b", "Running", "t1")]) == []
+
+    assert events(tracker, [job("a", "Running", "t1"), job("b", "Running", "t2")]) == [
+        ("a", "started"),
+        ("b", "restarted"),
+    ]
+    assert events(tracker, [job("a", "Failed"), job("c", "Pending")]) == [
+        ("a", "failed"),
+        ("c", "created"),
+        ("b", "deleted"),
+    ]
+    assert events(tracker, [job("a", "Failed"), job("c", "Completed")]) == [("c", "completed")]
+
+
+def test_tracker_cron_runs():
+    tracker = JobStateTracker()
+    tracker.update([job("cron", "Waiting for scheduled time")], "now")
+
+    assert events(tracker, [job("cron", "Last schedule time: 2024-01-01T10:00:00Z")]) == [
+        ("cron", "started")
+    ]
+    assert events(tracker, [job("cron", "Last schedule time: 2024-01-01T11:00:00Z")]) == [
+        ("cron", "started")
+    ]
+
+
+def test_tracker_restart_count():
+    tracker = JobStateTracker()
+    tracker.update([job("a", "Running", "t1", restart_count=0)], "now")
+
+    assert events(tracker, [job("a", "Running", "t1", restart_count=1)]) == [("a", "restarted")]
@@ -0,0 +1,59 @@
+import pytest
+
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.history import History, get_history_dir, snapshot_changes
+
+
+def job(name, **kwargs):
+    return {"name": name, "command": f"./{name}.sh", "image": "bullseye", **kwargs}
+
+
+def test_get_history_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path))
+    assert get_history_dir() == tmp_path / "toolforge-jobs-framework-cli" / "history"
+
+
+def test_record_and_read(tmp_path):
+    history = History(tmp_path)
+    assert history.latest() is None
+
+    first = history.record([job("b"), job("a")], "/data/jobs.yaml")
+    assert history.jobs(first) == [job("a"), job("b")]
+
+    # same jobs, no new snapshot
+    assert history.record([job("a"), job("b")]).id == first.id
+    assert len(history.snapshots()) == 1
+
+    second = history.record([job("a"), job("b", continuous=True), job("c")])
+    assert [snapshot.id for snapshot in history.snapshots()] == [second.id, first.id]
+    assert history.snapshots()[1].source == "/data/jobs.yaml"
+    assert snapshot_changes(first, second) == "+1 ~1 -0"
+    assert snapshot_changes(None, first) == "+2 ~0 -0"
+
+    # the unchanged job is stored once
+    assert len(list((tmp_path / "objects").iterdir())) == 4
+
+
+def test_prune(tmp_path):
+    history = History(tmp_path)
+    for i in range(5):
+        history.record([job("a"), job("b", retry=i)])
+
+    history.prune(keep=2)
+    snapshots = history.snapshots()
+    assert [history.jobs(snapshot)[1]["retry"] for snapshot in snapshots] == [4, 3]
+    assert len(list((tmp_path / "objects").iterdir())) == 3
+
+
+def test_missing_or_corrupted_objects(tmp_path):
+    history = History(tmp_path)
+    snapshot = history.record([job("a")])
+    path = tmp_path / "objects" / f"{snapshot.jobs['a']}.json"
+
+    path.write_text('{"name": "a"}')
+    with pytest.raises(TjfCliUserError, match="corrupted"):
+        history.jobs(snapshot)
+
+    path.unlink()
+    with pytest.raises(TjfCliUserError, match="missing"):
+        history.jobs(snapshot)
@@ -0,0 +1,167 @@
+from pathlib import Path
+
+import pytest
+
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.jobsfile import load_jobs_file
+
+
+def write(path: Path, content: str) -> str:
+    path.write_text(content)
+    return str(path)
+
+
+def test_load_plain_list(tmp_path: Path):
+    file = write(
+        tmp_path / "jobs.yaml",
+        """
+- name: test-job
+  command: ./myothercommand.py -v
+  image: bullseye
+""",
+    )
+
+    assert load_jobs_file(file, use_cache=False) == [
+        {"name": "test-job", "command": "./myothercommand.py -v", "image": "bullseye"}
+    ]
+
+
+def test_load_defaults_and_templates(tmp_path: Path):
+    file = write(
+        tmp_path / "jobs.yaml",
+        """
+defaults:
+  image: bullseye
+  emails: onfailure
+templates:
+  big:
+    mem: 2Gi
+    cpu: "2"
+jobs:
+  - name: small
+    command: ./small.sh
+  - name: large
+    command: ./large.sh
+    template: big
+    emails: all
+""",
+    )
+
+    assert load_jobs_file(file, use_cache=False) == [
+        {"name": "small", "command": "./small.sh", "image": "bullseye", "emails": "onfailure"},
+        {
+            "name": "large",
+            "command": "./large.sh",
+            "image": "bullseye",
+            "emails": "all",
+            "mem": "2Gi",
+            "cpu": "2",
+        },
+    ]
+
+
+def test_load_matrix(tmp_path: Path):
+    file = write(
+        tmp_path / "jobs.yaml",
+        """
+jobs:
+  - name: "crawler-{{ wiki }}-{{shard}}"
+    command: "./crawl.sh --wiki {{ wiki }} --shard {{shard}} --home ${HOME}"
+    image: bullseye
+    matrix:
+      wiki: [enwiki, dewiki]
+      shard: [1, 2]
+""",
+    )
+
+    jobs = load_jobs_file(file, use_cache=False)
+    assert [job["name"] for job in jobs] == [
+        "crawler-enwiki-1",
+        "crawler-enwiki-2",
+        "crawler-dewiki-1",
+        "crawler-dewiki-2",
+    ]
+    assert jobs[1]["command"] == "./crawl.sh --wiki enwiki --shard 2 --home ${HOME}"
+    assert "matrix" not in jobs[0]
+
+
+def test_load_include(tmp_path: Path):
+    write(
+        tmp_path / "common.yaml",
+        """
+defaults:
+  image: bullseye
+  mem: 1Gi
+templates:
+  quiet:
+    emails: none
+jobs:
+  - name: common-job
+    command: ./common.sh
+""",
+    )
+    file = write(
+        tmp_path / "jobs.yaml",
+        """
+include:
+  - common.yaml
+defaults:
+  mem: 2Gi
+jobs:
+  - name: my-job
+    command: ./mine.sh
+    template: quiet
+""",
+    )
+
+    assert load_jobs_file(file, use_cache=False) == [
+        {"name": "common-job", "command": "./common.sh", "image": "bullseye", "mem": "2Gi"},
+        {
+            "name": "my-job",
+            "command": "./mine.sh",
+            "image": "bullseye",
+            "mem": "2Gi",
+            "emails": "none",
+        },
+    ]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "foo: bar",
+        "jobs: {}",
+        "jobs: [{name: x, template: missing}]",
+        "jobs: [{name: 'x-{{ y }}', matrix: {z: [1]}}]",
+        "include: [jobs.yaml]",
+        # duplicate names, also from a matrix that doesn't use its variables in the name
+        "jobs: [{name: x, command: ./a.sh}, {name: x, command: ./b.sh}]",
+        "jobs: [{name: x, command: './{{ y }}.sh', matrix: {y: [a, b]}}]",
+    ],
+)
+def test_load_invalid(tmp_path: Path, content: str):
+    file = write(tmp_path / "jobs.yaml", content)
+
+    with pytest.raises(TjfCliUserError):
+        load_jobs_file(file, use_cache=False)
+
+
+def test_load_uses_cache(tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    write(tmp_path / "common.yaml", "defaults: {image: bullseye}")
+    file = write(
+        tmp_path / "jobs.yaml", "include: [common.yaml]\njobs: [{name: x, command: ./x.sh}]"
+    )
+
+    first = load_jobs_file(file, cache_dir=cache_dir)
+    assert len(list(cache_dir.iterdir())) == 1
+    assert load_jobs_file(file, cache_dir=cache_dir) == first
+
+    # changes in included files invalidate the cached data
+    write(tmp_path / "common.yaml", "defaults: {image: bookworm}")
+    assert load_jobs_file(file, cache_dir=cache_dir)[0]["image"] == "bookworm"
+
+    # and replace the entry of the file
+    write(tmp_path / "jobs.yaml", "include: [common.yaml]\njobs: [{name: y, command: ./y.sh}]")
+    assert load_jobs_file(file, cache_dir=cache_dir)[0]["name"] == "y"
+    assert len(list(cache_dir.iterdir())) == 1
@@ -4,6 +4,7 @@
 # it under the terms of the GNU General Public License as published by
 # the Free Software Foundation; either version 3 of the License, or
 # (at your option) any later version.
+import os
 from typing import Callable, Dict, Optional, Set
 
 import pytest
@@ -11,8 +12,17 @@ import pytest
 from toolforge_weld.api_client import ToolforgeClient
 from toolforge_weld.kubernetes_config import fake_kube_config
 
-from tjf_cli.loader import calculate_changes, jobs_are_same
+from tjf_cli.loader import (
+    BULK_WORKERS,
+    KNOWN_YAML_KEYS,
+    JobSelector,
+    calculate_changes,
+    job_api_to_config,
+    jobs_are_same,
+    prepare_schedules,
+)
 from tjf_cli.api import handle_http_exception
+from tjf_cli.errors import TjfCliUserError
 
 SIMPLE_TEST_JOB = {
     "name": "test-job",
@@ -42,6 +52,8 @@ def mock_api(requests_mock) -> ToolforgeClient:
     server = "http://nonexistent"
 
     requests_mock.get(f"{server}/list/", json=[SIMPLE_TEST_JOB_API])
+    requests_mock.get(f"{server}/jobs/test-job", json=SIMPLE_TEST_JOB_API)
+    requests_mock.get(f"{server}/jobs/foobar", status_code=404, json={"error": "not found"})
 
     yield ToolforgeClient(
         server=server,
@@ -97,12 +109,61 @@ def merge(first: Dict, second: Dict, unset=None) -> Dict:
         ],
         [merge(SIMPLE_TEST_JOB, {"filelog-stderr": "xyz"}), SIMPLE_TEST_JOB_API, False],
         [SIMPLE_TEST_JOB, merge(SIMPLE_TEST_JOB_API, {"filelog_stderr": "xyz"}), False],
+        # the same quantities, spelled differently
+        [
+            merge(SIMPLE_TEST_JOB, {"mem": "1Gi", "cpu": 0.5}),
+            merge(SIMPLE_TEST_JOB_API, {"memory": "1024Mi", "cpu": "500m"}),
+            True,
+        ],
+        [
+            merge(SIMPLE_TEST_JOB, {"mem": "1G"}),
+            merge(SIMPLE_TEST_JOB_API, {"memory": "1Gi"}),
+            False,
+        ],
+        # explicitly requesting the defaults
+        [merge(SIMPLE_TEST_JOB, {"mem": "512Mi", "cpu": "0.5"}), SIMPLE_TEST_JOB_API, True],
+        [SIMPLE_TEST_JOB, merge(SIMPLE_TEST_JOB_API, {"memory": "512Mi", "cpu": "500m"}), True],
+        [merge(SIMPLE_TEST_JOB, {"cpu": "1"}), SIMPLE_TEST_JOB_API, False],
+        [merge(SIMPLE_TEST_JOB, {"continuous": False}), SIMPLE_TEST_JOB_API, True],
+        # log paths relative to the home directory, or where the logs go anyway
+        [
+            merge(SIMPLE_TEST_JOB, {"filelog-stdout": "logs/../out.log"}),
+            merge(SIMPLE_TEST_JOB_API, {"filelog_stdout": os.path.expanduser("~/out.log")}),
+            True,
+        ],
+        [
+            merge(SIMPLE_TEST_JOB, {"filelog-stderr": "~/test-job.err"}),
+            SIMPLE_TEST_JOB_API,
+            True,
+        ],
+        [
+            merge(SIMPLE_TEST_JOB, {"filelog-stderr": "~/test-job.out"}),
+            SIMPLE_TEST_JOB_API,
+            False,
+        ],
     ],
 )
 def test_jobs_are_same(config: Dict, api: Dict, expected: bool):
     assert jobs_are_same(config, api) == expected
 
 
+@pytest.mark.parametrize(
+    "api",
+    [
+        SIMPLE_TEST_JOB_API,
+        merge(SIMPLE_TEST_JOB_API, {"schedule": "* * * * *", "retry": 2, "emails": "all"}),
+        merge(SIMPLE_TEST_JOB_API, {"continuous": True, "memory": "1Gi", "cpu": "1"}),
+        merge(SIMPLE_TEST_JOB_API, {"filelog": "False"}),
+        merge(SIMPLE_TEST_JOB_API, {"filelog_stdout": "xyz", "filelog_stderr": "abc"}),
+    ],
+)
+def test_job_api_to_config(api: Dict):
+    config = job_api_to_config(dict(api))
+
+    assert all(key in KNOWN_YAML_KEYS for key in config)
+    assert jobs_are_same(config, dict(api))
+
+
 @pytest.mark.parametrize(
     "jobs_data,filter,add,modify,delete,yaml_warning",
     [
@@ -151,6 +212,8 @@ def test_jobs_are_same(config: Dict, api: Dict, expected: bool):
         ],
         # unknown yaml keys
         [[merge(SIMPLE_TEST_JOB, {"xyz": "xyz"})], None, set(), set(), set(), True],
+        # dumped jobs load as a no-op
+        [[job_api_to_config(SIMPLE_TEST_JOB_API)], None, set(), set(), set(), False],
     ],
 )
 def test_calculate_changes(
@@ -169,3 +232,118 @@ def test_calculate_changes(
     assert result.modify == modify
     assert result.delete == delete
     assert yaml_warning == ("Unknown key" in caplog.text)
+
+
+@pytest.mark.parametrize(
+    "selector,matching,names",
+    [
+        [JobSelector(patterns=["test-job"]), {"test-job"}, {"test-job"}],
+        [JobSelector(patterns=["foobar"]), {"foobar"}, {"foobar"}],
+        [JobSelector(patterns=["test-*"]), {"test-job", "test-other"}, None],
+        [JobSelector(options={"image": "bullseye"}), {"test-job", "xyz"}, {"test-job", "xyz"}],
+        [JobSelector(patterns=["test-*"], options={"continuous": "true"}), set(), set()],
+    ],
+)
+def test_job_selector_resolve(selector: JobSelector, matching: Set[str], names: Set[str]):
+    filter, fetch = selector.resolve([SIMPLE_TEST_JOB, merge(SIMPLE_TEST_JOB, {"name": "xyz"})])
+
+    assert {n for n in ["test-job", "test-other", "foobar", "xyz"] if filter(n)} == matching
+    assert fetch == names
+
+
+def test_job_selector_from_args_invalid():
+    with pytest.raises(TjfCliUserError):
+        JobSelector.from_args(None, ["foo"])
+
+
+def test_calculate_changes_image_aliases(
+    requests_mock, mock_api: ToolforgeClient, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    requests_mock.get(
+        "http://nonexistent/images/",
+        json=[{"shortname": "bullseye", "image": "docker-registry.tools.wmflabs.org/bullseye"}],
+    )
+
+    # only looked up when the names differ
+    result = calculate_changes(mock_api, [SIMPLE_TEST_JOB], None)
+    assert result.modify == set()
+    assert requests_mock.call_count == 1
+
+    for _ in range(2):
+        jobs_data = [
+            merge(SIMPLE_TEST_JOB, {"image": "docker-registry.tools.wmflabs.org/bullseye"})
+        ]
+        result = calculate_changes(mock_api, jobs_data, None)
+        assert result.modify == set()
+
+    # and then cached
+    paths = [request.path for request in requests_mock.request_history]
+    assert paths == ["/list/", "/list/", "/images/", "/list/"]
+
+    result = calculate_changes(mock_api, [merge(SIMPLE_TEST_JOB, {"image": "python3.11"})], None)
+    assert result.modify == {"test-job"}
+
+
+def test_calculate_changes_fetches_only_named_jobs(requests_mock, mock_api: ToolforgeClient):
+    jobs_data = [merge(SIMPLE_TEST_JOB, {"mem": "2Gi"}), merge(SIMPLE_TEST_JOB, {"name": "foobar"})]
+    result = calculate_changes(
+        mock_api, jobs_data, lambda s: s in ("test-job", "foobar"), {"test-job", "foobar"}
+    )
+
+    assert result.add == {"foobar"}
+    assert result.modify == {"test-job"}
+    assert result.delete == set()
+    assert "/list/" not in [request.path for request in requests_mock.request_history]
+
+
+def test_calculate_changes_lists_many_named_jobs(requests_mock, mock_api: ToolforgeClient):
+    names = {f"job-{n}" for n in range(BULK_WORKERS + 1)} | {"test-job"}
+    result = calculate_changes(mock_api, [SIMPLE_TEST_JOB], lambda s: s in names, names)
+
+    assert result.add == result.modify == result.delete == set()
+    assert [request.path for request in requests_mock.request_history] == ["/list/"]
+
+
+def test_job_selector_select_api_jobs():
+    other = merge(SIMPLE_TEST_JOB_API, {"name": "other", "image": "python3.11"})
+    jobs = [SIMPLE_TEST_JOB_API, other]
+
+    assert JobSelector(patterns=["test-*"]).select_api_jobs(jobs) == [SIMPLE_TEST_JOB_API]
+    assert JobSelector(options={"image": "python3.11"}).select_api_jobs(jobs) == [other]
+    assert JobSelector().select_api_jobs(jobs) == jobs
+
+
+@pytest.mark.parametrize(
+    "selector,names",
+    [
+        [JobSelector(patterns=["a", "b", "a"]), ["a", "b"]],
+        [JobSelector(patterns=["a", "b*"]), None],
+        [JobSelector(patterns=["a"], options={"image": "bullseye"}), None],
+        [JobSelector(), None],
+    ],
+)
+def test_job_selector_literal_names(selector: JobSelector, names: Optional[list]):
+    assert selector.literal_names() == names
+
+
+def test_prepare_schedules():
+    jobs = [
+        merge(SIMPLE_TEST_JOB, {"schedule": "0 * * * *"}),
+        merge(SIMPLE_TEST_JOB, {"name": "kept", "schedule": "0 * * * *", "schedule-spread": False}),
+        merge(SIMPLE_TEST_JOB, {"name": "hashed", "schedule": "H 3 * * *"}),
+    ]
+    prepare_schedules(jobs, spread=True)
+
+    assert jobs[0]["schedule"] != "0 * * * *"
+    assert jobs[1] == merge(SIMPLE_TEST_JOB, {"name": "kept", "schedule": "0 * * * *"})
+    assert "H" not in jobs[2]["schedule"]
+
+    again = [merge(SIMPLE_TEST_JOB, {"schedule": "0 * * * *", "schedule-spread": True})]
+    prepare_schedules(again)
+    assert again[0]["schedule"] == jobs[0]["schedule"]
+
+
+def test_prepare_schedules_invalid():
+    with pytest.raises(TjfCliUserError):
+        prepare_schedules([merge(SIMPLE_TEST_JOB, {"schedule-spread": "yes"})])
@@ -0,0 +1,183 @@
+import gzip
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from tjf_cli import logs
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.logs import (
+    LogFilter,
+    RotatingLogWriter,
+    compression_for,
+    parse_duration,
+    parse_log_time,
+    parse_time_arg,
+)
+
+
+def line(message: str) -> str:
+    return json.dumps(
+        {
+            "pod": "job-abc",
+            "container": "job",
+            "datetime": "2024-01-01T10:00:00Z",
+            "message": message,
+        }
+    )
+
+
+def test_parse_duration():
+    assert parse_duration("30s") == 30
+    assert parse_duration("10m") == 600
+    assert parse_duration("2h") == 7200
+    assert parse_duration("1d") == 86400
+
+    with pytest.raises(TjfCliUserError):
+        parse_duration("1 week")
+
+
+def test_compression_for():
+    assert compression_for("job.jsonl.gz") == "gzip"
+    assert compression_for("job.jsonl.zst") == "zstd"
+    assert compression_for("job.jsonl") is None
+
+
+def test_writer_gzip(tmp_path):
+    path = tmp_path / "job.jsonl.gz"
+    with RotatingLogWriter(str(path), compression="gzip") as writer:
+        writer.write_line(line("first"))
+        writer.write_line(line("second") + "\n")
+
+    # appending to an existing file
+    with RotatingLogWriter(str(path), compression="gzip") as writer:
+        writer.write_line(line("third"))
+
+    with gzip.open(path, "rt") as f:
+        messages = [json.loads(raw)["message"] for raw in f]
+    assert messages == ["first", "second", "third"]
+
+
+def test_writer_rotates_by_size(tmp_path):
+    path = tmp_path / "job.jsonl"
+    with RotatingLogWriter(str(path), max_bytes=len(line("0")) * 2, keep=2) as writer:
+        for i in range(7):
+            writer.write_line(line(str(i)))
+
+    rotated = sorted(p.name for p in tmp_path.iterdir() if p.name != "job.jsonl")
+    assert len(rotated) == 2
+    assert all(name.startswith("job.") and name.endswith(".jsonl") for name in rotated)
+    assert [json.loads(raw)["message"] for raw in path.read_text().splitlines()] == ["6"]
+
+
+def test_writer_rotates_by_age(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(logs.time, "monotonic", lambda: now[0])
+
+    path = tmp_path / "job.jsonl.gz"
+    with RotatingLogWriter(str(path), compression="gzip", max_age=60) as writer:
+        writer.write_line(line("old"))
+        now[0] += 61
+        writer.write_line(line("new"))
+
+    files = sorted(tmp_path.iterdir())
+    assert len(files) == 2
+    assert all(p.name.endswith(".jsonl.gz") for p in files)
+    with gzip.open(path, "rt") as f:
+        assert [json.loads(raw)["message"] for raw in f] == ["new"]
+
+
+def test_writer_zstd_needs_module(tmp_path):
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        pytest.skip("zstandard is installed")
+
+    with pytest.raises(TjfCliUserError, match="zstandard"):
+        RotatingLogWriter(str(tmp_path / "job.jsonl.zst"), compression="zstd").write_line("{}")
+
+
+def log(message, when="2024-01-01T10:00:00Z", pod="job-abc"):
+    return json.dumps({"pod": pod, "container": "job", "datetime": when, "message": message})
+
+
+def test_parse_log_time():
+    expected = datetime(2024, 1, 1, 10, 0, 0, 123456, tzinfo=timezone.utc)
+    assert parse_log_time("2024-01-01T10:00:00.123456789Z") == expected
+    assert parse_log_time("2024-01-01T12:00:00.123456+02:00") == expected
+    assert parse_log_time("2024-01-01 10:00") == expected.replace(microsecond=0)
+
+    with pytest.raises(ValueError):
+        parse_log_time("yesterday")
+
+
+def test_parse_time_arg():
+    now = datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc)
+    assert parse_time_arg("2h", now) == datetime(2024, 1, 1, 8, 0, tzinfo=timezone.utc)
+    assert parse_time_arg("2024-01-01T09:00:00Z", now) == datetime(
+        2024, 1, 1, 9, 0, tzinfo=timezone.utc
+    )
+
+    with pytest.raises(TjfCliUserError):
+        parse_time_arg("yesterday", now)
+
+
+def test_log_filter_api_params():
+    log_filter = LogFilter(
+        grep="ERROR",
+        since=datetime(2024, 1, 1, 8, 0, tzinfo=timezone.utc),
+        pod="job-abc",
+        max_matches=1,
+    )
+    assert log_filter.api_params() == {
+        "grep": "ERROR",
+        "since": "2024-01-01T08:00:00Z",
+        "pod": "job-abc",
+    }
+    assert LogFilter().is_empty
+    assert not log_filter.is_empty
+
+
+def test_log_filter_matches():
+    log_filter = LogFilter(
+        grep="ERR(OR)?",
+        since=datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc),
+        until=datetime(2024, 1, 1, 11, 0, tzinfo=timezone.utc),
+        pod="job-",
+    )
+    lines = [
+        log("ERROR: first"),
+        log("all good"),
+        log("ERR too early", when="2024-01-01T08:59:59Z"),
+        log("ERR too late", when="2024-01-01T11:00:01Z"),
+        log("ERR other pod", pod="other-abc"),
+        log("ERR no time", when="garbage"),
+        log("ERR: second", when="2024-01-01T11:00:00Z"),
+    ]
+    assert [line["message"] for _, line in log_filter.filter(lines)] == [
+        "ERROR: first",
+        "ERR: second",
+    ]
+
+    with pytest.raises(TjfCliUserError):
+        LogFilter(grep="(")
+
+
+def test_log_filter_stops_early():
+    read = []
+
+    def lines():
+        for i in range(100):
+            read.append(i)
+            yield log(f"ERROR {i}")
+
+    matches = list(LogFilter(grep="ERROR", max_matches=2).filter(lines()))
+    assert [raw for raw, _ in matches] == [log("ERROR 0"), log("ERROR 1")]
+    assert read == [0, 1]
+
+    read.clear()
+    until = datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc)
+    assert list(LogFilter(until=until).filter(lines(), follow=True)) == []
+    assert read == [0]
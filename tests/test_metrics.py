@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import pytest
+
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.metrics import generate_metrics, generate_tools_metrics, write_textfile
+
+JOBS = [
+    {
+        "name": "cron-job",
+        "image": "bullseye",
+        "schedule": "0 * * * *",
+        "retry": 2,
+        "status_short": "Last schedule time: 2022-10-08T09:00:00Z",
+    },
+    {
+        "name": "daemon",
+        "image": "python3.11",
+        "continuous": True,
+        "retry": 0,
+        "memory": "1Gi",
+        "cpu": "500m",
+        "status_short": 'Running "ok"',
+    },
+]
+
+
+def test_generate_metrics():
+    content = generate_metrics(JOBS, 1234.5)
+    lines = content.splitlines()
+
+    assert "# TYPE toolforge_jobs_job_info gauge" in lines
+    assert (
+        'toolforge_jobs_job_info{job="cron-job",type="schedule",image="bullseye",'
+        'schedule="0 * * * *"} 1'
+    ) in lines
+    assert 'toolforge_jobs_job_status{job="cron-job",status="Last schedule time"} 1' in lines
+    assert 'toolforge_jobs_job_status{job="daemon",status="Running \\"ok\\""} 1' in lines
+    assert 'toolforge_jobs_job_retry_limit{job="cron-job"} 2' in lines
+    assert 'toolforge_jobs_job_memory_bytes{job="daemon"} 1073741824' in lines
+    assert 'toolforge_jobs_job_cpu_cores{job="daemon"} 0.500' in lines
+    assert not any(line.startswith('toolforge_jobs_job_cpu_cores{job="cron-job"') for line in lines)
+    assert "toolforge_jobs_jobs 2" in lines
+    assert "toolforge_jobs_last_update_timestamp_seconds 1234.5" in lines
+
+
+def test_generate_tools_metrics():
+    content = generate_tools_metrics({"alpha": JOBS, "beta": None}, 1234.5)
+    lines = content.splitlines()
+
+    assert 'toolforge_jobs_tool_up{tool="alpha"} 1' in lines
+    assert 'toolforge_jobs_tool_up{tool="beta"} 0' in lines
+    assert 'toolforge_jobs_job_retry_limit{tool="alpha",job="cron-job"} 2' in lines
+    assert 'toolforge_jobs_jobs{tool="alpha"} 2' in lines
+    assert not any('tool="beta",job=' in line for line in lines)
+    assert lines.count("# TYPE toolforge_jobs_job_info gauge") == 1
+    assert "toolforge_jobs_last_update_timestamp_seconds 1234.5" in lines
+
+
+def test_write_textfile(tmp_path: Path):
+    path = tmp_path / "jobs.prom"
+    write_textfile(str(path), "foo 1\n")
+
+    assert path.read_text() == "foo 1\n"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_write_textfile_failure(tmp_path: Path):
+    # renaming the file over a directory fails
+    path = tmp_path / "jobs.prom"
+    path.mkdir()
+    (path / "other").write_text("")
+
+    with pytest.raises(TjfCliUserError, match="Unable to write metrics file"):
+        write_textfile(str(path), "foo 1\n")
+
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_generate_metrics_restarts():
+    jobs = [
+        {"name": "a", "status_short": "Running", "restart_count": 3},
+        {"name": "b", "status_short": "Running", "status_long": "State 'running'."},
+    ]
+    lines = generate_metrics(jobs, 0).splitlines()
+
+    assert 'toolforge_jobs_job_restarts{job="a"} 3' in lines
+    assert not any(line.startswith('toolforge_jobs_job_restarts{job="b"') for line in lines)
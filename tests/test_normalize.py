@@ -0,0 +1,102 @@
+import time
+
+import pytest
+from toolforge_weld.api_client import ToolforgeClient
+from toolforge_weld.kubernetes_config import fake_kube_config
+
+from tjf_cli.api import handle_http_exception
+from tjf_cli.cache import write_cache
+from tjf_cli.normalize import (
+    IMAGES_CACHE_VERSION,
+    JobNormalizer,
+    _images_cache_key,
+    fetch_image_aliases,
+)
+
+SERVER = "http://nonexistent"
+IMAGES = [
+    {
+        "shortname": "bullseye",
+        "image": "docker-registry.tools.wmflabs.org/toolforge-bullseye:latest",
+    },
+    {"shortname": "python3.11", "image": "docker-registry.tools.wmflabs.org/python3.11:latest"},
+]
+
+
+@pytest.fixture()
+def api(requests_mock) -> ToolforgeClient:
+    requests_mock.get(f"{SERVER}/images/", json=IMAGES)
+    yield ToolforgeClient(
+        server=SERVER,
+        user_agent="xyz",
+        kubeconfig=fake_kube_config(),
+        exception_handler=handle_http_exception,
+    )
+
+
+def test_fetch_image_aliases(requests_mock, api, tmp_path):
+    aliases = fetch_image_aliases(api, tmp_path)
+    assert aliases["bullseye"] == "bullseye"
+    assert aliases["docker-registry.tools.wmflabs.org/python3.11:latest"] == "python3.11"
+
+    assert fetch_image_aliases(api, tmp_path) == aliases
+    assert requests_mock.call_count == 1
+
+    # refreshed once expired
+    write_cache(
+        _images_cache_key(SERVER),
+        {"version": IMAGES_CACHE_VERSION, "fetched_at": time.time() - 3600, "aliases": {}},
+        tmp_path,
+    )
+    assert fetch_image_aliases(api, tmp_path, max_age=60) == aliases
+    assert requests_mock.call_count == 2
+
+
+def test_same_image(requests_mock, api, tmp_path):
+    normalizer = JobNormalizer(api, cache_dir=tmp_path)
+    assert normalizer.same_image("bullseye", "bullseye")
+    assert requests_mock.call_count == 0
+
+    assert normalizer.same_image(
+        "docker-registry.tools.wmflabs.org/toolforge-bullseye:latest", "bullseye"
+    )
+    assert not normalizer.same_image("python3.11", "bullseye")
+    assert not normalizer.same_image(None, "bullseye")
+    assert requests_mock.call_count == 1
+
+
+def test_same_image_api_failure(requests_mock, api, tmp_path):
+    requests_mock.get(f"{SERVER}/images/", status_code=500, json={"error": "boom"})
+    normalizer = JobNormalizer(api, cache_dir=tmp_path)
+    assert not normalizer.same_image("docker-registry.tools.wmflabs.org/python3.11", "python3.11")
+
+
+@pytest.mark.parametrize(
+    "configured,current,expected",
+    [
+        ["1Gi", "1024Mi", True],
+        [None, "512Mi", True],
+        ["", None, True],
+        [2, "2000m", True],
+        ["1Gi", "1G", False],
+        ["lots", "lots", True],
+        ["lots", "512Mi", False],
+    ],
+)
+def test_same_quantity(configured, current, expected):
+    assert JobNormalizer().same_quantity(configured, current, "512Mi") == expected
+
+
+@pytest.mark.parametrize(
+    "configured,current,expected",
+    [
+        ["job.log", "/data/project/tool/job.log", True],
+        ["./logs//job.log", "/data/project/tool/logs/job.log", True],
+        ["/data/project/tool/job.out", None, True],
+        ["job.err", None, False],
+        ["job.log", "/data/project/other/job.log", False],
+    ],
+)
+def test_same_log_path(configured, current, expected):
+    normalizer = JobNormalizer(home="/data/project/tool")
+    assert normalizer.same_log_path("job", ".out", configured, current) == expected
@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from toolforge_weld.api_client import ToolforgeClient
+from toolforge_weld.kubernetes_config import fake_kube_config
+
+from tjf_cli.api import handle_http_exception
+from tjf_cli.profiling import Profiler
+
+
+@pytest.fixture()
+def mock_api(requests_mock) -> ToolforgeClient:
+    server = "http://nonexistent"
+
+    requests_mock.get(f"{server}/jobs/", json=[])
+
+    yield ToolforgeClient(
+        server=server,
+        user_agent="xyz",
+        kubeconfig=fake_kube_config(),
+        exception_handler=handle_http_exception,
+    )
+
+
+def test_profiler_records_requests(mock_api: ToolforgeClient, tmp_path: Path):
+    profiler = Profiler()
+    profiler.instrument_client(mock_api)
+
+    with profiler.span("command list"):
+        assert mock_api.get("/jobs/") == []
+        assert mock_api.get("/jobs/") == []
+
+    categories = [span.category for span in profiler.spans]
+    assert categories.count("http") == 2
+    assert categories.count("server") == 2
+    assert categories.count("phase") == 1
+
+    summary = profiler.summary()
+    assert "HTTP GET /jobs/" in summary
+    assert "command list" in summary
+
+    trace_file = tmp_path / "trace.json"
+    profiler.write_trace(str(trace_file))
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    assert len(events) == 5
+    assert all(event["ph"] == "X" for event in events)
@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+import pytest
+
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.quantity import format_cpu, format_memory, parse_quantity
+
+
+@pytest.mark.parametrize(
+    "quantity,expected",
+    [
+        ["1Gi", Decimal(1024**3)],
+        ["1024Mi", Decimal(1024**3)],
+        ["512Mi", Decimal(512 * 1024**2)],
+        ["1G", Decimal(10**9)],
+        ["500m", Decimal("0.5")],
+        ["0.5", Decimal("0.5")],
+        ["2", Decimal(2)],
+        [2, Decimal(2)],
+        [0.25, Decimal("0.25")],
+        ["1e3", Decimal(1000)],
+    ],
+)
+def test_parse_quantity(quantity, expected):
+    assert parse_quantity(quantity) == expected
+
+
+@pytest.mark.parametrize("quantity", ["", "abc", "1Xi", "Gi", "nan"])
+def test_parse_quantity_invalid(quantity):
+    with pytest.raises(TjfCliUserError):
+        parse_quantity(quantity)
+
+
+def test_format_quantities():
+    assert format_memory(parse_quantity("1536Mi")) == "1.5Gi"
+    assert format_memory(parse_quantity("512Mi")) == "512Mi"
+    assert format_memory(parse_quantity("100")) == "100"
+    assert format_cpu(parse_quantity("250m")) == "0.25"
@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from tjf_cli.resources import (
+    JobResources,
+    QuotaItem,
+    config_resources,
+    job_resources,
+    parse_quota,
+    provisioning_notes,
+    quota_problems,
+)
+from tjf_cli.status import JobStatus
+
+QUOTA = {
+    "categories": [
+        {
+            "name": "Running jobs",
+            "items": [
+                {
+                    "name": "Total running jobs at once (Kubernetes pods)",
+                    "limit": "16",
+                    "used": "2",
+                },
+                {"name": "CPU", "limit": "4", "used": "1"},
+                {"name": "Memory", "limit": "8Gi", "used": "1Gi"},
+            ],
+        },
+        {
+            "name": "Per-job limits",
+            "items": [{"name": "CPU", "limit": "3"}, {"name": "Memory", "limit": "8Gi"}],
+        },
+        {
+            "name": "Job definitions",
+            "items": [
+                {"name": "Cron jobs", "limit": "50", "used": "1"},
+                {"name": "Continuous jobs (including web services)", "limit": "3", "used": "1"},
+            ],
+        },
+    ]
+}
+LIMITS = parse_quota(QUOTA)
+
+
+def test_parse_quota():
+    assert LIMITS.running_memory == QuotaItem(limit=Decimal(8 * 2**30), used=Decimal(2**30))
+    assert LIMITS.job_cpu == QuotaItem(limit=Decimal(3))
+    assert LIMITS.continuous_jobs == QuotaItem(limit=Decimal(3), used=Decimal(1))
+    assert parse_quota({"categories": []}).job_memory == QuotaItem()
+
+
+def test_job_resources():
+    assert job_resources({"name": "a", "continuous": True, "memory": "1Gi"}) == JobResources(
+        name="a", type="continuous", memory=Decimal(2**30), cpu=Decimal("0.5")
+    )
+    assert config_resources({"name": "b", "schedule": "@daily", "cpu": "2"}) == JobResources(
+        name="b", type="schedule", memory=Decimal(512 * 2**20), cpu=Decimal(2)
+    )
+
+
+def test_provisioning_notes():
+    job = config_resources({"name": "a", "mem": "10Gi", "cpu": "1"})
+
+    assert provisioning_notes(job, LIMITS) == ["memory above the per-job limit"]
+    assert provisioning_notes(job, LIMITS, {"memory": "9.5Gi", "cpu": "100m"}) == [
+        "memory above the per-job limit",
+        "under-provisioned memory",
+        "over-provisioned cpu",
+    ]
+    assert provisioning_notes(
+        config_resources({"name": "a"}),
+        LIMITS,
+        {"memory": "500Mi", "cpu": "400m"},
+        JobStatus(status="Running", reason="OOMKilled"),
+    ) == ["under-provisioned memory (OOMKilled)"]
+
+
+def test_quota_problems():
+    continuous = [config_resources({"name": f"c{i}", "continuous": True}) for i in range(3)]
+    big_cron = config_resources({"name": "big", "schedule": "@daily", "mem": "9Gi"})
+
+    errors, warnings = quota_problems(LIMITS, continuous, [])
+    assert errors == ["there would be 4 continuous jobs, above the quota of 3"]
+    assert warnings == []
+
+    errors, warnings = quota_problems(LIMITS, continuous[:2], continuous[2:])
+    assert errors == []
+
+    errors, warnings = quota_problems(LIMITS, [big_cron], [])
+    assert errors == ["job 'big' requests 9Gi memory, above the per-job limit of 8Gi"]
+    assert warnings == [
+        "running all the new jobs at once needs 10Gi memory, above the quota of 8Gi"
+    ]
+
+    hungry = [
+        config_resources({"name": f"h{i}", "continuous": True, "mem": "4Gi"}) for i in range(2)
+    ]
+    errors, warnings = quota_problems(LIMITS, hungry, continuous[:1])
+    assert errors == ["continuous jobs would use 8.5Gi memory, above the quota of 8Gi"]
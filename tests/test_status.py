@@ -0,0 +1,59 @@
+from tjf_cli.status import JobStatus, parse_job_status
+
+
+def test_parse_job_status_from_hint():
+    status = parse_job_status(
+        {
+            "status_short": "Running",
+            "status_long": (
+                "Last run at 2022-10-08T09:28:37Z. Pod in 'Running' phase. "
+                "State 'running'. Started at '2022-10-08T09:28:39Z'. Restarted 2 times."
+            ),
+        }
+    )
+
+    assert status == JobStatus(
+        status="Running",
+        phase="Running",
+        container_state="running",
+        last_run="2022-10-08T09:28:37Z",
+        started_at="2022-10-08T09:28:39Z",
+        restart_count=2,
+    )
+    assert status.running and not status.completed and not status.failed
+
+
+def test_parse_job_status_waiting():
+    status = parse_job_status(
+        {
+            "status_short": "Not running",
+            "status_long": "Pod in 'Running' phase. State 'waiting' for reason 'CrashLoopBackOff'.",
+        }
+    )
+
+    assert status.container_state == "waiting"
+    assert status.reason == "CrashLoopBackOff"
+    assert status.started_at is None
+    assert status.restart_count is None
+    assert not status.running
+
+
+def test_parse_job_status_prefers_structured_fields():
+    status = parse_job_status(
+        {
+            "status_short": "Failed",
+            "status_long": "Pod in 'Running' phase. Restart count: 1",
+            "phase": "Failed",
+            "restart_count": "4",
+        }
+    )
+
+    assert status.phase == "Failed"
+    assert status.restart_count == 4
+    assert status.failed
+
+
+def test_parse_job_status_missing():
+    status = parse_job_status({"name": "foo"})
+
+    assert status == JobStatus(status="Unknown")
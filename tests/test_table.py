@@ -0,0 +1,64 @@
+import io
+
+import pytest
+from tabulate import tabulate
+
+from tjf_cli.table import format_job_field, job_table_columns, write_pretty_table
+
+JOBS = [
+    {
+        "name": "cron-job",
+        "cmd": "./run.sh --count 0010",
+        "image": "bullseye",
+        "image_state": "stable",
+        "filelog": "True",
+        "filelog_stdout": None,
+        "schedule": "0 * * * *",
+        "retry": 2,
+        "status_short": "Last schedule time: 2022-10-08T09:00:00Z",
+    },
+    {
+        "name": "daemon",
+        "cmd": "1e3",
+        "image": "python3.9",
+        "image_state": "deprecated",
+        "filelog": "False",
+        "continuous": True,
+        "retry": 0,
+        "memory": "1Gi",
+        "cpu": "500m",
+        "status_short": "  Running  ",
+    },
+]
+
+KEYS = ["name", "cmd", "type", "image", "filelog", "filelog_stdout", "resources", "retry"]
+
+
+def test_format_job_field():
+    assert format_job_field(JOBS[0], "type") == "schedule: 0 * * * *"
+    assert format_job_field(JOBS[1], "type") == "continuous"
+    assert format_job_field(JOBS[1], "image") == "python3.9 (deprecated)"
+    assert format_job_field(JOBS[1], "resources") == "mem: 1Gi, cpu: 500m"
+    assert format_job_field(JOBS[0], "retry") == "yes: 2 time(s)"
+    assert format_job_field(JOBS[1], "filelog_stderr") == "Unknown"
+    assert format_job_field(JOBS[0], "status_long") is None
+
+
+@pytest.mark.parametrize(
+    "jobs",
+    [
+        JOBS,
+        [],
+        [dict(JOBS[0], cmd="./käse.sh")],
+        [dict(JOBS[0], cmd="multiple\nlines")],
+    ],
+)
+def test_write_pretty_table_matches_tabulate(jobs):
+    headers = [f"{key}:" for key in KEYS]
+    rows = [[format_job_field(job, key) for key in KEYS] for job in jobs]
+    expected = tabulate(rows, headers=headers, tablefmt="pretty") + "\n"
+
+    output = io.StringIO()
+    write_pretty_table(headers, job_table_columns(jobs, KEYS), output)
+
+    assert output.getvalue() == expected
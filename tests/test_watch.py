@@ -0,0 +1,29 @@
+import os
+
+from tjf_cli.watch import FileWatcher, file_signature
+
+
+def test_file_signature(tmp_path):
+    path = tmp_path / "jobs.yaml"
+    missing = str(tmp_path / "missing.yaml")
+    path.write_text("- name: one\n")
+
+    signature = file_signature([str(path), missing])
+    assert signature[missing] is None
+    assert file_signature([str(path), missing]) == signature
+
+    path.write_text("- name: one\n- name: two\n")
+    assert file_signature([str(path), missing]) != signature
+
+    # editors replacing the file with a new one
+    replacement = tmp_path / "jobs.yaml.new"
+    replacement.write_text(path.read_text())
+    signature = file_signature([str(path)])
+    os.rename(replacement, path)
+    assert file_signature([str(path)]) != signature
+
+
+def test_watcher_without_inotify(tmp_path):
+    watcher = FileWatcher(use_inotify=False)
+    watcher.wait([str(tmp_path / "jobs.yaml")], 0)
+    watcher.close()
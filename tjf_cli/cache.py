@@ -0,0 +1,57 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+import hashlib
+import json
+import os
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Optional
+
+LOGGER = getLogger(__name__)
+
+CACHE_DIR_NAME = "toolforge-jobs-framework-cli"
+
+
+def get_cache_dir() -> Path:
+    """Returns the directory used for client-side caches, following the XDG spec."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / CACHE_DIR_NAME
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_cache(name: str, cache_dir: Optional[Path] = None) -> Optional[Any]:
+    """Reads a cache entry. Returns None if it doesn't exist or is not readable."""
+    path = (cache_dir or get_cache_dir()) / name
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        LOGGER.debug("ignoring unreadable cache entry '%s': %s", path, e)
+        return None
+
+
+def write_cache(name: str, data: Any, cache_dir: Optional[Path] = None) -> None:
+    """Writes a cache entry atomically. Failures are not fatal, the cache is just skipped."""
+    directory = cache_dir or get_cache_dir()
+    path = directory / name
+    temp_path = directory / f"{name}~{os.getpid()}"
+    try:
+        directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+        with open(temp_path, "w") as f:
+            json.dump(data, f)
+        temp_path.rename(path)
+    except Exception as e:
+        LOGGER.debug("unable to write cache entry '%s': %s", path, e)
+        try:
+            temp_path.unlink()
+        except Exception:
+            pass
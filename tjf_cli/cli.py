@@ -9,15 +9,24 @@
 #
 from __future__ import annotations
 
+import fnmatch
 import json
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from enum import Enum
+import os
+from glob import glob
 from os import environ
+from os.path import abspath
+from pathlib import Path
 from tabulate import tabulate
-from typing import List, Optional, Set, Any
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
 import textwrap
 import argparse
 import getpass
+import requests
 import urllib3
 import logging
 import socket
@@ -26,12 +35,51 @@ import yaml
 import sys
 
 from toolforge_weld.api_client import ToolforgeClient
-from toolforge_weld.config import Section, load_config
-from toolforge_weld.kubernetes_config import Kubeconfig
 
+from tjf_cli import profiling
 from tjf_cli.api import TjfCliHttpUserError, TjfCliConfigLoadError, handle_http_exception
+from tjf_cli.clientconfig import ClientConfig, load_client_config
+from tjf_cli.cron import (
+    expand_hash_tokens,
+    format_time,
+    next_runs,
+    parse_schedule,
+    runs_between,
+)
 from tjf_cli.errors import TjfCliError, TjfCliUserError, print_error_context
-from tjf_cli.loader import calculate_changes
+from tjf_cli.events import JobStateTracker, utc_timestamp
+from tjf_cli.history import History, snapshot_changes
+from tjf_cli.jobsfile import load_jobs_file
+from tjf_cli.logs import (
+    LogFilter,
+    RotatingLogWriter,
+    compression_for,
+    parse_duration,
+    parse_time_arg,
+)
+from tjf_cli.loader import (
+    BULK_WORKERS,
+    JOB_TYPES,
+    JobSelector,
+    LoadChanges,
+    calculate_changes,
+    diff_jobs,
+    job_api_to_config,
+    prepare_schedules,
+)
+from tjf_cli.metrics import generate_metrics, generate_tools_metrics, write_textfile
+from tjf_cli.normalize import JobNormalizer
+from tjf_cli.quantity import format_cpu, format_memory, parse_quantity
+from tjf_cli.resources import (
+    config_resources,
+    job_resources,
+    parse_quota,
+    provisioning_notes,
+    quota_problems,
+)
+from tjf_cli.status import JobStatus, parse_job_status
+from tjf_cli.table import format_job_field, job_table_columns, write_pretty_table
+from tjf_cli.watch import FileSignature, FileWatcher, file_signature
 
 # TODO: disable this for now, review later
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -40,10 +88,38 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 WAIT_TIMEOUT = 60 * 5
 WAIT_SLEEP = 5
 
+# for schedule-report: how many hours to look ahead, and the width of the histogram bars
+SCHEDULE_REPORT_HOURS = 24
+SCHEDULE_REPORT_WIDTH = 50
+
+# for events --follow: how often to poll the job list
+EVENTS_INTERVAL = 10
+
+# for load --transactional: how many jobs to restore at the same time
+ROLLBACK_WORKERS = 8
+
+# for load --watch: how often to check the jobs file, and to compare all the jobs with the API
+WATCH_POLL_INTERVAL = 2
+WATCH_RESYNC_INTERVAL = 300
+
+# with several --kubeconfig: the commands supported, and how many tools to query at the same time
+TOOLS_OPERATIONS = ["list", "quota", "show", "export-metrics"]
+TOOLS_WORKERS = 8
+
+
+T = TypeVar("T")
 
 EXIT_USER_ERROR = 1
 EXIT_INTERNAL_ERROR = 2
 
+# the exit codes of check, following the conventions of Nagios plugins
+CHECK_OK = 0
+CHECK_DRIFTED = 1
+CHECK_MISSING = 2
+CHECK_UNKNOWN = 3
+# how many job names to show for each kind of difference
+CHECK_MAX_NAMES = 5
+
 
 JOB_TABULATION_HEADERS_SHORT = {
     "name": "Job name:",
@@ -72,22 +148,6 @@ IMAGES_TABULATION_HEADERS = {
 }
 
 
-@dataclass
-class JobsConfig(Section):
-    _NAME_: str = field(default="jobs", init=False)
-    jobs_endpoint: str = "/jobs/api/v1"
-    timeout: int = 30
-
-    @classmethod
-    def from_dict(cls, my_dict: dict[str, Any]):
-        params = {}
-        if "jobs_endpoint" in my_dict:
-            params["jobs_endpoint"] = my_dict["jobs_endpoint"]
-        if "timeout" in my_dict:
-            params["timeout"] = my_dict["timeout"]
-        return cls(**params)
-
-
 class ListDisplayMode(Enum):
     NORMAL = "normal"
     LONG = "long"
@@ -102,12 +162,60 @@ class ListDisplayMode(Enum):
         return self.value
 
 
+class _ArgumentParser(argparse.ArgumentParser):
+    """
+    With probe=True, usage errors are reported like `check` reports any other failure to check,
+    as monitoring only reads the first line and the exit code.
+    """
+
+    def __init__(self, *args, probe: bool = False, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.probe = probe
+
+    def error(self, message: str):
+        if not self.probe:
+            super().error(message)
+
+        print(f"JOBS UNKNOWN - {message}", flush=True)
+        self.print_usage(sys.stderr)
+        sys.exit(CHECK_UNKNOWN)
+
+
+def _add_bulk_arguments(parser: argparse.ArgumentParser, action: str, wait_help: str):
+    parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="name",
+        help=f"name of the job to {action} (glob patterns allowed, can be repeated)",
+    )
+    parser.add_argument(
+        "--selector",
+        required=False,
+        action="append",
+        metavar="KEY=VALUE",
+        help=f"{action} only the jobs with this option value, as in `dump` (can be repeated)",
+    )
+    parser.add_argument(
+        "--type",
+        required=False,
+        choices=JOB_TYPES,
+        help=f"{action} only the jobs of this type",
+    )
+    parser.add_argument(
+        "--wait",
+        required=False,
+        action="store_true",
+        help=f"{wait_help}. Timeout is {WAIT_TIMEOUT} seconds.",
+    )
+
+
 def parse_args():
     toolforge_cli_in_use = "TOOLFORGE_CLI" in environ
     toolforge_cli_debug = environ.get("TOOLFORGE_DEBUG", "0") == "1"
+    profile_env = environ.get("TOOLFORGE_JOBS_PROFILE", "0") == "1"
 
     description = "Toolforge Jobs Framework, command line interface"
-    parser = argparse.ArgumentParser(
+    parser = _ArgumentParser(
         description=description, prog="toolforge jobs" if toolforge_cli_in_use else None
     )
 
@@ -117,6 +225,27 @@ def parse_args():
         help=argparse.SUPPRESS if toolforge_cli_in_use else "activate debug mode",
         default=toolforge_cli_debug,
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print how long each phase and API request took (or set TOOLFORGE_JOBS_PROFILE=1)",
+        default=profile_env,
+    )
+    parser.add_argument(
+        "--profile-output",
+        required=False,
+        metavar="FILE",
+        help="with --profile, also write the timings to FILE in the Chrome trace format",
+        default=environ.get("TOOLFORGE_JOBS_PROFILE_OUTPUT", None),
+    )
+
+    parser.add_argument(
+        "--kubeconfig",
+        action="append",
+        metavar="PATH",
+        help="run the command for the tool of each of these kubeconfig files (glob patterns "
+        f"allowed, can be repeated), only with {', '.join(TOOLS_OPERATIONS)}",
+    )
 
     subparser = parser.add_subparsers(
         help="possible operations (pass -h to know usage of each)",
@@ -181,11 +310,19 @@ def parse_args():
         "Defaults to '%(default)s'.",
     )
 
+    runparser.add_argument(
+        "--no-quota-check",
+        required=False,
+        action="store_true",
+        help="don't check if the quota allows the job before creating it",
+    )
+
     runparser_exclusive_group = runparser.add_mutually_exclusive_group()
     runparser_exclusive_group.add_argument(
         "--schedule",
         required=False,
-        help="run a job with a cron-like schedule (example '1 * * * *')",
+        help="run a job with a cron-like schedule (example '1 * * * *', "
+        "or 'H * * * *' for a minute derived from the job name)",
     )
     runparser_exclusive_group.add_argument(
         "--continuous", required=False, action="store_true", help="run a continuous job"
@@ -201,7 +338,20 @@ def parse_args():
         "show",
         help="show details of a job of your own in Toolforge",
     )
-    showparser.add_argument("name", help="job name")
+    showparser.add_argument(
+        "names", nargs="+", metavar="name", help="job name (glob patterns allowed, can be repeated)"
+    )
+    showparser.add_argument(
+        "--json", required=False, action="store_true", help="print the jobs as a JSON list"
+    )
+    showparser.add_argument(
+        "--next",
+        required=False,
+        type=int,
+        default=0,
+        metavar="N",
+        help="for scheduled jobs, also show the next N times they will run",
+    )
 
     logs_parser = subparser.add_parser(
         "logs",
@@ -223,6 +373,70 @@ def parse_args():
         help="number of recent log lines to display",
     )
 
+    logs_parser.add_argument(
+        "--grep",
+        required=False,
+        metavar="REGEX",
+        help="only show the lines matching this regular expression",
+    )
+    logs_parser.add_argument(
+        "--since",
+        required=False,
+        metavar="TIME",
+        help="only show the lines after this time (example 2024-01-31T22:00:00Z) "
+        "or this long ago (example 12h)",
+    )
+    logs_parser.add_argument(
+        "--until",
+        required=False,
+        metavar="TIME",
+        help="only show the lines before this time, or this long ago",
+    )
+    logs_parser.add_argument(
+        "--pod",
+        required=False,
+        help="only show the lines of this pod (or pods starting with this name)",
+    )
+    logs_parser.add_argument(
+        "--max-matches",
+        required=False,
+        type=int,
+        metavar="N",
+        help="stop after N matching lines",
+    )
+    logs_parser.add_argument(
+        "--output-file",
+        required=False,
+        metavar="FILE",
+        help="append the log lines to FILE as JSON lines, instead of printing them",
+    )
+    logs_parser.add_argument(
+        "--compress",
+        required=False,
+        choices=["gzip", "zstd", "none"],
+        help="with --output-file, how to compress the file (defaults to gzip for FILE.gz, "
+        "zstd for FILE.zst, or none)",
+    )
+    logs_parser.add_argument(
+        "--rotate-size",
+        required=False,
+        metavar="SIZE",
+        help="with --output-file, start a new file once this much was written (example 100Mi)",
+    )
+    logs_parser.add_argument(
+        "--rotate-interval",
+        required=False,
+        metavar="DURATION",
+        help="with --output-file, start a new file this often (example 1d)",
+    )
+    logs_parser.add_argument(
+        "--keep",
+        required=False,
+        type=int,
+        metavar="N",
+        help="with --output-file, remove the oldest rotated files beyond the N most recent",
+    )
+
     listparser = subparser.add_parser(
         "list",
         help="list all running jobs of your own in Toolforge",
@@ -235,6 +449,12 @@ def parse_args():
         default=ListDisplayMode.NORMAL,
         help="specify output format (defaults to %(default)s)",
     )
+    listparser.add_argument(
+        "--next-run",
+        required=False,
+        action="store_true",
+        help="show when each scheduled job will run next",
+    )
     # deprecated, remove in a few releases
     listparser.add_argument(
         "-l",
@@ -248,7 +468,7 @@ def parse_args():
         "delete",
         help="delete a running job of your own in Toolforge",
     )
-    deleteparser.add_argument("name", help="job name")
+    _add_bulk_arguments(deleteparser, "delete", "wait until the jobs are gone")
 
     subparser.add_parser(
         "flush",
@@ -260,14 +480,174 @@ def parse_args():
         help="flush all jobs and load a YAML file with job definitions and run them",
     )
     loadparser.add_argument("file", help="path to YAML file to load")
-    loadparser.add_argument("--job", required=False, help="load a single job only")
+    loadparser.add_argument(
+        "--job",
+        required=False,
+        action="append",
+        help="load only the jobs with this name (glob patterns allowed, can be repeated)",
+    )
+    loadparser.add_argument(
+        "--selector",
+        required=False,
+        action="append",
+        metavar="KEY=VALUE",
+        help="load only the jobs with this option value in the file (can be repeated)",
+    )
+    loadparser.add_argument(
+        "--transactional",
+        required=False,
+        action="store_true",
+        help="if loading any job fails, restore all changed jobs to their previous definitions",
+    )
+    loadparser.add_argument(
+        "--no-quota-check",
+        required=False,
+        action="store_true",
+        help="don't check if the quota allows the changes before making them",
+    )
+    loadparser.add_argument(
+        "--watch",
+        required=False,
+        action="store_true",
+        help="keep running, and apply the changes each time the file is modified",
+    )
+    loadparser.add_argument(
+        "--resync-interval",
+        required=False,
+        default=f"{WATCH_RESYNC_INTERVAL}s",
+        metavar="DURATION",
+        help="with --watch, how often to compare all the jobs with the file, to undo changes "
+        f"made by hand (default: {WATCH_RESYNC_INTERVAL}s)",
+    )
+    loadparser.add_argument(
+        "--spread-schedules",
+        required=False,
+        action="store_true",
+        help="run scheduled jobs at a minute derived from their name, instead of all at once",
+    )
+
+    checkparser = subparser.add_parser(
+        "check",
+        help="compare the jobs with a YAML file without changing them, for monitoring probes",
+        probe=True,
+    )
+    checkparser.add_argument("file", help="path to YAML file to compare with")
+    checkparser.add_argument(
+        "--spread-schedules",
+        required=False,
+        action="store_true",
+        help="compare with the schedules `load --spread-schedules` would use",
+    )
+
+    historyparser = subparser.add_parser(
+        "history", help="list the job sets applied by previous `load` runs"
+    )
+    historyparser.add_argument(
+        "--limit",
+        required=False,
+        type=int,
+        metavar="N",
+        help="only show the N most recent snapshots",
+    )
+
+    rollbackparser = subparser.add_parser(
+        "rollback", help="restore the jobs to how a previous `load` left them"
+    )
+    rollbackparser.add_argument(
+        "steps",
+        nargs="?",
+        type=int,
+        default=1,
+        metavar="N",
+        help="how many snapshots back to go, as numbered by `history` (default: 1)",
+    )
+    rollbackparser.add_argument(
+        "--dry-run",
+        required=False,
+        action="store_true",
+        help="only show what would change",
+    )
 
     restartparser = subparser.add_parser("restart", help="restarts a running job")
-    restartparser.add_argument("name", help="job name")
+    _add_bulk_arguments(restartparser, "restart", "wait until the jobs are running again")
 
     subparser.add_parser("quota", help="display quota information")
 
-    return parser.parse_args()
+    dumpparser = subparser.add_parser(
+        "dump", help="write the definitions of all your jobs in the YAML format used by `load`"
+    )
+    dumpparser.add_argument(
+        "file", nargs="?", help="path to the YAML file to write (defaults to standard output)"
+    )
+
+    metricsparser = subparser.add_parser(
+        "export-metrics", help="write job status metrics in the Prometheus textfile format"
+    )
+    metricsparser.add_argument("file", help="path to the .prom file to write")
+    metricsparser.add_argument(
+        "--interval",
+        required=False,
+        type=int,
+        help="keep running, refreshing the metrics every INTERVAL seconds",
+    )
+
+    resourcesparser = subparser.add_parser(
+        "resources", help="compare the resources requested by your jobs with your quota"
+    )
+    resourcesparser.add_argument(
+        "--usage",
+        required=False,
+        metavar="FILE",
+        help="YAML or JSON file with the memory and cpu each job actually uses, "
+        "to find over- and under-provisioned jobs",
+    )
+
+    schedulereportparser = subparser.add_parser(
+        "schedule-report", help="show how many scheduled jobs run at each minute of the hour"
+    )
+    schedulereportparser.add_argument(
+        "--hours",
+        required=False,
+        type=int,
+        default=SCHEDULE_REPORT_HOURS,
+        help="how many hours from now to include in the report (defaults to %(default)s)",
+    )
+
+    eventsparser = subparser.add_parser(
+        "events", help="show lifecycle events (started, failed, completed...) of your jobs"
+    )
+    eventsparser.add_argument(
+        "names", nargs="*", help="only show events of these jobs (glob patterns allowed)"
+    )
+    eventsparser.add_argument(
+        "-f",
+        "--follow",
+        required=False,
+        action="store_true",
+        help="keep running, showing new events as they happen",
+    )
+    eventsparser.add_argument(
+        "--interval",
+        required=False,
+        type=int,
+        default=EVENTS_INTERVAL,
+        help="with --follow, check for new events every INTERVAL seconds "
+        "(defaults to %(default)s)",
+    )
+    eventsparser.add_argument(
+        "--json", required=False, action="store_true", help="print each event as a JSON object"
+    )
+
+    args, unknown = parser.parse_known_args()
+    # options the operation doesn't know are only found by the main parser
+    error_parser = checkparser if args.operation == "check" else parser
+    if unknown:
+        error_parser.error(f"unrecognized arguments: {' '.join(unknown)}")
+    if args.operation == "load" and args.watch and (args.job or args.selector):
+        parser.error("--watch can't be used with --job or --selector")
+    if args.kubeconfig and args.operation not in TOOLS_OPERATIONS:
+        error_parser.error(f"--kubeconfig only works with {', '.join(TOOLS_OPERATIONS)}")
+    return args
 
 
 def op_images(api: ToolforgeClient):
@@ -282,66 +662,24 @@ def op_images(api: ToolforgeClient):
 
 
 def job_prepare_for_output(api: ToolforgeClient, job, headers: List[str], suppress_hints=True):
-    schedule = job.get("schedule", None)
-    cont = job.get("continuous", None)
-    retry = job.get("retry")
-    if schedule is not None:
-        job["type"] = f"schedule: {schedule}"
-        job.pop("schedule", None)
-    elif cont is not None:
-        job["type"] = "continuous"
-        job.pop("continuous", None)
-    else:
-        job["type"] = "normal"
-
-    filelog = job.get("filelog", "false")
-    if filelog == "True":
-        job["filelog"] = "yes"
-    else:
-        job["filelog"] = "no"
-
-    if retry == 0:
-        job["retry"] = "no"
-    else:
-        job["retry"] = f"yes: {retry} time(s)"
-
-    mem = job.pop("memory", "default")
-    cpu = job.pop("cpu", "default")
-    if mem == "default" and cpu == "default":
-        job["resources"] = "default"
-    else:
-        job["resources"] = f"mem: {mem}, cpu: {cpu}"
-
-    if suppress_hints:
-        if job.get("status_long", None) is not None:
-            job.pop("status_long", None)
-    else:
-        job["status_long"] = textwrap.fill(job.get("status_long", "Unknown"))
-
-    if job["image_state"] != "stable":
-        job["image"] += " ({})".format(job["image_state"])
-
-    # not interested in these fields ATM
-    for key in job.copy():
-        if key not in headers:
-            logging.debug(f"supressing job API field '{key}' before output")
-            job.pop(key)
-
-    # normalize key names for easier printing
+    prepared = {}
     for key in headers:
         if key == "status_long" and suppress_hints:
             continue
 
-        oldkey = key
-        newkey = headers[key]
-        job[newkey] = job.pop(oldkey, "Unknown")
+        # normalize key names for easier printing
+        prepared[headers[key]] = format_job_field(job, key, suppress_hints=suppress_hints)
+
+    # not interested in the other fields ATM
+    job.clear()
+    job.update(prepared)
 
 
 def _list_jobs(api: ToolforgeClient):
     return api.get("/jobs/")
 
 
-def op_list(api: ToolforgeClient, output_format: ListDisplayMode):
+def op_list(api: ToolforgeClient, output_format: ListDisplayMode, next_run: bool = False):
     list = _list_jobs(api)
 
     if len(list) == 0:
@@ -359,16 +697,17 @@ def op_list(api: ToolforgeClient, output_format: ListDisplayMode):
         else:
             headers = JOB_TABULATION_HEADERS_SHORT
 
-        for job in list:
-            logging.debug(f"job information from the API: {job}")
-            job_prepare_for_output(api, job, headers=headers, suppress_hints=True)
+        if next_run:
+            headers = {**headers, "next_run": "Next run:"}
 
-        output = tabulate(list, headers=headers, tablefmt="pretty")
+        # hints are only displayed by 'show'
+        keys = [key for key in headers if key != "status_long"]
+        with profiling.span("format table", jobs=len(list)):
+            columns = job_table_columns(list, keys)
+            write_pretty_table([headers[key] for key in keys], columns, sys.stdout)
     except Exception as e:
         raise TjfCliError("Failed to format job table") from e
 
-    print(output)
-
 
 def _wait_for_job(api: ToolforgeClient, name: str):
     curtime = starttime = time.time()
@@ -381,20 +720,48 @@ def _wait_for_job(api: ToolforgeClient, name: str):
             logging.info(f"job '{name}' completed (and already deleted)")
             return
 
-        if job["status_short"] == "Completed":
+        status = parse_job_status(job)
+        if status.completed:
             logging.info(f"job '{name}' completed")
             return
 
-        if job["status_short"] == "Failed":
+        if status.failed:
             logging.error(f"job '{name}' failed:")
-            op_show(api, name)
+            op_show(api, [name])
             sys.exit(EXIT_USER_ERROR)
 
     logging.error(f"timed out {WAIT_TIMEOUT} seconds waiting for job '{name}' to complete:")
-    op_show(api, name)
+    op_show(api, [name])
     sys.exit(EXIT_INTERNAL_ERROR)
 
 
+def _check_quota(api: ToolforgeClient, added: List[dict], removed: List[dict]):
+    # added are job configurations, removed are job API objects
+    try:
+        limits = parse_quota(api.get("/quota/"))
+    except (TjfCliError, requests.exceptions.RequestException) as e:
+        logging.warning(f"unable to check the quota, continuing anyway: {e}")
+        return
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        logging.warning(f"unable to understand the quota, continuing anyway: {e!r}")
+        return
+
+    errors, warnings = quota_problems(
+        limits,
+        [config_resources(job) for job in added],
+        [job_resources(job) for job in removed],
+    )
+    for warning in warnings:
+        logging.warning(warning)
+
+    if errors:
+        raise TjfCliUserError(
+            "Not enough quota: "
+            + "; ".join(errors)
+            + ". Use --no-quota-check to make the changes anyway"
+        )
+
+
 def op_run(
     api: ToolforgeClient,
     name: str,
@@ -410,13 +777,19 @@ def op_run(
     cpu: Optional[str],
     retry: int,
     emails: str,
+    check_quota: bool = False,
 ):
+    if check_quota:
+        with profiling.span("check quota"):
+            job = {"name": name, "schedule": schedule, "continuous": continuous}
+            _check_quota(api, [{**job, "mem": mem, "cpu": cpu}], [])
+
     payload = {"name": name, "imagename": image, "cmd": command, "emails": emails, "retry": retry}
 
     if continuous:
         payload["continuous"] = True
     elif schedule:
-        payload["schedule"] = schedule
+        payload["schedule"] = expand_hash_tokens(schedule, name)
 
     payload["filelog"] = not no_filelog
 
@@ -464,40 +837,114 @@ def _show_job(api: ToolforgeClient, name: str, missing_ok: bool):
     return job
 
 
-def op_show(api: ToolforgeClient, name):
-    job = _show_job(api, name, missing_ok=False)
+def _select_jobs(api: ToolforgeClient, selector: JobSelector) -> List[dict]:
+    names = selector.literal_names()
+    if names is not None and len(names) <= BULK_WORKERS:
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            return list(executor.map(lambda name: _show_job(api, name, False), names))
+
+    jobs = selector.select_api_jobs(_list_jobs(api))
+    if names is not None:
+        found = {job["name"] for job in jobs}
+        for name in names:
+            if name not in found:
+                raise TjfCliUserError(f"Job '{name}' does not exist")
+
+    return jobs
+
+
+def _next_runs(job: dict, count: int) -> List[str]:
+    schedule = job.get("schedule", None)
+    if not schedule or count < 1:
+        return []
+    try:
+        return [format_time(run) for run in next_runs(schedule, count)]
+    except TjfCliUserError as e:
+        logging.warning(f"unable to calculate the next runs of job '{job['name']}': {e}")
+        return []
+
+
+def _format_job(
+    api: ToolforgeClient, job: dict, next_run_count: int = 0, tool: Optional[str] = None
+) -> str:
+    runs = _next_runs(job, next_run_count)
     job_prepare_for_output(api, job, suppress_hints=False, headers=JOB_TABULATION_HEADERS_LONG)
+    if runs:
+        job["Next runs:"] = "\n".join(runs)
 
     # change table direction
-    kvlist = []
+    kvlist = [] if tool is None else [["Tool:", tool]]
     for key in job:
         kvlist.append([key, job[key]])
 
     try:
-        output = tabulate(kvlist, tablefmt="grid")
+        return tabulate(kvlist, tablefmt="grid")
     except Exception as e:
         raise TjfCliError("Failed to format job display") from e
 
-    print(output)
+
+def op_show(
+    api: ToolforgeClient, names: List[str], output_json: bool = False, next_run_count: int = 0
+):
+    jobs = _select_jobs(api, JobSelector(patterns=names))
+    if not jobs:
+        raise TjfCliUserError(f"No jobs match '{' '.join(names)}'")
+
+    if output_json:
+        if next_run_count:
+            for job in jobs:
+                job["next_runs"] = _next_runs(job, next_run_count)
+        print(json.dumps(jobs, indent=2))
+        return
+
+    for i, job in enumerate(jobs):
+        if i > 0:
+            print()
+        print(_format_job(api, job, next_run_count))
 
 
-def op_logs(api: ToolforgeClient, name: str, follow: bool, last: Optional[int]):
+def op_logs(
+    api: ToolforgeClient,
+    name: str,
+    follow: bool,
+    last: Optional[int],
+    output: Optional[RotatingLogWriter] = None,
+    log_filter: Optional[LogFilter] = None,
+):
     params = {"follow": "true" if follow else "false"}
     if last:
         params["lines"] = last
+    if log_filter is not None:
+        params.update(log_filter.api_params())
 
     try:
-        for raw_line in api.get_raw_lines(
+        raw_lines = api.get_raw_lines(
             f"/jobs/{name}/logs",
             params=params,
-        ):
-            parsed = json.loads(raw_line)
+        )
+        if log_filter is None or log_filter.is_empty:
+            lines = ((raw_line, None) for raw_line in raw_lines)
+        else:
+            # the API might not filter, so check again
+            lines = log_filter.filter(raw_lines, follow)
+
+        for raw_line, parsed in lines:
+            if output is not None:
+                # stored as received
+                output.write_line(raw_line)
+                continue
+
+            if parsed is None:
+                parsed = json.loads(raw_line)
             print(f"{parsed['datetime']} [{parsed['pod']}] {parsed['message']}")
     except KeyboardInterrupt:
         pass
+    finally:
+        if output is not None:
+            output.close()
 
 
-def op_delete(api: ToolforgeClient, name: str):
+def _delete_job(api: ToolforgeClient, name: str):
     try:
         api.delete(f"/jobs/{name}")
     except TjfCliHttpUserError as e:
@@ -506,7 +953,60 @@ def op_delete(api: ToolforgeClient, name: str):
             return
         raise e
 
-    logging.debug("job was deleted")
+    logging.debug(f"job '{name}' was deleted")
+
+
+def _restart_job(api: ToolforgeClient, name: str):
+    try:
+        api.post(f"/jobs/{name}/restart")
+    except TjfCliHttpUserError as e:
+        if e.status_code == 404:
+            raise TjfCliUserError(f"Job '{name}' does not exist") from e
+        raise e
+
+    logging.debug(f"job '{name}' was restarted")
+
+
+def _resolve_targets(
+    api: ToolforgeClient, selector: JobSelector, jobs: Optional[List[dict]] = None
+) -> List[str]:
+    names = selector.literal_names()
+    if names is not None:
+        return names
+    return [job["name"] for job in selector.select_api_jobs(jobs or _list_jobs(api))]
+
+
+def _run_bulk(api: ToolforgeClient, names: List[str], func, action: str):
+    with ThreadPoolExecutor(max_workers=BULK_WORKERS) as executor:
+        futures = {name: executor.submit(func, api, name) for name in names}
+
+    failed = []
+    for name, future in futures.items():
+        error = future.exception()
+        if error is None:
+            continue
+        if len(names) == 1:
+            raise error
+
+        logging.error(f"failed to {action} job '{name}': {error}")
+        failed.append(name)
+
+    if failed:
+        raise TjfCliUserError(f"Failed to {action} {len(failed)} of {len(names)} job(s)")
+
+
+def op_delete(api: ToolforgeClient, selector: JobSelector, wait: bool = False):
+    if selector.is_empty():
+        raise TjfCliUserError("No jobs to delete were given, use `flush` to delete all jobs")
+
+    names = _resolve_targets(api, selector)
+    if not names:
+        logging.warning("no jobs match, nothing to delete")
+        return
+
+    _run_bulk(api, names, _delete_job, "delete")
+    if wait:
+        _wait_for_deletion(api, set(names))
 
 
 def op_flush(api: ToolforgeClient):
@@ -514,10 +1014,7 @@ def op_flush(api: ToolforgeClient):
     logging.debug("all jobs were flushed (if any existed anyway, we didn't check)")
 
 
-def _delete_and_wait(api: ToolforgeClient, names: Set[str]):
-    for name in names:
-        op_delete(api, name)
-
+def _wait_for_deletion(api: ToolforgeClient, names: Set[str]):
     curtime = starttime = time.time()
     while curtime - starttime < WAIT_TIMEOUT:
         logging.debug(f"waiting for {len(names)} job(s) to be gone, sleeping {WAIT_SLEEP} seconds")
@@ -532,6 +1029,11 @@ def _delete_and_wait(api: ToolforgeClient, names: Set[str]):
     raise TjfCliError("Timed out while waiting for old jobs to be deleted")
 
 
+def _delete_and_wait(api: ToolforgeClient, names: Set[str]):
+    _run_bulk(api, sorted(names), _delete_job, "delete")
+    _wait_for_deletion(api, names)
+
+
 def _load_job(api: ToolforgeClient, job: dict, n: int):
     # these are mandatory
     try:
@@ -577,20 +1079,311 @@ def _load_job(api: ToolforgeClient, job: dict, n: int):
     )
 
 
-def op_load(api: ToolforgeClient, file: str, job_name: Optional[str]):
-    try:
-        with open(file) as f:
-            jobslist = yaml.safe_load(f.read())
-    except Exception as e:
-        raise TjfCliUserError(f"Unable to parse yaml file '{file}'") from e
+def _rollback_load(api: ToolforgeClient, changes: LoadChanges, attempted: List[str]):
+    """Restores the jobs touched by a failed load to their previous definitions."""
+    current = {job["name"] for job in _list_jobs(api)}
+    report = []
+
+    # remove whatever this load managed to create, so the old definitions can be restored
+    created = {name for name in attempted if name in current}
+    if created:
+        _delete_and_wait(api, created)
+        current -= created
+    for name in sorted(created):
+        if name not in changes.previous:
+            report.append([name, "removed new job"])
+
+    to_restore = [name for name in sorted(changes.previous) if name not in current]
+
+    def restore(name: str):
+        _load_job(api, job_api_to_config(changes.previous[name]), 0)
+
+    with ThreadPoolExecutor(max_workers=ROLLBACK_WORKERS) as executor:
+        futures = {name: executor.submit(restore, name) for name in to_restore}
+
+    for name, future in futures.items():
+        error = future.exception()
+        if error is None:
+            report.append([name, "restored previous definition"])
+        else:
+            logging.debug(f"failed to restore job '{name}': {error}")
+            report.append([name, f"FAILED to restore previous definition: {error}"])
+
+    for name in sorted(changes.previous):
+        if name not in futures:
+            report.append([name, "unchanged"])
+
+    logging.warning("rolled back the changes made by this load:")
+    print(tabulate(report, headers=["Job name:", "Rollback:"], tablefmt="simple"))
+
+
+def op_load(
+    api: ToolforgeClient,
+    file: str,
+    selector: JobSelector,
+    transactional: bool = False,
+    spread_schedules: bool = False,
+    check_quota: bool = False,
+):
+    with profiling.span("parse jobs file"):
+        jobslist = load_jobs_file(file)
+        prepare_schedules(jobslist, spread=spread_schedules)
 
     logging.debug(f"loaded content from YAML file '{file}':")
     logging.debug(f"{jobslist}")
 
-    changes = calculate_changes(
-        api, jobslist, (lambda name: name == job_name) if job_name else None
+    with profiling.span("calculate changes"):
+        if selector.is_empty():
+            changes = calculate_changes(api, jobslist, None)
+        else:
+            filter, names = selector.resolve(jobslist)
+            changes = calculate_changes(api, jobslist, filter, names)
+
+    _apply_load(api, jobslist, changes, transactional, check_quota)
+
+    with profiling.span("record snapshot"):
+        _record_snapshot(jobslist, abspath(file), None if selector.is_empty() else filter)
+
+
+def _apply_load(
+    api: ToolforgeClient,
+    jobslist: List[dict],
+    changes: LoadChanges,
+    transactional: bool = False,
+    check_quota: bool = False,
+):
+    if check_quota and (changes.add or changes.modify):
+        # before deleting anything
+        with profiling.span("check quota"):
+            configs = {job["name"]: job for job in jobslist if "name" in job}
+            _check_quota(
+                api,
+                [configs[name] for name in sorted({*changes.add, *changes.modify})],
+                [changes.previous[name] for name in sorted(changes.previous)],
+            )
+
+    attempted: List[str] = []
+    try:
+        _apply_changes(api, jobslist, changes, attempted)
+    except BaseException:
+        if not transactional:
+            raise
+
+        logging.error("loading jobs failed, restoring the previous job definitions")
+        _rollback_load(api, changes, attempted)
+        raise
+
+
+def _load_wanted_jobs(file: str, spread_schedules: bool, sources: Dict[str, str]) -> List[dict]:
+    jobslist = load_jobs_file(file, sources=sources)
+    prepare_schedules(jobslist, spread=spread_schedules)
+    for n, job in enumerate(jobslist, start=1):
+        if "name" not in job:
+            raise TjfCliUserError(
+                f"Unable to load job number {n}: missing configuration parameter name"
+            )
+    return jobslist
+
+
+def _refresh_jobs(
+    api: ToolforgeClient, current: Dict[str, dict], names: Optional[Set[str]] = None
+) -> Dict[str, dict]:
+    """Updates the known API objects of the given jobs, or of all of them."""
+    if names is None or len(names) > BULK_WORKERS:
+        return {job["name"]: job for job in _list_jobs(api)}
+
+    refreshed = {name: job for name, job in current.items() if name not in names}
+    with ThreadPoolExecutor(max_workers=BULK_WORKERS) as executor:
+        jobs = executor.map(lambda name: _show_job(api, name, missing_ok=True), sorted(names))
+    for job in jobs:
+        if job is not None:
+            refreshed[job["name"]] = job
+    return refreshed
+
+
+def _reconcile(
+    api: ToolforgeClient,
+    jobslist: List[dict],
+    current: Dict[str, dict],
+    names: Optional[Set[str]],
+    transactional: bool,
+    check_quota: bool,
+) -> Dict[str, dict]:
+    """Applies the changes needed for the given jobs, or all of them. Returns the new state."""
+    current = _refresh_jobs(api, current, names)
+    changes = diff_jobs(
+        {job["name"]: job for job in jobslist if names is None or job["name"] in names},
+        {name: job for name, job in current.items() if names is None or name in names},
+        JobNormalizer(api),
+    )
+    if changes.is_empty():
+        return current
+
+    logging.info(
+        f"applying changes: {len(changes.add)} new, {len(changes.modify)} modified and "
+        f"{len(changes.delete)} deleted job(s)"
     )
+    _apply_load(api, jobslist, changes, transactional, check_quota)
+    return _refresh_jobs(api, current, {*changes.add, *changes.modify, *changes.delete})
+
+
+def op_load_watch(
+    api: ToolforgeClient,
+    file: str,
+    transactional: bool = False,
+    spread_schedules: bool = False,
+    check_quota: bool = False,
+    resync_interval: int = WATCH_RESYNC_INTERVAL,
+    poll_interval: float = WATCH_POLL_INTERVAL,
+    iterations: Optional[int] = None,
+):
+    """
+    Keeps the jobs in sync with the jobs file. When the file changes, only the jobs whose
+    definitions were edited are compared with their API objects. All the jobs are compared every
+    resync_interval seconds, which also undoes the changes made by hand.
+    """
+    watcher = FileWatcher()
+    paths = [abspath(os.path.expanduser(file))]
+    signature: Optional[FileSignature] = None
+    jobslist: Optional[List[dict]] = None
+    # the definitions already acted on, by name
+    handled: Dict[str, dict] = {}
+    current: Dict[str, dict] = {}
+    last_resync: Optional[float] = None
+
+    try:
+        while iterations is None or iterations > 0:
+            if iterations is not None:
+                iterations -= 1
+
+            new_signature = file_signature(paths)
+            if new_signature != signature:
+                # taken before reading the files, so changes made meanwhile are seen next time
+                signature = new_signature
+                sources: Dict[str, str] = {}
+                try:
+                    jobslist = _load_wanted_jobs(file, spread_schedules, sources)
+                except TjfCliUserError as e:
+                    logging.error(f"{e}, keeping the previous jobs until the file is fixed")
+                else:
+                    if set(sources) != set(paths):
+                        # the includes changed
+                        paths = sorted(sources)
+                        signature = file_signature(paths)
+
+            resync = last_resync is None or time.monotonic() - last_resync >= resync_interval
+            wanted = {job["name"]: job for job in jobslist or []}
+            edited = {
+                name
+                for name in {*wanted, *handled}
+                if wanted.get(name, None) != handled.get(name, None)
+            }
+
+            if jobslist is not None and (resync or edited):
+                try:
+                    if resync:
+                        last_resync = time.monotonic()
+                    current = _reconcile(
+                        api,
+                        jobslist,
+                        current,
+                        None if resync else edited,
+                        transactional,
+                        check_quota,
+                    )
+                    if edited:
+                        _record_snapshot(jobslist, abspath(file))
+                except (TjfCliError, requests.exceptions.RequestException) as e:
+                    # including network errors, this keeps running unattended
+                    logging.error(
+                        f"failed to apply the jobs file, retrying at the next resync: {e}"
+                    )
+                handled = wanted
+
+            if iterations != 0:
+                watcher.wait(paths, poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def _check_names(names: Set[str]) -> str:
+    shown = sorted(names)[:CHECK_MAX_NAMES]
+    if len(names) > CHECK_MAX_NAMES:
+        shown.append(f"and {len(names) - CHECK_MAX_NAMES} more")
+    return ", ".join(shown)
+
+
+def op_check(api: ToolforgeClient, file: str, spread_schedules: bool = False) -> int:
+    """
+    Compares the jobs with the jobs file, with a single request to the API, and prints a one-line
+    summary. Returns CHECK_MISSING if jobs in the file don't exist, CHECK_DRIFTED if others differ
+    from their definitions or aren't in the file, and CHECK_OK otherwise.
+    """
+    with profiling.span("parse jobs file"):
+        jobslist = _load_wanted_jobs(file, spread_schedules, {})
+
+    with profiling.span("calculate changes"):
+        changes = calculate_changes(api, jobslist, None)
+
+    in_sync = len({job["name"] for job in jobslist} - changes.add - changes.modify)
+    problems = []
+    if changes.add:
+        problems.append(f"{len(changes.add)} missing ({_check_names(changes.add)})")
+    if changes.modify:
+        problems.append(f"{len(changes.modify)} drifted ({_check_names(changes.modify)})")
+    if changes.delete:
+        problems.append(f"{len(changes.delete)} not in file ({_check_names(changes.delete)})")
+
+    if changes.add:
+        status, code = "CRITICAL", CHECK_MISSING
+    elif changes.modify or changes.delete:
+        status, code = "WARNING", CHECK_DRIFTED
+    else:
+        status, code = "OK", CHECK_OK
+
+    summary = "; ".join(problems) if problems else f"{in_sync} job(s) in sync"
+    perfdata = (
+        f"in_sync={in_sync} missing={len(changes.add)} drifted={len(changes.modify)} "
+        f"not_in_file={len(changes.delete)}"
+    )
+    print(f"JOBS {status} - {summary} | {perfdata}")
+    return code
+
+
+def _record_snapshot(
+    jobslist: List[dict],
+    source: str,
+    filter: Optional[Callable[[str], bool]] = None,
+):
+    """
+    Saves the loaded jobs in the history. With a filter, only those jobs were loaded, and they
+    are merged into the latest snapshot. Without one, listing all the jobs to find the others
+    would undo the point of loading only some, so the history starts at the next full load.
+    """
+    history = History()
+    try:
+        if filter is not None:
+            latest = history.latest()
+            if latest is None:
+                logging.debug("no snapshot to add the loaded jobs to, not saving them")
+                return
+            jobslist = [job for job in history.jobs(latest) if not filter(job["name"])] + [
+                job for job in jobslist if filter(job["name"])
+            ]
+
+        snapshot = history.record(jobslist, source)
+    except (OSError, TjfCliUserError) as e:
+        logging.warning(f"unable to save the loaded jobs in the history: {e}")
+        return
+
+    logging.debug(f"loaded jobs saved as snapshot {snapshot.id[:12]}")
 
+
+def _apply_changes(
+    api: ToolforgeClient, jobslist: List[dict], changes: LoadChanges, attempted: List[str]
+):
     if len(changes.delete) > 0 or len(changes.modify) > 0:
         _delete_and_wait(api, {*changes.delete, *changes.modify})
 
@@ -604,6 +1397,7 @@ def op_load(api: ToolforgeClient, file: str, job_name: Optional[str]):
         if name not in changes.add and name not in changes.modify:
             continue
 
+        attempted.append(name)
         try:
             _load_job(api, job, n)
         except TjfCliUserError as e:
@@ -612,15 +1406,139 @@ def op_load(api: ToolforgeClient, file: str, job_name: Optional[str]):
             raise TjfCliError(f"Failed to load job {name}") from e
 
 
-def op_restart(api: ToolforgeClient, name: str):
+def op_history(limit: Optional[int] = None):
+    snapshots = History().snapshots()
+    if not snapshots:
+        logging.info("no snapshots yet, they are saved each time `load` succeeds")
+        return
+
+    rows = []
+    for n, snapshot in enumerate(snapshots[:limit]):
+        previous = snapshots[n + 1] if n + 1 < len(snapshots) else None
+        rows.append(
+            [
+                n,
+                snapshot.id[:12],
+                snapshot.time,
+                len(snapshot.jobs),
+                snapshot_changes(previous, snapshot),
+                snapshot.source or "",
+            ]
+        )
+
+    print(
+        tabulate(
+            rows,
+            headers=["N:", "Snapshot:", "Time:", "Jobs:", "Changes:", "Source:"],
+            tablefmt="simple",
+        )
+    )
+
+
+def op_rollback(api: ToolforgeClient, steps: int = 1, dry_run: bool = False):
+    history = History()
+    snapshots = history.snapshots()
+    if steps < 0 or steps >= len(snapshots):
+        raise TjfCliUserError(
+            f"Unable to roll back {steps} snapshot(s), the history has {len(snapshots)} "
+            "(see `toolforge-jobs history`)"
+        )
+
+    target = snapshots[steps]
+    jobslist = history.jobs(target)
+    with profiling.span("calculate changes"):
+        changes = calculate_changes(api, jobslist, None)
+
+    report = (
+        [[name, "delete"] for name in sorted(changes.delete)]
+        + [[name, "restore previous definition"] for name in sorted(changes.modify)]
+        + [[name, "create"] for name in sorted(changes.add)]
+    )
+    if not report:
+        logging.info(f"the jobs already match snapshot {target.id[:12]} from {target.time}")
+        return
+
+    print(tabulate(report, headers=["Job name:", "Change:"], tablefmt="simple"))
+    if dry_run:
+        return
+
+    if changes.delete or changes.modify:
+        _delete_and_wait(api, {*changes.delete, *changes.modify})
+
+    configs = {job["name"]: job for job in jobslist}
+
+    def restore(api: ToolforgeClient, name: str):
+        # recreating the definitions, not waiting for one-off jobs to run again
+        config = {key: value for key, value in configs[name].items() if key != "wait"}
+        _load_job(api, config, 0)
+
+    to_load = sorted({*changes.add, *changes.modify})
+    if to_load:
+        _run_bulk(api, to_load, restore, "restore")
+
     try:
-        api.post(f"/jobs/{name}/restart")
-    except TjfCliHttpUserError as e:
-        if e.status_code == 404:
-            raise TjfCliUserError(f"Job '{name}' does not exist") from e
-        raise e
+        history.record(jobslist, f"rollback to {target.id[:12]}")
+    except OSError as e:
+        logging.warning(f"unable to save the rolled back jobs in the history: {e}")
+
+    logging.info(f"rolled back to snapshot {target.id[:12]} from {target.time}")
 
-    logging.debug("job was restarted")
+
+def _is_restarted(before: JobStatus, after: JobStatus, scheduled: bool) -> bool:
+    if scheduled:
+        # cron jobs only run again at their next scheduled time
+        return not before.running or after.started_at != before.started_at
+    return after.running and (before.started_at is None or after.started_at != before.started_at)
+
+
+def _wait_for_restart(api: ToolforgeClient, before: Dict[str, dict]):
+    pending = set(before)
+
+    curtime = starttime = time.time()
+    while curtime - starttime < WAIT_TIMEOUT:
+        logging.debug(
+            f"waiting for {len(pending)} job(s) to be running again, sleeping {WAIT_SLEEP} seconds"
+        )
+        time.sleep(WAIT_SLEEP)
+        curtime = time.time()
+
+        jobs = {job["name"]: job for job in _list_jobs(api) if job["name"] in pending}
+        for name in sorted(pending):
+            if name not in jobs:
+                logging.warning(f"job '{name}' was deleted while waiting for it to restart")
+                pending.discard(name)
+            elif _is_restarted(
+                parse_job_status(before[name]),
+                parse_job_status(jobs[name]),
+                bool(jobs[name].get("schedule", None)),
+            ):
+                logging.info(f"job '{name}' was restarted")
+                pending.discard(name)
+
+        if not pending:
+            return
+
+    raise TjfCliError(
+        f"Timed out while waiting for job(s) to be running again: {', '.join(sorted(pending))}"
+    )
+
+
+def op_restart(api: ToolforgeClient, selector: JobSelector, wait: bool = False):
+    if selector.is_empty():
+        raise TjfCliUserError("No jobs to restart were given")
+
+    # with --wait, the state before restarting is needed to know when each job was restarted
+    jobs = _list_jobs(api) if wait else None
+    names = _resolve_targets(api, selector, jobs)
+    if not names:
+        logging.warning("no jobs match, nothing to restart")
+        return
+
+    before = {job["name"]: job for job in jobs or [] if job["name"] in names}
+
+    _run_bulk(api, names, _restart_job, "restart")
+    if wait:
+        _wait_for_restart(api, before)
 
 
 def op_quota(api: ToolforgeClient):
@@ -648,6 +1566,358 @@ def op_quota(api: ToolforgeClient):
         print(tabulate(items, tablefmt="simple", headers="keys"))
 
 
+def _load_usage(file: Optional[str]) -> Dict[str, dict]:
+    if not file:
+        return {}
+
+    try:
+        with open(file) as f:
+            usage = yaml.safe_load(f)
+    except (OSError, yaml.YAMLError) as e:
+        raise TjfCliUserError(f"Unable to read usage file '{file}': {e}") from e
+
+    if not isinstance(usage, dict) or not all(isinstance(v, dict) for v in usage.values()):
+        raise TjfCliUserError(
+            f"Invalid usage file '{file}', expected a mapping of job names to their memory and cpu"
+        )
+    return usage
+
+
+def _with_percentage(value: str, amount: Decimal, limit: Optional[Decimal]) -> str:
+    if not limit:
+        return value
+    return f"{value} ({amount / limit:.0%})"
+
+
+def op_resources(api: ToolforgeClient, usage_file: Optional[str]):
+    usage = _load_usage(usage_file)
+    jobs = _list_jobs(api)
+    limits = parse_quota(api.get("/quota/"))
+
+    rows = []
+    totals = {"continuous": [Decimal(0), Decimal(0)], "all": [Decimal(0), Decimal(0)]}
+    for job in sorted(jobs, key=lambda job: job["name"]):
+        try:
+            resources = job_resources(job)
+        except TjfCliUserError as e:
+            logging.warning(f"ignoring job '{job['name']}': {e}")
+            continue
+
+        for key in ("continuous", "all"):
+            if key == "all" or resources.type == key:
+                totals[key][0] += resources.memory
+                totals[key][1] += resources.cpu
+
+        notes = provisioning_notes(
+            resources, limits, usage.get(resources.name, None), parse_job_status(job)
+        )
+        rows.append(
+            [
+                resources.name,
+                resources.type,
+                format_memory(resources.memory),
+                format_cpu(resources.cpu),
+                ", ".join(notes),
+            ]
+        )
+
+    if not rows:
+        logging.info("no jobs")
+        return
+
+    print(tabulate(rows, headers=["Job name:", "Type:", "Memory:", "CPU:", "Notes:"]))
+    print()
+
+    memory_limit = limits.running_memory.limit
+    cpu_limit = limits.running_cpu.limit
+    summary = [
+        [
+            label,
+            _with_percentage(format_memory(memory), memory, memory_limit),
+            _with_percentage(format_cpu(cpu), cpu, cpu_limit),
+        ]
+        for label, (memory, cpu) in (
+            ("Continuous jobs (always running)", totals["continuous"]),
+            ("All jobs, if running at once", totals["all"]),
+        )
+    ]
+    summary.append(
+        [
+            "Running jobs quota",
+            format_memory(memory_limit) if memory_limit is not None else "Unknown",
+            format_cpu(cpu_limit) if cpu_limit is not None else "Unknown",
+        ]
+    )
+    print(tabulate(summary, headers=["Requested:", "Memory:", "CPU:"]))
+
+    memory, cpu = totals["continuous"]
+    if (memory_limit is not None and memory > memory_limit) or (
+        cpu_limit is not None and cpu > cpu_limit
+    ):
+        logging.warning("the continuous jobs request more resources than the quota allows")
+
+
+def op_dump(api: ToolforgeClient, file: Optional[str]):
+    jobs = sorted(_list_jobs(api), key=lambda job: job["name"])
+    jobslist = [job_api_to_config(job) for job in jobs]
+
+    output = yaml.safe_dump(jobslist, explicit_start=True, sort_keys=False)
+    if not file:
+        print(output, end="")
+        return
+
+    try:
+        with open(file, "w") as f:
+            f.write(output)
+    except OSError as e:
+        raise TjfCliUserError(f"Unable to write yaml file '{file}': {e}") from e
+
+    logging.info(f"wrote the definitions of {len(jobslist)} job(s) to '{file}'")
+
+
+def _export_metrics(api: ToolforgeClient, file: str):
+    jobs = _list_jobs(api)
+    write_textfile(file, generate_metrics(jobs, time.time()))
+    logging.debug(f"wrote metrics for {len(jobs)} job(s) to '{file}'")
+
+
+def op_export_metrics(api: ToolforgeClient, file: str, interval: Optional[int]):
+    _repeat_export(lambda: _export_metrics(api, file), interval)
+
+
+def _repeat_export(export: Callable[[], None], interval: Optional[int]):
+    if not interval:
+        export()
+        return
+
+    if interval < 1:
+        raise TjfCliUserError("The metrics interval must be at least 1 second")
+
+    try:
+        while True:
+            starttime = time.time()
+            try:
+                export()
+            except (TjfCliError, requests.exceptions.RequestException) as e:
+                # keep the previous file in place, the timestamp metric shows it's stale
+                logging.error(f"failed to refresh metrics: {e}")
+
+            time.sleep(max(0, interval - (time.time() - starttime)))
+    except KeyboardInterrupt:
+        pass
+
+
+def _print_events(
+    api: ToolforgeClient, tracker: JobStateTracker, names: List[str], output_json: bool
+):
+    jobs = [
+        job
+        for job in _list_jobs(api)
+        if not names or any(fnmatch.fnmatchcase(job["name"], name) for name in names)
+    ]
+
+    for event in tracker.update(jobs, utc_timestamp()):
+        print(json.dumps(asdict(event)) if output_json else str(event), flush=True)
+
+
+def op_events(
+    api: ToolforgeClient, names: List[str], follow: bool, interval: int, output_json: bool
+):
+    tracker = JobStateTracker()
+    _print_events(api, tracker, names, output_json)
+    if not follow:
+        return
+
+    if interval < 1:
+        raise TjfCliUserError("The events interval must be at least 1 second")
+
+    try:
+        while True:
+            time.sleep(interval)
+            try:
+                _print_events(api, tracker, names, output_json)
+            except (TjfCliError, requests.exceptions.RequestException) as e:
+                logging.error(f"failed to check for new events: {e}")
+    except KeyboardInterrupt:
+        pass
+
+
+def op_schedule_report(api: ToolforgeClient, hours: int):
+    if hours < 1:
+        raise TjfCliUserError("The report must cover at least 1 hour")
+
+    schedules = {}
+    for job in _list_jobs(api):
+        if not job.get("schedule", None):
+            continue
+        try:
+            schedules[job["name"]] = parse_schedule(job["schedule"])
+        except TjfCliUserError as e:
+            logging.warning(f"ignoring job '{job['name']}': {e}")
+
+    if not schedules:
+        logging.info("no scheduled jobs")
+        return
+
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    runs = runs_between(schedules, start, start + timedelta(hours=hours))
+
+    per_minute = [0] * 60
+    for run, names in runs.items():
+        per_minute[run.minute] += len(names)
+    peak = max(per_minute)
+
+    print(
+        f"Runs of {len(schedules)} scheduled job(s) per minute of the hour, "
+        f"over the next {hours} hour(s):\n"
+    )
+    rows = [
+        [f":{minute:02d}", count, "#" * max(1, round(count / peak * SCHEDULE_REPORT_WIDTH))]
+        for minute, count in enumerate(per_minute)
+        if count
+    ]
+    print(tabulate(rows, headers=["Minute:", "Runs:", ""], tablefmt="simple"))
+
+    busiest = sorted(runs.items(), key=lambda item: (-len(item[1]), item[0]))[:5]
+    print("\nBusiest minutes:\n")
+    rows = [
+        [format_time(run), len(names), textwrap.shorten(", ".join(sorted(names)), width=60)]
+        for run, names in busiest
+    ]
+    print(tabulate(rows, headers=["Time:", "Runs:", "Jobs:"], tablefmt="simple"))
+
+
+def _for_each_tool(
+    apis: Dict[str, ToolforgeClient], func: Callable[[ToolforgeClient], T]
+) -> Tuple[Dict[str, T], List[str]]:
+    """Calls func for every tool at the same time. Returns the results, and the failed tools."""
+    with ThreadPoolExecutor(max_workers=TOOLS_WORKERS) as executor:
+        futures = {tool: executor.submit(func, api) for tool, api in apis.items()}
+
+    results = {}
+    failed = []
+    for tool, future in sorted(futures.items()):
+        error = future.exception()
+        if error is None:
+            results[tool] = future.result()
+        else:
+            logging.error(f"failed to get the data of tool '{tool}': {error}")
+            failed.append(tool)
+
+    return results, failed
+
+
+def _check_tools_failed(failed: List[str], total: int):
+    if failed:
+        raise TjfCliUserError(f"Failed for {len(failed)} of {total} tool(s): {', '.join(failed)}")
+
+
+def op_list_tools(
+    apis: Dict[str, ToolforgeClient], output_format: ListDisplayMode, next_run: bool = False
+):
+    results, failed = _for_each_tool(apis, _list_jobs)
+    jobs = [{**job, "tool": tool} for tool, tool_jobs in results.items() for job in tool_jobs]
+
+    if output_format == ListDisplayMode.NAME:
+        for job in jobs:
+            print(f"{job['tool']}\t{job['name']}")
+    elif jobs:
+        headers = (
+            JOB_TABULATION_HEADERS_LONG
+            if output_format == ListDisplayMode.LONG
+            else JOB_TABULATION_HEADERS_SHORT
+        )
+        headers = {"tool": "Tool:", **headers}
+        if next_run:
+            headers["next_run"] = "Next run:"
+
+        keys = [key for key in headers if key != "status_long"]
+        try:
+            columns = job_table_columns(jobs, keys)
+            write_pretty_table([headers[key] for key in keys], columns, sys.stdout)
+        except Exception as e:
+            raise TjfCliError("Failed to format job table") from e
+
+    _check_tools_failed(failed, len(apis))
+
+
+def op_quota_tools(apis: Dict[str, ToolforgeClient]):
+    results, failed = _for_each_tool(apis, lambda api: api.get("/quota/"))
+
+    # the same category of every tool in a single table
+    categories: Dict[str, List[Dict[str, str]]] = {}
+    for tool, data in results.items():
+        for category in data["categories"]:
+            rows = categories.setdefault(category["name"], [])
+            for item in category["items"]:
+                row = {"Tool": tool, category["name"]: item["name"]}
+                if "used" in item:
+                    row["Used"] = item["used"]
+                row["Limit"] = item["limit"]
+                rows.append(row)
+
+    for i, rows in enumerate(categories.values()):
+        if i != 0:
+            print()
+        print(tabulate(rows, tablefmt="simple", headers="keys"))
+
+    _check_tools_failed(failed, len(apis))
+
+
+def op_show_tools(
+    apis: Dict[str, ToolforgeClient],
+    names: List[str],
+    output_json: bool = False,
+    next_run_count: int = 0,
+):
+    # a job given by name usually only exists in some of the tools
+    selector = JobSelector(patterns=names)
+    results, failed = _for_each_tool(apis, lambda api: selector.select_api_jobs(_list_jobs(api)))
+    jobs = [(tool, job) for tool, tool_jobs in results.items() for job in tool_jobs]
+    if not jobs and not failed:
+        raise TjfCliUserError(f"No jobs match '{' '.join(names)}' in any tool")
+
+    if output_json:
+        output = []
+        for tool, job in jobs:
+            if next_run_count:
+                job["next_runs"] = _next_runs(job, next_run_count)
+            output.append({"tool": tool, **job})
+        print(json.dumps(output, indent=2))
+    else:
+        for i, (tool, job) in enumerate(jobs):
+            if i > 0:
+                print()
+            print(_format_job(apis[tool], job, next_run_count, tool))
+
+    _check_tools_failed(failed, len(apis))
+
+
+def _export_tools_metrics(apis: Dict[str, ToolforgeClient], file: str):
+    results, failed = _for_each_tool(apis, _list_jobs)
+    jobs: Dict[str, Optional[List[dict]]] = {tool: None for tool in failed}
+    jobs.update(results)
+    write_textfile(file, generate_tools_metrics(jobs, time.time()))
+    logging.debug(f"wrote metrics for {len(results)} of {len(apis)} tool(s) to '{file}'")
+
+
+def op_export_metrics_tools(apis: Dict[str, ToolforgeClient], file: str, interval: Optional[int]):
+    # the tools that failed have a tool_up metric of 0
+    _repeat_export(lambda: _export_tools_metrics(apis, file), interval)
+
+
+def run_tools_subcommand(args: argparse.Namespace, apis: Dict[str, ToolforgeClient]):
+    if args.operation == "list":
+        output_format = ListDisplayMode.LONG if args.long else args.output
+        op_list_tools(apis, output_format, args.next_run)
+    elif args.operation == "quota":
+        op_quota_tools(apis)
+    elif args.operation == "show":
+        op_show_tools(apis, args.names, args.json, args.next)
+    elif args.operation == "export-metrics":
+        op_export_metrics_tools(apis, args.file, args.interval)
+
+
 def run_subcommand(args: argparse.Namespace, api: ToolforgeClient):
     if args.operation == "images":
         op_images(api)
@@ -667,27 +1937,145 @@ def run_subcommand(args: argparse.Namespace, api: ToolforgeClient):
             mem=args.mem,
             cpu=args.cpu,
             emails=args.emails,
+            check_quota=not args.no_quota_check,
         )
     elif args.operation == "show":
-        op_show(api, args.name)
+        op_show(api, args.names, args.json, args.next)
     elif args.operation == "logs":
-        op_logs(api, args.name, args.follow, args.last)
+        output = None
+        if args.output_file:
+            output = RotatingLogWriter(
+                args.output_file,
+                compression=(
+                    compression_for(args.output_file)
+                    if args.compress is None
+                    else None if args.compress == "none" else args.compress
+                ),
+                max_bytes=int(parse_quantity(args.rotate_size)) if args.rotate_size else None,
+                max_age=parse_duration(args.rotate_interval) if args.rotate_interval else None,
+                keep=args.keep,
+            )
+        now = datetime.now(timezone.utc)
+        log_filter = LogFilter(
+            grep=args.grep,
+            since=parse_time_arg(args.since, now) if args.since else None,
+            until=parse_time_arg(args.until, now) if args.until else None,
+            pod=args.pod,
+            max_matches=args.max_matches,
+        )
+        op_logs(api, args.name, args.follow, args.last, output, log_filter)
     elif args.operation == "delete":
-        op_delete(api, args.name)
+        op_delete(api, JobSelector.from_args(args.names, args.selector, args.type), args.wait)
     elif args.operation == "list":
         output_format = args.output
         if args.long:
             logging.warning("the `--long` flag is deprecated, use `--output long` instead")
             output_format = ListDisplayMode.LONG
-        op_list(api, output_format)
+        op_list(api, output_format, next_run=args.next_run)
     elif args.operation == "flush":
         op_flush(api)
+    elif args.operation == "load" and args.watch:
+        op_load_watch(
+            api,
+            args.file,
+            transactional=args.transactional,
+            spread_schedules=args.spread_schedules,
+            check_quota=not args.no_quota_check,
+            resync_interval=parse_duration(args.resync_interval),
+        )
     elif args.operation == "load":
-        op_load(api, args.file, args.job)
+        op_load(
+            api,
+            args.file,
+            JobSelector.from_args(args.job, args.selector),
+            transactional=args.transactional,
+            spread_schedules=args.spread_schedules,
+            check_quota=not args.no_quota_check,
+        )
+    elif args.operation == "check":
+        sys.exit(op_check(api, args.file, spread_schedules=args.spread_schedules))
+    elif args.operation == "history":
+        op_history(args.limit)
+    elif args.operation == "rollback":
+        op_rollback(api, args.steps, args.dry_run)
     elif args.operation == "restart":
-        op_restart(api, args.name)
+        op_restart(api, JobSelector.from_args(args.names, args.selector, args.type), args.wait)
     elif args.operation == "quota":
         op_quota(api)
+    elif args.operation == "dump":
+        op_dump(api, args.file)
+    elif args.operation == "export-metrics":
+        op_export_metrics(api, args.file, args.interval)
+    elif args.operation == "resources":
+        op_resources(api, args.usage)
+    elif args.operation == "schedule-report":
+        op_schedule_report(api, args.hours)
+    elif args.operation == "events":
+        op_events(api, args.names, args.follow, args.interval, args.json)
+
+
+def _report_profile(profiler: profiling.Profiler, output: Optional[str]):
+    # stderr, to not mix it with the command output
+    print(profiler.summary(), file=sys.stderr)
+
+    if output:
+        try:
+            profiler.write_trace(output)
+        except TjfCliUserError as e:
+            logging.error(str(e))
+
+
+def _make_client(
+    client_config: ClientConfig, profiler: Optional[profiling.Profiler]
+) -> ToolforgeClient:
+    host = socket.gethostname()
+    api = ToolforgeClient(
+        server=client_config.server,
+        exception_handler=handle_http_exception,
+        user_agent=f"{client_config.kubeconfig.current_namespace}@{host}",
+        kubeconfig=client_config.kubeconfig,
+        timeout=client_config.timeout,
+    )
+
+    if profiler:
+        profiler.instrument_client(api)
+
+    return api
+
+
+def _make_tools_clients(
+    patterns: List[str], profiler: Optional[profiling.Profiler]
+) -> Dict[str, ToolforgeClient]:
+    """Creates a client for the tool of each kubeconfig. The ones failing to load are skipped."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob(os.path.expanduser(pattern)))
+        if not matches:
+            logging.warning(f"no kubeconfig files match '{pattern}'")
+        paths.extend(matches)
+
+    apis: Dict[str, ToolforgeClient] = {}
+    with profiling.span("load configuration", tools=len(paths)):
+        for path in paths:
+            try:
+                client_config = load_client_config(kubeconfig_path=Path(path))
+            except Exception as e:
+                logging.error(f"failed to load kubeconfig '{path}': {e}")
+                continue
+            if client_config.tool in apis:
+                logging.warning(f"skipping kubeconfig '{path}', tool '{client_config.tool}' twice")
+                continue
+            apis[client_config.tool] = _make_client(client_config, profiler)
+
+    if not apis:
+        raise TjfCliConfigLoadError("Failed to load configuration of any tool")
+
+    return apis
+
+
+def _report_check_failure(args: argparse.Namespace, error: Exception):
+    if args.operation == "check":
+        print(f"JOBS UNKNOWN - {error}", flush=True)
 
 
 def main():
@@ -707,43 +2095,56 @@ def main():
         logging.ERROR, "\033[1;31m%s\033[1;0m" % logging.getLevelName(logging.ERROR)
     )
     logging.basicConfig(
-        format=logging_format, level=logging_level, stream=sys.stdout, datefmt="%Y-%m-%d %H:%M:%S"
+        format=logging_format,
+        level=logging_level,
+        # check prints its status line first on stdout, as monitoring only reads that
+        stream=sys.stderr if args.operation == "check" else sys.stdout,
+        datefmt="%Y-%m-%d %H:%M:%S",
     )
 
-    user = getpass.getuser()
-    if not user.startswith("tools.") and not user.startswith("toolsbeta."):
-        logging.warning(
-            "not running as the tool account? Likely to fail. Perhaps you forgot `become <tool>`?"
-        )
-
-    try:
-        kubeconfig = Kubeconfig.load()
-        host = socket.gethostname()
-        user_agent = f"{kubeconfig.current_namespace}@{host}"
-
-        config = load_config("jobs-cli", extra_sections=[JobsConfig])
-    except Exception as e:
-        raise TjfCliConfigLoadError("Failed to load configuration") from e
-
-    api = ToolforgeClient(
-        server=f"{config.api_gateway.url}{config.jobs.jobs_endpoint}",
-        exception_handler=handle_http_exception,
-        user_agent=user_agent,
-        kubeconfig=kubeconfig,
-        timeout=config.jobs.timeout,
-    )
+    profiler = profiling.enable() if args.profile else None
 
-    logging.debug("session configuration generated correctly")
+    if args.operation == "check":
+        # a probe failing to check is not the same as the jobs being wrong
+        user_error = internal_error = CHECK_UNKNOWN
+    else:
+        user_error, internal_error = EXIT_USER_ERROR, EXIT_INTERNAL_ERROR
 
     try:
-        run_subcommand(args=args, api=api)
+        if args.kubeconfig:
+            apis = _make_tools_clients(args.kubeconfig, profiler)
+        else:
+            user = getpass.getuser()
+            if not user.startswith("tools.") and not user.startswith("toolsbeta."):
+                logging.warning(
+                    "not running as the tool account? Likely to fail. "
+                    "Perhaps you forgot `become <tool>`?"
+                )
+
+            try:
+                with profiling.span("load configuration"):
+                    client_config = load_client_config()
+            except Exception as e:
+                raise TjfCliConfigLoadError("Failed to load configuration") from e
+
+            api = _make_client(client_config, profiler)
+
+        logging.debug("session configuration generated correctly")
+
+        with profiling.span(f"command {args.operation}"):
+            if args.kubeconfig:
+                run_tools_subcommand(args=args, apis=apis)
+            else:
+                run_subcommand(args=args, api=api)
     except TjfCliUserError as e:
+        _report_check_failure(args, e)
         logging.error(f"Error: {str(e)}")
         if args.debug:
             print_error_context(e)
 
-        sys.exit(EXIT_USER_ERROR)
+        sys.exit(user_error)
     except TjfCliError as e:
+        _report_check_failure(args, e)
         logging.exception("An internal error occured while executing this command.", exc_info=True)
         if args.debug:
             print_error_context(e)
@@ -751,12 +2152,16 @@ def main():
         # link is to https://wikitech.wikimedia.org/wiki/Help:Cloud_Services_communication
         logging.error("Please report this issue to the Toolforge admins: https://w.wiki/6Zuu")
 
-        sys.exit(EXIT_INTERNAL_ERROR)
-    except Exception:
+        sys.exit(internal_error)
+    except Exception as e:
+        _report_check_failure(args, e)
         logging.exception("An internal error occured while executing this command.", exc_info=True)
         # link is to https://wikitech.wikimedia.org/wiki/Help:Cloud_Services_communication
         logging.error("Please report this issue to the Toolforge admins: https://w.wiki/6Zuu")
 
-        sys.exit(EXIT_INTERNAL_ERROR)
+        sys.exit(internal_error)
+    finally:
+        if profiler:
+            _report_profile(profiler, args.profile_output)
 
     logging.debug("-- end of operations")
@@ -0,0 +1,196 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+The configuration needed to talk to the jobs API: the kubeconfig and the toolforge config files.
+
+Every command needs it, and reading and parsing those YAML files is slow on NFS-backed home
+directories, so the result is cached, keyed by the modification times of the files it came from.
+"""
+
+import json
+from dataclasses import dataclass, field
+from logging import getLogger
+from os.path import expandvars
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import toolforge_weld.config
+from toolforge_weld.config import Section, load_config
+from toolforge_weld.kubernetes_config import Kubeconfig, locate_config_file
+
+from tjf_cli import profiling
+from tjf_cli.cache import content_hash, read_cache, write_cache
+
+LOGGER = getLogger(__name__)
+
+CACHE_VERSION = 1
+CLIENT_NAME = "jobs-cli"
+TOOL_NAMESPACE_PREFIX = "tool-"
+
+
+@dataclass
+class JobsConfig(Section):
+    _NAME_: str = field(default="jobs", init=False)
+    jobs_endpoint: str = "/jobs/api/v1"
+    timeout: int = 30
+
+    @classmethod
+    def from_dict(cls, my_dict: Dict[str, Any]):
+        params = {}
+        if "jobs_endpoint" in my_dict:
+            params["jobs_endpoint"] = my_dict["jobs_endpoint"]
+        if "timeout" in my_dict:
+            params["timeout"] = my_dict["timeout"]
+        return cls(**params)
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    kubeconfig: Kubeconfig
+    server: str
+    timeout: int
+
+    @property
+    def tool(self) -> str:
+        namespace = self.kubeconfig.current_namespace
+        if namespace.startswith(TOOL_NAMESPACE_PREFIX):
+            return namespace[len(TOOL_NAMESPACE_PREFIX) :]
+        return namespace
+
+
+def config_sources(kubeconfig_path: Optional[Path] = None) -> List[Path]:
+    """
+    Returns the files the client configuration is read from, in the order load_config uses.
+    toolforge_weld doesn't expose its list, so this is a copy, checked against it by the tests.
+    """
+    base_dir = toolforge_weld.config.CONFIGS_BASE_DIR
+    paths = [
+        kubeconfig_path or locate_config_file(),
+        base_dir / f"{CLIENT_NAME}.yaml",
+        base_dir / "common.yaml",
+        Path("~/.toolforge.yaml"),
+        Path("~/.config/toolforge.yaml"),
+        Path("$XDG_CONFIG_HOME/toolforge.yaml"),
+    ]
+    return [Path(expandvars(path.expanduser())) for path in paths]
+
+
+def _signature(paths: List[Path]) -> Dict[str, Optional[List[int]]]:
+    signature: Dict[str, Optional[List[int]]] = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            # a file showing up later also invalidates the cache
+            signature[str(path)] = None
+        else:
+            signature[str(path)] = [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+    return signature
+
+
+def _cache_key(paths: List[Path]) -> str:
+    return "clientconfig-{}.json".format(content_hash(json.dumps([str(p) for p in paths]).encode()))
+
+
+def _optional_path(value: Any) -> Optional[Path]:
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"invalid path {value!r}")
+    return Path(value)
+
+
+def _from_entry(entry: Any, signature: Dict[str, Optional[List[int]]]) -> Optional[ClientConfig]:
+    if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION:
+        return None
+    if entry.get("sources") != signature:
+        return None
+
+    try:
+        kubeconfig = Kubeconfig(
+            current_server=str(entry["kubeconfig"]["current_server"]),
+            current_namespace=str(entry["kubeconfig"]["current_namespace"]),
+            client_cert_file=_optional_path(entry["kubeconfig"]["client_cert_file"]),
+            client_key_file=_optional_path(entry["kubeconfig"]["client_key_file"]),
+        )
+        config = ClientConfig(
+            kubeconfig=kubeconfig,
+            server=str(entry["server"]),
+            timeout=int(entry["timeout"]),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        LOGGER.debug(f"ignoring invalid client configuration cache entry: {e}")
+        return None
+
+    # the certificates are renewed in place, but if one is gone let the full load report it
+    for path in (kubeconfig.client_cert_file, kubeconfig.client_key_file):
+        if path is None or not path.exists():
+            return None
+
+    return config
+
+
+def _to_entry(config: ClientConfig, signature: Dict[str, Optional[List[int]]]) -> Dict[str, Any]:
+    kubeconfig = config.kubeconfig
+    return {
+        "version": CACHE_VERSION,
+        "sources": signature,
+        "kubeconfig": {
+            "current_server": kubeconfig.current_server,
+            "current_namespace": kubeconfig.current_namespace,
+            "client_cert_file": str(kubeconfig.client_cert_file),
+            "client_key_file": str(kubeconfig.client_key_file),
+        },
+        "server": config.server,
+        "timeout": config.timeout,
+    }
+
+
+def _cacheable(kubeconfig: Kubeconfig) -> bool:
+    # credentials stored inline in the kubeconfig are not copied to the cache
+    return (
+        kubeconfig.client_cert_file is not None
+        and kubeconfig.client_key_file is not None
+        and kubeconfig.token is None
+        and kubeconfig.client_cert_data is None
+        and kubeconfig.client_key_data is None
+        and kubeconfig.ca_file is None
+    )
+
+
+def load_client_config(
+    use_cache: bool = True, cache_dir: Optional[Path] = None, kubeconfig_path: Optional[Path] = None
+) -> ClientConfig:
+    """
+    Loads the kubeconfig, by default the one of the current user, and the toolforge
+    configuration, or reuses the cached result if none of the files it came from changed.
+    """
+    paths = config_sources(kubeconfig_path)
+    signature = _signature(paths)
+
+    if use_cache:
+        with profiling.span("read configuration cache") as span_args:
+            config = _from_entry(read_cache(_cache_key(paths), cache_dir), signature)
+            span_args["hit"] = config is not None
+        if config is not None:
+            LOGGER.debug("using cached client configuration")
+            return config
+
+    with profiling.span("load kubeconfig"):
+        kubeconfig = Kubeconfig.load(paths[0])
+    with profiling.span("load client configuration"):
+        loaded = load_config(CLIENT_NAME, extra_sections=[JobsConfig])
+    config = ClientConfig(
+        kubeconfig=kubeconfig,
+        server=f"{loaded.api_gateway.url}{loaded.jobs.jobs_endpoint}",
+        timeout=loaded.jobs.timeout,
+    )
+
+    if use_cache and _cacheable(kubeconfig):
+        write_cache(_cache_key(paths), _to_entry(config, signature), cache_dir)
+
+    return config
@@ -0,0 +1,248 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+A local implementation of the cron schedules accepted by the jobs API.
+
+Schedules use the standard five fields (minute, hour, day of month, month, day of week) or one of
+the @hourly/@daily/... macros, and are evaluated in UTC like the Kubernetes CronJobs running them.
+As in Kubernetes, when both the day of month and the day of week are restricted, a day matching
+either of them fires.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set
+
+from tjf_cli.errors import TjfCliUserError
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+MONTH_NAMES = {
+    name: i + 1
+    for i, name in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+    )
+}
+WEEKDAY_NAMES = {
+    name: i for i, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])
+}
+
+# the values an H token can take in each field. Days of month stop at 28 to exist in all months
+HASH_RANGES = [(0, 59), (0, 23), (1, 28), (1, 12), (0, 6)]
+HASH_TOKEN = re.compile(r"^H(?:\((?P<low>\d+)-(?P<high>\d+)\))?(?:/(?P<step>\d+))?$")
+
+# with schedule spreading, what the macros mean
+SPREAD_MACROS = {
+    "@yearly": "H H H H *",
+    "@annually": "H H H H *",
+    "@monthly": "H H H * *",
+    "@weekly": "H H * * H",
+    "@daily": "H H * * *",
+    "@midnight": "H H * * *",
+    "@hourly": "H * * * *",
+}
+EVERY_N_MINUTES = re.compile(r"^\*/(?P<step>\d+)$")
+
+# long enough for a schedule firing only on February 29th to fire at least once
+MAX_SEARCH_DAYS = 366 * 8 + 1
+
+
+def _parse_value(value: str, names: Optional[Dict[str, int]], schedule: str) -> int:
+    if names and value.lower() in names:
+        return names[value.lower()]
+    if not value.isdigit():
+        raise TjfCliUserError(f"Invalid value '{value}' in schedule '{schedule}'")
+    return int(value)
+
+
+def _parse_field(
+    field: str, low: int, high: int, schedule: str, names: Optional[Dict[str, int]] = None
+) -> Set[int]:
+    values: Set[int] = set()
+    for part in field.split(","):
+        base, sep, step_str = part.partition("/")
+        step = 1
+        if sep:
+            if not step_str.isdigit() or int(step_str) == 0:
+                raise TjfCliUserError(f"Invalid step '{part}' in schedule '{schedule}'")
+            step = int(step_str)
+
+        if base in ("*", "?"):
+            start, end = low, high
+        elif "-" in base:
+            first, _, last = base.partition("-")
+            start = _parse_value(first, names, schedule)
+            end = _parse_value(last, names, schedule)
+        else:
+            start = _parse_value(base, names, schedule)
+            # as in Vixie cron, 'N/step' means 'N-high/step'
+            end = high if sep else start
+
+        if start < low or end > high or start > end:
+            raise TjfCliUserError(
+                f"Value '{part}' out of range {low}-{high} in schedule '{schedule}'"
+            )
+        values.update(range(start, end + 1, step))
+
+    return values
+
+
+@dataclass
+class CronSchedule:
+    minutes: Set[int]
+    hours: Set[int]
+    days: Set[int]
+    months: Set[int]
+    # 0 is Sunday
+    weekdays: Set[int]
+    days_restricted: bool
+    weekdays_restricted: bool
+
+    def _day_matches(self, day: datetime) -> bool:
+        if day.month not in self.months:
+            return False
+        day_match = day.day in self.days
+        weekday_match = (day.isoweekday() % 7) in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def iter_runs(self, after: datetime) -> Iterator[datetime]:
+        """Yields the times this schedule fires at, strictly after the given time."""
+        start = after.astimezone(timezone.utc).replace(second=0, microsecond=0)
+        start += timedelta(minutes=1)
+        hours = sorted(self.hours)
+        minutes = sorted(self.minutes)
+
+        day = start.replace(hour=0, minute=0)
+        for _ in range(MAX_SEARCH_DAYS):
+            if self._day_matches(day):
+                for hour in hours:
+                    for minute in minutes:
+                        run = day.replace(hour=hour, minute=minute)
+                        if run >= start:
+                            yield run
+            day += timedelta(days=1)
+
+    def next_runs(self, after: datetime, count: int) -> List[datetime]:
+        return list(islice(self.iter_runs(after), count))
+
+
+def parse_schedule(schedule: str) -> CronSchedule:
+    """Parses a cron schedule, raising TjfCliUserError if it's invalid."""
+    expression = MACROS.get(schedule.strip().lower(), schedule)
+    fields = expression.split()
+    if len(fields) != 5:
+        raise TjfCliUserError(f"Invalid schedule '{schedule}', expected 5 fields")
+
+    minute, hour, day, month, weekday = fields
+    weekdays = _parse_field(weekday, 0, 7, schedule, WEEKDAY_NAMES)
+    return CronSchedule(
+        minutes=_parse_field(minute, 0, 59, schedule),
+        hours=_parse_field(hour, 0, 23, schedule),
+        days=_parse_field(day, 1, 31, schedule),
+        months=_parse_field(month, 1, 12, schedule, MONTH_NAMES),
+        weekdays={weekday % 7 for weekday in weekdays},
+        days_restricted=not day.startswith(("*", "?")),
+        weekdays_restricted=not weekday.startswith(("*", "?")),
+    )
+
+
+def format_time(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def next_runs(schedule: str, count: int, after: Optional[datetime] = None) -> List[datetime]:
+    """Returns the next times a schedule fires at, after the given time or now."""
+    return parse_schedule(schedule).next_runs(after or datetime.now(timezone.utc), count)
+
+
+def runs_between(
+    schedules: Dict[str, CronSchedule], start: datetime, end: datetime
+) -> Dict[datetime, List[str]]:
+    """Returns the names of the jobs firing at each time in [start, end)."""
+    runs: Dict[datetime, List[str]] = {}
+    for name, schedule in schedules.items():
+        for run in schedule.iter_runs(start - timedelta(minutes=1)):
+            if run >= end:
+                break
+            runs.setdefault(run, []).append(name)
+    return runs
+
+
+def _hash(name: str, index: int) -> int:
+    digest = hashlib.sha256(f"{name}:{index}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _expand_hash_token(part: str, index: int, name: str, schedule: str) -> str:
+    match = HASH_TOKEN.match(part)
+    if not match:
+        return part
+
+    low, high = HASH_RANGES[index]
+    if match.group("low") is not None:
+        low, high = int(match.group("low")), int(match.group("high"))
+        if low > high or low < HASH_RANGES[index][0] or high > HASH_RANGES[index][1]:
+            raise TjfCliUserError(f"Invalid range in '{part}' in schedule '{schedule}'")
+
+    if match.group("step") is None:
+        return str(low + _hash(name, index) % (high - low + 1))
+
+    step = int(match.group("step"))
+    if step == 0:
+        raise TjfCliUserError(f"Invalid step '{part}' in schedule '{schedule}'")
+    offset = low + _hash(name, index) % min(step, high - low + 1)
+    return f"{offset}-{high}/{step}"
+
+
+def expand_hash_tokens(schedule: str, name: str) -> str:
+    """
+    Replaces the H tokens in a schedule with values derived from the job name.
+
+    As in Jenkins, 'H' is a fixed value in the range of the field, 'H(0-29)' one in the given
+    range, and 'H/15' every 15 starting at a fixed offset. The values are the same every time.
+    """
+    fields = schedule.split()
+    if "H" not in schedule or len(fields) != 5:
+        return schedule
+
+    return " ".join(
+        ",".join(_expand_hash_token(part, index, name, schedule) for part in field.split(","))
+        for index, field in enumerate(fields)
+    )
+
+
+def spread_schedule(schedule: str, name: str) -> str:
+    """
+    Spreads a schedule over time, by running at a minute derived from the job name instead of
+    at a fixed minute. Macros like @daily are spread over the whole period.
+    """
+    macro = SPREAD_MACROS.get(schedule.strip().lower(), None)
+    if macro is not None:
+        return expand_hash_tokens(macro, name)
+
+    fields = schedule.split()
+    if len(fields) == 5:
+        every_n_minutes = EVERY_N_MINUTES.match(fields[0])
+        if fields[0].isdigit():
+            fields[0] = "H"
+        elif every_n_minutes:
+            fields[0] = f"H/{every_n_minutes.group('step')}"
+
+    return expand_hash_tokens(" ".join(fields), name)
@@ -0,0 +1,100 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Job lifecycle events, derived by comparing consecutive job listings.
+
+The jobs API has no event feed, so `events` polls the job list and a JobStateTracker emits an
+event only for the jobs whose state differs from the previous poll.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from tjf_cli.status import JobStatus, parse_job_status
+
+
+@dataclass
+class JobEvent:
+    time: str
+    job: str
+    event: str
+    status: str
+    hint: Optional[str] = None
+
+    def __str__(self) -> str:
+        return f"{self.time} {self.job}: {self.event} ({self.status})"
+
+
+def utc_timestamp(when: Optional[float] = None) -> str:
+    moment = (
+        datetime.now(timezone.utc) if when is None else datetime.fromtimestamp(when, timezone.utc)
+    )
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _classify(old: JobStatus, new: JobStatus) -> str:
+    if new.completed:
+        return "completed"
+    if new.failed:
+        return "failed"
+    if new.running:
+        restarted = (new.restart_count or 0) > (old.restart_count or 0)
+        if old.running and (restarted or new.started_at != old.started_at):
+            return "restarted"
+        return "started"
+    if new.last_run and new.last_run != old.last_run:
+        # a cron job started a new run
+        return "started"
+    if new.status.startswith("Last schedule time") and old.status != new.status:
+        return "started"
+    return "changed"
+
+
+class JobStateTracker:
+    """Remembers the state of each job, and reports what changed between two job listings."""
+
+    def __init__(self) -> None:
+        self.states: Optional[Dict[str, JobStatus]] = None
+
+    def update(self, jobs: List[Dict[str, Any]], timestamp: str) -> List[JobEvent]:
+        """
+        Returns the events between the previous listing and this one.
+
+        The first listing returns a 'status' event for every job, with its current state.
+        """
+        states = {job["name"]: parse_job_status(job) for job in jobs}
+        events = []
+
+        for job in sorted(jobs, key=lambda job: job["name"]):
+            name = job["name"]
+            state = states[name]
+
+            if self.states is None:
+                event = "status"
+            elif name not in self.states:
+                event = "created"
+            elif self.states[name] != state:
+                event = _classify(self.states[name], state)
+            else:
+                continue
+
+            events.append(
+                JobEvent(
+                    time=timestamp,
+                    job=name,
+                    event=event,
+                    status=state.status,
+                    hint=job.get("status_long", None),
+                )
+            )
+
+        for name in sorted(set(self.states or {}) - set(states)):
+            events.append(JobEvent(time=timestamp, job=name, event="deleted", status="Deleted"))
+
+        self.states = states
+        return events
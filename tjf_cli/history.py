@@ -0,0 +1,196 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+A local history of the job sets applied with `load`, for `history` and `rollback`.
+
+Each job definition is stored once, in a file named after the hash of its content, and each
+snapshot only lists the hashes of its jobs. Loading a file again with a few changes only adds the
+changed definitions.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from tjf_cli.cache import CACHE_DIR_NAME, content_hash
+from tjf_cli.errors import TjfCliUserError
+
+LOGGER = getLogger(__name__)
+
+HISTORY_VERSION = 1
+MAX_SNAPSHOTS = 50
+
+
+def get_history_dir() -> Path:
+    """Returns the directory the history is kept in, following the XDG spec."""
+    base = os.environ.get("XDG_STATE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".local", "state"
+    )
+    return Path(base) / CACHE_DIR_NAME / "history"
+
+
+def _canonical(data: Any) -> bytes:
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    temp_path = path.with_name(f"{path.name}~{os.getpid()}")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        temp_path.rename(path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+@dataclass
+class Snapshot:
+    id: str
+    time: str
+    source: Optional[str]
+    # job name -> hash of its definition
+    jobs: Dict[str, str]
+    filename: str
+
+
+class History:
+    def __init__(self, directory: Optional[Path] = None) -> None:
+        self.directory = directory or get_history_dir()
+        self.objects_dir = self.directory / "objects"
+        self.snapshots_dir = self.directory / "snapshots"
+
+    def snapshots(self) -> List[Snapshot]:
+        """Returns the snapshots, the most recent first. Unreadable ones are skipped."""
+        try:
+            filenames = sorted(os.listdir(self.snapshots_dir), reverse=True)
+        except FileNotFoundError:
+            return []
+
+        snapshots = []
+        for filename in filenames:
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(self.snapshots_dir / filename) as f:
+                    data = json.load(f)
+                if data.get("version") != HISTORY_VERSION:
+                    continue
+                snapshots.append(
+                    Snapshot(
+                        id=data["id"],
+                        time=data["time"],
+                        source=data.get("source", None),
+                        jobs=data["jobs"],
+                        filename=filename,
+                    )
+                )
+            except Exception as e:
+                LOGGER.debug(f"ignoring unreadable snapshot '{filename}': {e}")
+
+        return snapshots
+
+    def latest(self) -> Optional[Snapshot]:
+        snapshots = self.snapshots()
+        return snapshots[0] if snapshots else None
+
+    def jobs(self, snapshot: Snapshot) -> List[Dict[str, Any]]:
+        """Returns the job definitions of a snapshot, sorted by name."""
+        jobs = []
+        for name, object_hash in sorted(snapshot.jobs.items()):
+            try:
+                with open(self.objects_dir / f"{object_hash}.json", "rb") as f:
+                    raw = f.read()
+            except OSError as e:
+                raise TjfCliUserError(
+                    f"Snapshot {snapshot.id[:12]} is incomplete, the definition of job '{name}' "
+                    "is missing from the history"
+                ) from e
+            if content_hash(raw) != object_hash:
+                raise TjfCliUserError(
+                    f"Snapshot {snapshot.id[:12]} is corrupted, the definition of job '{name}' "
+                    "doesn't match its hash"
+                )
+            jobs.append(json.loads(raw))
+        return jobs
+
+    def record(self, jobs: List[Dict[str, Any]], source: Optional[str] = None) -> Snapshot:
+        """
+        Adds a snapshot with the given job definitions, unless they are the same as in the
+        latest one. Returns the new, or latest, snapshot.
+        """
+        objects: Dict[str, bytes] = {}
+        names: Dict[str, str] = {}
+        for job in jobs:
+            raw = _canonical(job)
+            object_hash = content_hash(raw)
+            objects[object_hash] = raw
+            names[job["name"]] = object_hash
+
+        snapshot_id = content_hash(_canonical(names))
+        latest = self.latest()
+        if latest is not None and latest.id == snapshot_id:
+            LOGGER.debug(f"jobs unchanged since snapshot {snapshot_id[:12]}")
+            return latest
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        for object_hash, raw in objects.items():
+            path = self.objects_dir / f"{object_hash}.json"
+            if not path.exists():
+                _write_atomic(path, raw)
+
+        now = datetime.now(timezone.utc)
+        snapshot = Snapshot(
+            id=snapshot_id,
+            time=now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            source=source,
+            jobs=names,
+            filename=f"{now.strftime('%Y%m%dT%H%M%S%fZ')}-{snapshot_id[:12]}.json",
+        )
+        data = {
+            "version": HISTORY_VERSION,
+            "id": snapshot.id,
+            "time": snapshot.time,
+            "source": snapshot.source,
+            "jobs": snapshot.jobs,
+        }
+        # written after the objects it refers to
+        _write_atomic(self.snapshots_dir / snapshot.filename, _canonical(data))
+
+        self.prune()
+        return snapshot
+
+    def prune(self, keep: int = MAX_SNAPSHOTS) -> None:
+        """Removes the oldest snapshots beyond keep, and the definitions no longer used."""
+        snapshots = self.snapshots()
+        for snapshot in snapshots[keep:]:
+            LOGGER.debug(f"removing old snapshot {snapshot.id[:12]}")
+            (self.snapshots_dir / snapshot.filename).unlink()
+
+        used: Set[str] = set()
+        for snapshot in snapshots[:keep]:
+            used.update(snapshot.jobs.values())
+
+        for filename in os.listdir(self.objects_dir):
+            if filename.endswith(".json") and filename[: -len(".json")] not in used:
+                (self.objects_dir / filename).unlink()
+
+
+def snapshot_changes(old: Optional[Snapshot], new: Snapshot) -> str:
+    """Summarizes the job changes between two snapshots, like '+2 ~1 -0'."""
+    old_jobs = old.jobs if old is not None else {}
+    added = len(new.jobs.keys() - old_jobs.keys())
+    removed = len(old_jobs.keys() - new.jobs.keys())
+    modified = len(
+        [name for name in new.jobs.keys() & old_jobs.keys() if new.jobs[name] != old_jobs[name]]
+    )
+    return f"+{added} ~{modified} -{removed}"
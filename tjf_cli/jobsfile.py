@@ -0,0 +1,241 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Parsing of the jobs YAML file used by `load`.
+
+Besides the plain list of jobs, the file can be a mapping with these keys:
+
+  defaults:   options applied to every job
+  templates:  named sets of options, referenced from jobs with `template: name` (or a list)
+  include:    other job files (relative to this one) whose defaults, templates and jobs are
+              merged into this one. Values defined in the including file take precedence.
+  jobs:       the list of jobs
+
+A job can also have a `matrix` mapping each variable to a list of values. The job is then
+expanded once per combination, replacing `{{ variable }}` in its string options.
+
+Standard YAML anchors and merge keys (`<<: *anchor`) work in both formats.
+"""
+
+import itertools
+import os
+import re
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from tjf_cli.cache import content_hash, read_cache, write_cache
+from tjf_cli.errors import TjfCliUserError
+
+LOGGER = getLogger(__name__)
+
+# bump when the expansion logic changes, so old cache entries are not used
+CACHE_VERSION = 2
+
+DOCUMENT_KEYS = ["defaults", "templates", "include", "jobs"]
+TEMPLATE_KEY = "template"
+MATRIX_KEY = "matrix"
+
+MATRIX_VARIABLE = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_-]*)\s*\}\}")
+
+
+def _read_document(path: Path, sources: Dict[str, str], stack: List[Path]) -> Dict[str, Any]:
+    """Reads a jobs file and its includes into a single document with all keys populated."""
+    if path in stack:
+        chain = " -> ".join(str(p) for p in [*stack, path])
+        raise TjfCliUserError(f"Include loop detected in jobs file: {chain}")
+
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        content = yaml.safe_load(raw)
+    except Exception as e:
+        raise TjfCliUserError(f"Unable to parse yaml file '{path}'") from e
+
+    sources[str(path)] = content_hash(raw)
+
+    if content is None:
+        content = []
+    if isinstance(content, list):
+        content = {"jobs": content}
+    if not isinstance(content, dict):
+        raise TjfCliUserError(f"Jobs file '{path}' must contain a list or a mapping")
+
+    for key in content:
+        if key not in DOCUMENT_KEYS:
+            raise TjfCliUserError(f"Unknown top-level key '{key}' in jobs file '{path}'")
+
+    document: Dict[str, Any] = {"defaults": {}, "templates": {}, "jobs": []}
+
+    includes = content.get("include") or []
+    if isinstance(includes, str):
+        includes = [includes]
+    for include in includes:
+        included_path = (path.parent / os.path.expanduser(str(include))).resolve()
+        included = _read_document(included_path, sources, [*stack, path])
+        document["defaults"].update(included["defaults"])
+        document["templates"].update(included["templates"])
+        document["jobs"].extend(included["jobs"])
+
+    for key in ("defaults", "templates"):
+        value = content.get(key, None)
+        if value is None:
+            value = {}
+        if not isinstance(value, dict):
+            raise TjfCliUserError(f"'{key}' in jobs file '{path}' must be a mapping")
+        document[key].update(value)
+
+    jobs = content.get("jobs", None)
+    if jobs is None:
+        jobs = []
+    if not isinstance(jobs, list):
+        raise TjfCliUserError(f"'jobs' in jobs file '{path}' must be a list")
+    document["jobs"].extend(jobs)
+
+    return document
+
+
+def _substitute(value: Any, variables: Dict[str, str], job_name: str) -> Any:
+    if not isinstance(value, str):
+        return value
+
+    def replace(match: "re.Match[str]") -> str:
+        variable = match.group(1)
+        if variable not in variables:
+            raise TjfCliUserError(f"Unknown matrix variable '{variable}' in job '{job_name}'")
+        return variables[variable]
+
+    return MATRIX_VARIABLE.sub(replace, value)
+
+
+def _expand_matrix(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+    matrix = job.pop(MATRIX_KEY, None)
+    if not matrix:
+        return [job]
+
+    name = job.get("name", "(unnamed)")
+    if not isinstance(matrix, dict) or not all(
+        isinstance(values, list) and values for values in matrix.values()
+    ):
+        raise TjfCliUserError(f"'matrix' in job '{name}' must map variables to non-empty lists")
+
+    variables = list(matrix.keys())
+    expanded = []
+    for combination in itertools.product(*matrix.values()):
+        values = {var: str(value) for var, value in zip(variables, combination)}
+        expanded.append({key: _substitute(value, values, name) for key, value in job.items()})
+
+    if len(expanded) > 1 and len({job.get("name", None) for job in expanded}) < len(expanded):
+        raise TjfCliUserError(
+            f"The name of job '{name}' must use the matrix variables, like "
+            "'name-{{ variable }}', so that each combination has its own name"
+        )
+
+    return expanded
+
+
+def _apply_templates(
+    job: Dict[str, Any], defaults: Dict[str, Any], templates: Dict[str, Any], n: int
+) -> Dict[str, Any]:
+    if not isinstance(job, dict):
+        raise TjfCliUserError(f"Unable to load job number {n}: not a mapping")
+
+    result = dict(defaults)
+
+    names = job.get(TEMPLATE_KEY) or []
+    if isinstance(names, str):
+        names = [names]
+    for template_name in names:
+        if template_name not in templates:
+            raise TjfCliUserError(
+                f"Unable to load job number {n}: unknown template '{template_name}'"
+            )
+        result.update(templates[template_name])
+
+    result.update({key: value for key, value in job.items() if key != TEMPLATE_KEY})
+    return result
+
+
+def expand_document(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Expands defaults, templates and matrices into a flat list of job definitions."""
+    jobs = []
+    for n, job in enumerate(document["jobs"], start=1):
+        merged = _apply_templates(job, document["defaults"], document["templates"], n)
+        jobs.extend(_expand_matrix(merged))
+
+    seen = set()
+    for job in jobs:
+        name = job.get("name", None)
+        if name is None:
+            continue
+        if name in seen:
+            raise TjfCliUserError(f"Job '{name}' is defined more than once")
+        seen.add(name)
+
+    return jobs
+
+
+def _cache_key(path: Path) -> str:
+    # one entry per file, replaced when it changes, so editing it doesn't leave old ones behind
+    return "jobsfile-{}.json".format(content_hash(str(path).encode()))
+
+
+def _cached_entry(path: Path, cache_dir: Optional[Path]) -> Optional[Dict[str, Any]]:
+    entry = read_cache(_cache_key(path), cache_dir)
+    if not isinstance(entry, dict) or entry.get("version") != CACHE_VERSION:
+        return None
+
+    sources = entry.get("sources", None)
+    if not isinstance(sources, dict) or str(path) not in sources:
+        return None
+
+    for source, expected_hash in sources.items():
+        try:
+            with open(source, "rb") as f:
+                if content_hash(f.read()) != expected_hash:
+                    return None
+        except Exception:
+            return None
+
+    if entry.get("jobs", None) is None:
+        return None
+    return entry
+
+
+def load_jobs_file(
+    file: str,
+    use_cache: bool = True,
+    cache_dir: Optional[Path] = None,
+    sources: Optional[Dict[str, str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Loads a jobs file, returning the flat list of job definitions. If given, sources is filled
+    with the paths of the files read (the file and its includes) and the hash of their content.
+
+    The expanded list is cached, along with the hash of the file and everything it includes,
+    so unchanged files skip the YAML parsing and expansion.
+    """
+    path = Path(file).expanduser().resolve()
+    if sources is None:
+        sources = {}
+
+    if use_cache:
+        entry = _cached_entry(path, cache_dir)
+        if entry is not None:
+            LOGGER.debug(f"using cached expansion of jobs file '{file}'")
+            sources.update(entry["sources"])
+            return entry["jobs"]
+
+    jobs = expand_document(_read_document(path, sources, []))
+
+    if use_cache:
+        entry = {"version": CACHE_VERSION, "sources": sources, "jobs": jobs}
+        write_cache(_cache_key(path), entry, cache_dir)
+
+    return jobs
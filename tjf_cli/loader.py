@@ -4,14 +4,25 @@
 # it under the terms of the GNU General Public License as published by
 # the Free Software Foundation; either version 3 of the License, or
 # (at your option) any later version.
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
 from logging import getLogger
-from typing import Callable, Dict, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from toolforge_weld.api_client import ToolforgeClient
 
+from tjf_cli.api import TjfCliHttpUserError
+from tjf_cli.cron import expand_hash_tokens, spread_schedule
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.normalize import DEFAULT_CPU, DEFAULT_MEMORY, JobNormalizer
+
 LOGGER = getLogger(__name__)
 
+# for commands acting on several jobs: how many requests to make at the same time. Up to this
+# many jobs given by name are fetched individually, instead of fetching the whole job list
+BULK_WORKERS = 8
+
 # TODO: perhaps this could be extracted from argparse?
 KNOWN_YAML_KEYS = [
     "name",
@@ -35,81 +46,289 @@ class LoadChanges:
     delete: Set[str]
     add: Set[str]
     modify: Set[str]
+    # API objects of the jobs to be deleted or modified, as they were before the changes
+    previous: Dict[str, Dict] = field(default_factory=dict)
 
+    def is_empty(self) -> bool:
+        return not self.delete and not self.add and not self.modify
 
-def jobs_are_same(job_config: Dict, api_obj: Dict) -> bool:
-    """Determines if a job api object matches its configuration."""
 
-    # TODO: some renames to make things easier. See also T327280
-    api_obj["command"] = api_obj["cmd"]
-    api_obj["mem"] = api_obj.get("memory", None)
-    api_obj["filelog-stdout"] = api_obj.get("filelog_stdout", None)
-    api_obj["filelog-stderr"] = api_obj.get("filelog_stderr", None)
-
-    # TODO: explicitely setting default CPU/memory should not count as a difference
-    dont_evaluate_here = ["name", "emails", "no-filelog", "wait", "retry"]
-    keys = [k for k in KNOWN_YAML_KEYS if k not in dont_evaluate_here]
-    for key in keys:
-        if api_obj.get(key, None) != job_config.get(key, None):
-            LOGGER.debug(
-                "currently existing job %s has different '%s' than the definition",
-                api_obj["name"],
-                key,
-            )
+JOB_TYPES = ["normal", "schedule", "continuous"]
+
+
+def config_job_type(job_config: Dict[str, Any]) -> str:
+    """Returns the type of a job, as in JOB_TYPES, from its configuration."""
+    if job_config.get("schedule", None):
+        return "schedule"
+    if job_config.get("continuous", False):
+        return "continuous"
+    return "normal"
+
+
+@dataclass
+class JobSelector:
+    """Selects jobs by name (glob patterns allowed), option values and/or type."""
+
+    patterns: List[str] = field(default_factory=list)
+    options: Dict[str, str] = field(default_factory=dict)
+    # one of JOB_TYPES
+    job_type: Optional[str] = None
+
+    @classmethod
+    def from_args(
+        cls,
+        patterns: Optional[List[str]],
+        selectors: Optional[List[str]],
+        job_type: Optional[str] = None,
+    ):
+        options = {}
+        for selector in selectors or []:
+            key, sep, value = selector.partition("=")
+            if not sep or not key:
+                raise TjfCliUserError(f"Invalid selector '{selector}', expected KEY=VALUE")
+            options[key] = value
+        return cls(patterns=patterns or [], options=options, job_type=job_type)
+
+    def is_empty(self) -> bool:
+        return not self.patterns and not self.options and not self.job_type
+
+    def _has_globs(self) -> bool:
+        return any(any(c in pattern for c in "*?[") for pattern in self.patterns)
+
+    def literal_names(self) -> Optional[List[str]]:
+        """Returns the selected job names if they are given explicitly, or None otherwise."""
+        if not self.patterns or self._has_globs() or self.options or self.job_type:
+            return None
+        return list(dict.fromkeys(self.patterns))
+
+    def _matches_name(self, name: str) -> bool:
+        return not self.patterns or any(fnmatchcase(name, p) for p in self.patterns)
+
+    def _matches_options(self, job: Dict[str, Any]) -> bool:
+        if self.job_type and config_job_type(job) != self.job_type:
             return False
+        for key, expected in self.options.items():
+            value = job.get(key, None)
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+            if value is None or str(value) != expected:
+                return False
+        return True
+
+    def resolve(
+        self, configured_job_data: List[Dict[str, Any]]
+    ) -> Tuple[Callable[[str], bool], Optional[Set[str]]]:
+        """
+        Returns a job name filter for calculate_changes, plus the set of job names to fetch
+        individually from the API, or None if the full job list must be fetched. That's only
+        needed for glob patterns, to find jobs removed from the file.
+        """
+        if self._has_globs() and not self.options and not self.job_type:
+            return self._matches_name, None
+
+        names = set() if self.options or self.job_type else {*self.patterns}
+        for job in configured_job_data:
+            if "name" in job and self._matches_name(job["name"]) and self._matches_options(job):
+                names.add(job["name"])
+
+        return (lambda name: name in names), names
+
+    def select_api_jobs(self, api_jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns the job api objects matching this selector."""
+        return [
+            job
+            for job in api_jobs
+            if self._matches_name(job["name"]) and self._matches_options(job_api_to_config(job))
+        ]
+
+
+def prepare_schedules(configured_job_data: List[Dict[str, Any]], spread: bool = False) -> None:
+    """
+    Replaces the H tokens in the job schedules with their values, and spreads the schedules of
+    the jobs with 'schedule-spread: true' (or of all jobs if spread is set, unless they have
+    'schedule-spread: false'). The result only depends on the job names, so it doesn't change
+    between loads.
+    """
+    for job in configured_job_data:
+        job_spread = job.pop("schedule-spread", None)
+        if job_spread is None:
+            job_spread = spread
+        elif not isinstance(job_spread, bool):
+            raise TjfCliUserError(
+                f"Invalid 'schedule-spread' value for job '{job.get('name')}', "
+                "expected true or false"
+            )
+
+        schedule = job.get("schedule", None)
+        if not isinstance(schedule, str) or "name" not in job:
+            continue
+
+        if job_spread:
+            job["schedule"] = spread_schedule(schedule, job["name"])
+        else:
+            job["schedule"] = expand_hash_tokens(schedule, job["name"])
+
+
+def _difference(api_obj: Dict, key: str) -> bool:
+    LOGGER.debug(
+        "currently existing job %s has different '%s' than the definition", api_obj["name"], key
+    )
+    return False
+
+
+def jobs_are_same(
+    job_config: Dict, api_obj: Dict, normalizer: Optional[JobNormalizer] = None
+) -> bool:
+    """Determines if a job api object matches its configuration."""
+    if normalizer is None:
+        normalizer = JobNormalizer()
 
-    emails_config = job_config.get("emails", "none")
-    if api_obj["emails"] != emails_config:
-        LOGGER.debug(
-            "currently existing job %s has different 'emails' than the definition", api_obj["name"]
-        )
-        return False
+    # the API names some options differently than the file: cmd is command, memory is mem, and
+    # the log paths use underscores. See also T327280
+    if api_obj["cmd"] != job_config.get("command", None):
+        return _difference(api_obj, "command")
 
-    retry_config = job_config.get("retry", 0)
-    if api_obj["retry"] != retry_config:
-        LOGGER.debug(
-            "currently existing job %s has different 'retry' than the definition", api_obj["name"]
-        )
-        return False
+    if not normalizer.same_image(job_config.get("image", None), api_obj.get("image", None)):
+        return _difference(api_obj, "image")
+
+    if (api_obj.get("schedule", None) or None) != (job_config.get("schedule", None) or None):
+        return _difference(api_obj, "schedule")
+
+    if bool(api_obj.get("continuous", False)) != bool(job_config.get("continuous", False)):
+        return _difference(api_obj, "continuous")
+
+    if not normalizer.same_quantity(
+        job_config.get("mem", None), api_obj.get("memory", None), DEFAULT_MEMORY
+    ):
+        return _difference(api_obj, "mem")
+
+    if not normalizer.same_quantity(
+        job_config.get("cpu", None), api_obj.get("cpu", None), DEFAULT_CPU
+    ):
+        return _difference(api_obj, "cpu")
+
+    if api_obj["emails"] != job_config.get("emails", "none"):
+        return _difference(api_obj, "emails")
+
+    if api_obj["retry"] != job_config.get("retry", 0):
+        return _difference(api_obj, "retry")
 
     # TODO: make the api emit proper json booleans, See also T327280
     filelog_api = api_obj.get("filelog") in (True, "True")
     filelog_config = not job_config.get("no-filelog", False)
     if filelog_config != filelog_api:
-        LOGGER.debug(
-            "currently existing job %s has different 'no-filelog' than the definition",
+        return _difference(api_obj, "no-filelog")
+
+    for key, suffix in (("filelog-stdout", ".out"), ("filelog-stderr", ".err")):
+        if not normalizer.same_log_path(
             api_obj["name"],
-        )
-        return False
+            suffix,
+            job_config.get(key, None),
+            api_obj.get(key.replace("-", "_"), None),
+        ):
+            return _difference(api_obj, key)
 
     LOGGER.debug("currently existing job %s matches its definition", api_obj["name"])
     return True
 
 
+def _get_job(conf: ToolforgeClient, name: str) -> Optional[Dict]:
+    try:
+        return conf.get(f"/jobs/{name}")
+    except TjfCliHttpUserError as e:
+        if e.status_code != 404:
+            raise e
+        LOGGER.debug(f"job '{name}' does not currently exist")
+        return None
+
+
+def _get_jobs_by_name(conf: ToolforgeClient, names: Set[str]) -> List[Dict]:
+    with ThreadPoolExecutor(max_workers=BULK_WORKERS) as executor:
+        jobs = executor.map(lambda name: _get_job(conf, name), sorted(names))
+    return [job for job in jobs if job is not None]
+
+
+def job_api_to_config(api_obj: Dict) -> Dict:
+    """Converts a job api object to its configuration, the inverse of jobs_are_same."""
+    config = {"name": api_obj["name"], "command": api_obj["cmd"], "image": api_obj["image"]}
+
+    if api_obj.get("schedule", None):
+        config["schedule"] = api_obj["schedule"]
+    elif api_obj.get("continuous", False):
+        config["continuous"] = True
+
+    if api_obj.get("memory", None):
+        config["mem"] = api_obj["memory"]
+    if api_obj.get("cpu", None):
+        config["cpu"] = api_obj["cpu"]
+
+    if api_obj.get("retry", 0) != 0:
+        config["retry"] = api_obj["retry"]
+    if api_obj.get("emails", "none") != "none":
+        config["emails"] = api_obj["emails"]
+
+    # TODO: make the api emit proper json booleans, See also T327280
+    if api_obj.get("filelog") not in (True, "True"):
+        config["no-filelog"] = True
+    if api_obj.get("filelog_stdout", None):
+        config["filelog-stdout"] = api_obj["filelog_stdout"]
+    if api_obj.get("filelog_stderr", None):
+        config["filelog-stderr"] = api_obj["filelog_stderr"]
+
+    return config
+
+
 def calculate_changes(
-    conf: ToolforgeClient, configured_job_data: Dict, filter: Optional[Callable[[str], bool]]
+    conf: ToolforgeClient,
+    configured_job_data: Dict,
+    filter: Optional[Callable[[str], bool]],
+    names: Optional[Set[str]] = None,
 ) -> LoadChanges:
-    for job in configured_job_data:
-        for key in job:
-            if key not in KNOWN_YAML_KEYS:
-                LOGGER.warning(f"Unknown key '{key}' in job '{job['name']}' definition")
+    """
+    Calculates the changes needed to make the current jobs match the configured ones.
 
+    If names is set, the filter must not match any other job names. Up to BULK_WORKERS of them
+    are then fetched from the API individually, instead of fetching the full job list.
+    """
     wanted_jobs = {
         job["name"]: job for job in configured_job_data if not filter or filter(job["name"])
     }
 
-    current_job_data = conf.get("/list/")
+    for job in wanted_jobs.values():
+        for key in job:
+            if key not in KNOWN_YAML_KEYS:
+                LOGGER.warning(f"Unknown key '{key}' in job '{job['name']}' definition")
+
+    if names is not None and len(names) <= BULK_WORKERS:
+        current_job_data = _get_jobs_by_name(conf, names)
+    else:
+        current_job_data = conf.get("/list/")
 
     current_jobs = {
         job["name"]: job for job in current_job_data if not filter or filter(job["name"])
     }
+    return diff_jobs(wanted_jobs, current_jobs, JobNormalizer(conf))
+
+
+def diff_jobs(
+    wanted_jobs: Dict[str, Dict],
+    current_jobs: Dict[str, Dict],
+    normalizer: Optional[JobNormalizer] = None,
+) -> LoadChanges:
+    """Compares the configured jobs with the API objects of the current ones, both by name."""
+    if normalizer is None:
+        normalizer = JobNormalizer()
+    previous = {name: dict(job) for name, job in current_jobs.items()}
 
     to_delete = current_jobs.keys() - wanted_jobs.keys()
     to_add = wanted_jobs.keys() - current_jobs.keys()
 
     to_modify = set()
     for job_name, job_data in wanted_jobs.items():
-        if job_name in current_jobs and not jobs_are_same(job_data, current_jobs[job_name]):
+        if job_name in current_jobs and not jobs_are_same(
+            job_data, current_jobs[job_name], normalizer
+        ):
             to_modify.add(job_name)
 
-    return LoadChanges(to_delete, to_add, to_modify)
+    previous = {name: job for name, job in previous.items() if name in {*to_delete, *to_modify}}
+    return LoadChanges(to_delete, to_add, to_modify, previous)
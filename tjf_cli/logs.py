@@ -0,0 +1,286 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Filtering job logs, and saving them to local files.
+
+The filters are sent to the API so it can skip the lines that don't match, and applied again
+to the received lines in case it can't. Saved lines are written as received from the API, one
+JSON object per line, to a file that can be compressed with gzip or zstd and rotated when it
+gets too big or too old.
+"""
+
+import gzip
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from glob import glob
+from logging import getLogger
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Pattern, Tuple
+
+from tjf_cli.errors import TjfCliUserError
+
+LOGGER = getLogger(__name__)
+
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+# how often to make sure what was received is on disk, compressed streams are only flushed
+# every few seconds to not hurt the compression ratio
+FLUSH_INTERVAL = 5
+
+DURATION = re.compile(r"^(?P<amount>\d+)(?P<unit>[smhd])$")
+DURATION_UNITS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+TIMESTAMP = re.compile(
+    r"^(?P<base>\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2})?)(?P<fraction>\.\d+)?"
+    r"(?P<offset>[Zz]|[+-]\d{2}:?\d{2})?$"
+)
+
+
+def parse_duration(duration: str) -> int:
+    """Parses a duration like '30m' or '2d' into seconds."""
+    match = DURATION.match(duration.strip())
+    if not match:
+        raise TjfCliUserError(
+            f"Invalid duration '{duration}', expected for example 30s, 10m, 2h or 1d"
+        )
+    return int(match.group("amount")) * DURATION_UNITS[match.group("unit")]
+
+
+def parse_log_time(value: str) -> datetime:
+    """Parses an ISO 8601 timestamp, like the ones in the log lines, into an aware datetime."""
+    match = TIMESTAMP.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid timestamp '{value}'")
+
+    # fromisoformat doesn't accept the 'Z' suffix nor nanoseconds in older Python versions
+    fraction = match.group("fraction")
+    fraction = fraction[:7].ljust(7, "0") if fraction else ""
+    offset = match.group("offset") or "Z"
+    offset = "+00:00" if offset in ("Z", "z") else f"{offset[:3]}:{offset[-2:]}"
+    moment = datetime.fromisoformat(f"{match.group('base')}{fraction}{offset}")
+    return moment.astimezone(timezone.utc)
+
+
+def parse_time_arg(value: str, now: Optional[datetime] = None) -> datetime:
+    """Parses a --since/--until value: a timestamp, or a duration meaning that long ago."""
+    if DURATION.match(value.strip()):
+        return (now or datetime.now(timezone.utc)) - timedelta(seconds=parse_duration(value))
+    try:
+        return parse_log_time(value)
+    except ValueError as e:
+        raise TjfCliUserError(
+            f"Invalid time '{value}', expected a timestamp like 2024-01-31T22:00:00Z "
+            "or a duration like 2h"
+        ) from e
+
+
+def format_log_time(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass
+class LogFilter:
+    """Which log lines to keep. The pod matches the pod name or a prefix of it."""
+
+    grep: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    pod: Optional[str] = None
+    max_matches: Optional[int] = None
+
+    pattern: Optional[Pattern] = field(init=False, default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.grep is not None:
+            try:
+                self.pattern = re.compile(self.grep)
+            except re.error as e:
+                raise TjfCliUserError(f"Invalid regular expression '{self.grep}': {e}") from e
+
+    @property
+    def is_empty(self) -> bool:
+        return (
+            self.grep is None
+            and self.since is None
+            and self.until is None
+            and self.pod is None
+            and self.max_matches is None
+        )
+
+    def api_params(self) -> Dict[str, str]:
+        params = {}
+        if self.grep is not None:
+            params["grep"] = self.grep
+        if self.since is not None:
+            params["since"] = format_log_time(self.since)
+        if self.until is not None:
+            params["until"] = format_log_time(self.until)
+        if self.pod is not None:
+            params["pod"] = self.pod
+        return params
+
+    def _line_time(self, line: Dict[str, Any]) -> Optional[datetime]:
+        try:
+            return parse_log_time(line["datetime"])
+        except (KeyError, ValueError):
+            return None
+
+    def matches(self, line: Dict[str, Any]) -> bool:
+        if self.pod is not None and not line.get("pod", "").startswith(self.pod):
+            return False
+        if self.since is not None or self.until is not None:
+            moment = self._line_time(line)
+            if moment is None:
+                return False
+            if self.since is not None and moment < self.since:
+                return False
+            if self.until is not None and moment > self.until:
+                return False
+        return self.pattern is None or self.pattern.search(line.get("message", "")) is not None
+
+    def filter(
+        self, raw_lines: Iterable[str], follow: bool = False
+    ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yields the matching lines, raw and parsed. Stops reading as soon as max_matches lines
+        matched or, when following, once the lines are past the end of the time window.
+        """
+        if self.max_matches is not None and self.max_matches <= 0:
+            return
+
+        matched = 0
+        for raw_line in raw_lines:
+            line = json.loads(raw_line)
+            if not self.matches(line):
+                if follow and self.until is not None:
+                    moment = self._line_time(line)
+                    if moment is not None and moment > self.until:
+                        return
+                continue
+
+            yield raw_line, line
+            matched += 1
+            # without waiting for another line, which might never come when following
+            if self.max_matches is not None and matched >= self.max_matches:
+                return
+
+
+def compression_for(path: str) -> Optional[str]:
+    """Returns the compression implied by the file name, if any."""
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def _open(path: str, compression: Optional[str]) -> IO[bytes]:
+    if compression == "gzip":
+        # appending creates a new gzip member, which is still a valid gzip file
+        return gzip.open(path, "ab")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise TjfCliUserError(
+                "zstd compression needs the 'zstandard' Python module, use gzip instead"
+            ) from e
+        return zstandard.open(path, "ab")
+    return open(path, "ab")
+
+
+class RotatingLogWriter:
+    """Writes log lines to a file, rotating it after max_bytes bytes or max_age seconds."""
+
+    def __init__(
+        self,
+        path: str,
+        compression: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[int] = None,
+        keep: Optional[int] = None,
+    ) -> None:
+        self.path = path
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep = keep
+
+        self._file: Optional[IO[bytes]] = None
+        self._opened_at = 0.0
+        self._flushed_at = 0.0
+        self._written = 0
+
+    def _rotated_path(self, suffix: str) -> str:
+        base, extension = self.path, ""
+        for compression_suffix in COMPRESSION_SUFFIXES:
+            if base.endswith(compression_suffix):
+                base, extension = base[: -len(compression_suffix)], compression_suffix
+        base, inner_extension = os.path.splitext(base)
+        return f"{base}.{suffix}{inner_extension}{extension}"
+
+    def _open(self) -> None:
+        try:
+            self._file = _open(self.path, self.compression)
+        except OSError as e:
+            raise TjfCliUserError(f"Unable to open log file '{self.path}': {e}") from e
+        self._opened_at = self._flushed_at = time.monotonic()
+        self._written = os.path.getsize(self.path) if self.compression is None else 0
+
+    def rotate(self) -> None:
+        self.close()
+        if not os.path.exists(self.path):
+            return
+
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        target = self._rotated_path(timestamp)
+        counter = 1
+        while os.path.exists(target):
+            target = self._rotated_path(f"{timestamp}-{counter}")
+            counter += 1
+        os.rename(self.path, target)
+        LOGGER.debug(f"rotated log file '{self.path}' to '{target}'")
+
+        if self.keep is not None:
+            rotated = sorted(glob(self._rotated_path("*")))
+            for old in rotated[: max(0, len(rotated) - self.keep)]:
+                LOGGER.debug(f"removing old log file '{old}'")
+                os.unlink(old)
+
+    def _needs_rotation(self, now: float) -> bool:
+        if self.max_bytes is not None and self._written >= self.max_bytes:
+            return True
+        return self.max_age is not None and now - self._opened_at >= self.max_age
+
+    def write_line(self, line: str) -> None:
+        now = time.monotonic()
+        if self._file is not None and self._needs_rotation(now):
+            self.rotate()
+        if self._file is None:
+            self._open()
+        assert self._file is not None
+
+        data = line.rstrip("\n").encode() + b"\n"
+        self._file.write(data)
+        self._written += len(data)
+
+        if now - self._flushed_at >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._flushed_at = now
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "RotatingLogWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,132 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""Job status metrics in the Prometheus textfile format."""
+
+import os
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.loader import config_job_type
+from tjf_cli.quantity import parse_quantity
+from tjf_cli.status import JobStatus, parse_job_status
+
+LOGGER = getLogger(__name__)
+
+METRIC_PREFIX = "toolforge_jobs"
+
+METRICS = {
+    "job_info": "Information about a job, always 1.",
+    "job_status": "Current status of a job, always 1.",
+    "job_retry_limit": "How many times a failed job is retried.",
+    "job_memory_bytes": "Memory requested by a job, if not using the default.",
+    "job_cpu_cores": "CPU requested by a job, if not using the default.",
+    "job_restarts": "How many times the container of a job was restarted, if known.",
+    "jobs": "Number of jobs.",
+    "last_update_timestamp_seconds": "When these metrics were generated.",
+}
+# only when exporting the metrics of several tools
+TOOLS_METRICS = {
+    "tool_up": "Whether the jobs of a tool could be fetched.",
+}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+
+
+def _status(status: JobStatus) -> str:
+    # status_short can contain timestamps, like "Last schedule time: 2021-06-30T10:26:00Z"
+    return status.status.split(":")[0].strip()
+
+
+Samples = Dict[str, List[Tuple[Dict[str, str], float]]]
+
+
+def _add_job_samples(samples: Samples, jobs: List[Dict], tool_labels: Dict[str, str]) -> None:
+    for job in sorted(jobs, key=lambda job: job["name"]):
+        name = job["name"]
+        labels = {**tool_labels, "job": name}
+        info = {
+            **labels,
+            "type": config_job_type(job),
+            "image": job.get("image", ""),
+            "schedule": job.get("schedule", None) or "",
+        }
+        status = parse_job_status(job)
+        samples["job_info"].append((info, 1))
+        samples["job_status"].append(({**labels, "status": _status(status)}, 1))
+        if status.restart_count is not None:
+            samples["job_restarts"].append((labels, status.restart_count))
+        samples["job_retry_limit"].append((labels, job.get("retry", 0)))
+
+        for key, metric in (("memory", "job_memory_bytes"), ("cpu", "job_cpu_cores")):
+            if not job.get(key, None):
+                continue
+            try:
+                samples[metric].append((labels, parse_quantity(job[key])))
+            except TjfCliUserError:
+                LOGGER.debug(f"ignoring unparseable {key} value '{job[key]}' of job '{name}'")
+
+    samples["jobs"].append((tool_labels, len(jobs)))
+
+
+def _format_samples(samples: Samples, metrics: Dict[str, str]) -> str:
+    content = ""
+    for metric, description in metrics.items():
+        full_name = f"{METRIC_PREFIX}_{metric}"
+        content += f"# HELP {full_name} {description}\n"
+        content += f"# TYPE {full_name} gauge\n"
+        for labels, value in samples[metric]:
+            label_str = f"{{{_labels(labels)}}}" if labels else ""
+            content += f"{full_name}{label_str} {value}\n"
+
+    return content
+
+
+def generate_metrics(jobs: List[Dict], timestamp: float) -> str:
+    samples: Samples = {name: [] for name in METRICS}
+    _add_job_samples(samples, jobs, {})
+    samples["last_update_timestamp_seconds"].append(({}, timestamp))
+    return _format_samples(samples, METRICS)
+
+
+def generate_tools_metrics(jobs: Dict[str, Optional[List[Dict]]], timestamp: float) -> str:
+    """
+    Generates the metrics of several tools, with a tool label. The tools whose jobs could not be
+    fetched (None) only get a tool_up metric of 0.
+    """
+    metrics = {**METRICS, **TOOLS_METRICS}
+    samples: Samples = {name: [] for name in metrics}
+    for tool, tool_jobs in sorted(jobs.items()):
+        samples["tool_up"].append(({"tool": tool}, 0 if tool_jobs is None else 1))
+        if tool_jobs is not None:
+            _add_job_samples(samples, tool_jobs, {"tool": tool})
+
+    samples["last_update_timestamp_seconds"].append(({}, timestamp))
+    return _format_samples(samples, metrics)
+
+
+def write_textfile(path: str, content: str) -> None:
+    """Writes the file atomically, so the node exporter never reads a partial file."""
+    temp_file = f"{path}~{os.getpid()}"
+    try:
+        with open(temp_file, "w") as f:
+            f.write(content)
+        Path(temp_file).rename(path)
+    except OSError as e:
+        # with --interval, each failed refresh would leave another one behind
+        try:
+            Path(temp_file).unlink()
+        except FileNotFoundError:
+            pass
+        raise TjfCliUserError(f"Unable to write metrics file '{path}': {e}") from e
@@ -0,0 +1,152 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Comparing the options of job configurations with the ones of their API objects.
+
+The same value can be written in several ways: '1Gi' and '1024Mi' are the same amount of
+memory, leaving out the CPU is the same as requesting the default, an image can be named by its
+short name or its URL, and a log file by a path relative to the home directory. Each difference
+makes `load` delete and recreate the job, so these are all compared by what they mean.
+"""
+
+import os
+import time
+from decimal import Decimal
+from logging import getLogger
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from toolforge_weld.api_client import ToolforgeClient
+
+from tjf_cli.api import TjfCliHttpError
+from tjf_cli.cache import content_hash, read_cache, write_cache
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.quantity import parse_quantity
+
+LOGGER = getLogger(__name__)
+
+# what the jobs API gives a job that doesn't request anything
+DEFAULT_MEMORY = "512Mi"
+DEFAULT_CPU = "500m"
+
+IMAGES_CACHE_VERSION = 1
+# images are added or renamed rarely, and a stale list only makes some jobs be recreated
+IMAGES_CACHE_TTL = 24 * 60 * 60
+
+
+def _images_cache_key(server: str) -> str:
+    return "images-{}.json".format(content_hash(server.encode()))
+
+
+def fetch_image_aliases(
+    api: ToolforgeClient, cache_dir: Optional[Path] = None, max_age: int = IMAGES_CACHE_TTL
+) -> Dict[str, str]:
+    """
+    Returns the short name of each image, by short name and by URL, from the /images/ API.
+    The list is cached for max_age seconds.
+    """
+    key = _images_cache_key(api.server)
+    entry = read_cache(key, cache_dir)
+    if (
+        isinstance(entry, dict)
+        and entry.get("version") == IMAGES_CACHE_VERSION
+        and isinstance(entry.get("aliases"), dict)
+        and 0 <= time.time() - entry.get("fetched_at", 0) < max_age
+    ):
+        LOGGER.debug("using cached image list")
+        return entry["aliases"]
+
+    aliases: Dict[str, str] = {}
+    for image in api.get("/images/"):
+        shortname = image["shortname"]
+        aliases[shortname] = shortname
+        if image.get("image", None):
+            aliases[image["image"]] = shortname
+
+    write_cache(
+        key,
+        {"version": IMAGES_CACHE_VERSION, "fetched_at": time.time(), "aliases": aliases},
+        cache_dir,
+    )
+    return aliases
+
+
+class JobNormalizer:
+    """
+    Compares job options by meaning. With an API client, image names are looked up in the image
+    list of the API, only if some are spelled differently. Relative log file paths are relative
+    to home.
+    """
+
+    def __init__(
+        self,
+        api: Optional[ToolforgeClient] = None,
+        home: Optional[str] = "~",
+        cache_dir: Optional[Path] = None,
+    ) -> None:
+        self.api = api
+        self.home = os.path.expanduser(home) if home is not None else None
+        self.cache_dir = cache_dir
+        self._image_aliases: Optional[Dict[str, str]] = None
+
+    def image_aliases(self) -> Dict[str, str]:
+        if self._image_aliases is None:
+            self._image_aliases = {}
+            if self.api is not None:
+                try:
+                    self._image_aliases = fetch_image_aliases(self.api, self.cache_dir)
+                except (TjfCliHttpError, KeyError, TypeError) as e:
+                    LOGGER.debug(f"unable to get the image list, comparing image names as is: {e}")
+        return self._image_aliases
+
+    def same_image(self, configured: Optional[str], current: Optional[str]) -> bool:
+        if configured == current:
+            return True
+        if configured is None or current is None:
+            return False
+        aliases = self.image_aliases()
+        return aliases.get(configured, configured) == aliases.get(current, current)
+
+    def same_quantity(
+        self,
+        configured: Optional[Union[str, int, float]],
+        current: Optional[Union[str, int, float]],
+        default: str,
+    ) -> bool:
+        def value(quantity: Optional[Union[str, int, float]]) -> Any:
+            if quantity is None or quantity == "":
+                quantity = default
+            try:
+                return parse_quantity(quantity)
+            except TjfCliUserError:
+                # let the API complain about it
+                return str(quantity)
+
+        configured_value, current_value = value(configured), value(current)
+        if isinstance(configured_value, Decimal) != isinstance(current_value, Decimal):
+            return False
+        return configured_value == current_value
+
+    def _log_path(self, path: Optional[str], default: Optional[str]) -> Optional[str]:
+        if not path:
+            return None
+        path = os.path.expanduser(path) if path.startswith("~") else path
+        if self.home is not None and not os.path.isabs(path):
+            path = os.path.join(self.home, path)
+        path = os.path.normpath(path)
+        # set explicitly to where the logs go anyway
+        return None if path == default else path
+
+    def same_log_path(
+        self, name: str, suffix: str, configured: Optional[str], current: Optional[str]
+    ) -> bool:
+        default = (
+            os.path.normpath(os.path.join(self.home, f"{name}{suffix}"))
+            if self.home is not None
+            else None
+        )
+        return self._log_path(configured, default) == self._log_path(current, default)
@@ -0,0 +1,176 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Client-side profiling for --profile.
+
+Profiling is disabled by default, and span() is then a no-op. Once enable() is called, every
+span and every HTTP request made through an instrumented ToolforgeClient is recorded.
+"""
+
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from tabulate import tabulate
+from toolforge_weld.api_client import ToolforgeClient
+
+from tjf_cli.errors import TjfCliUserError
+
+LOGGER = getLogger(__name__)
+
+HTTP_METHODS = ["get", "post", "put", "delete", "get_raw_lines"]
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    duration: float
+    thread: int
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, category: str = "phase", **args) -> Iterator[Dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.record(
+                Span(
+                    name=name,
+                    category=category,
+                    start=start - self.origin,
+                    duration=time.perf_counter() - start,
+                    thread=threading.get_ident(),
+                    args=args,
+                )
+            )
+
+    def _on_response(self, response: requests.Response, *args, **kwargs) -> None:
+        # the time between sending the request and parsing the response headers, which is
+        # mostly the time the server took to answer
+        elapsed = response.elapsed.total_seconds()
+        self.record(
+            Span(
+                name=f"server {response.request.method} {response.request.path_url}",
+                category="server",
+                start=time.perf_counter() - self.origin - elapsed,
+                duration=elapsed,
+                thread=threading.get_ident(),
+                args={"status": response.status_code},
+            )
+        )
+
+    def instrument_client(self, api: ToolforgeClient) -> None:
+        """Records all the requests made with this client."""
+        api.session.hooks["response"].append(self._on_response)
+
+        for method in HTTP_METHODS:
+            original = getattr(api, method, None)
+            if original is None:
+                continue
+
+            if method == "get_raw_lines":
+
+                @functools.wraps(original)
+                def wrapper(url, *args, original=original, **kwargs):
+                    with self.span(f"HTTP GET {url} (stream)", category="http"):
+                        yield from original(url, *args, **kwargs)
+
+            else:
+
+                @functools.wraps(original)
+                def wrapper(url, *args, original=original, verb=method.upper(), **kwargs):
+                    with self.span(f"HTTP {verb} {url}", category="http"):
+                        return original(url, *args, **kwargs)
+
+            setattr(api, method, wrapper)
+
+    def summary(self) -> str:
+        totals: Dict[str, List[float]] = {}
+        for span in self.spans:
+            totals.setdefault(span.name, []).append(span.duration)
+
+        rows = [
+            [name, len(durations), sum(durations), sum(durations) / len(durations), max(durations)]
+            for name, durations in totals.items()
+        ]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        rows.append(["(wall clock)", "", time.perf_counter() - self.origin, "", ""])
+
+        return tabulate(
+            rows,
+            headers=["Span:", "Count:", "Total (s):", "Mean (s):", "Max (s):"],
+            tablefmt="simple",
+            floatfmt=".4f",
+        )
+
+    def trace_events(self) -> List[Dict[str, Any]]:
+        """Returns the spans in the Chrome trace event format."""
+        return [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round(span.start * 1_000_000),
+                "dur": round(span.duration * 1_000_000),
+                "pid": 1,
+                "tid": span.thread,
+                "args": span.args,
+            }
+            for span in sorted(self.spans, key=lambda span: span.start)
+        ]
+
+    def write_trace(self, file: str) -> None:
+        try:
+            with open(file, "w") as f:
+                json.dump({"traceEvents": self.trace_events()}, f, default=str)
+        except OSError as e:
+            raise TjfCliUserError(f"Unable to write profiling data to '{file}': {e}") from e
+
+
+_PROFILER: Optional[Profiler] = None
+
+
+def enable() -> Profiler:
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = Profiler()
+    return _PROFILER
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _PROFILER
+
+
+@contextmanager
+def span(name: str, category: str = "phase", **args) -> Iterator[Dict[str, Any]]:
+    """Records a span if profiling is enabled. The yielded dict can be used to add details."""
+    if _PROFILER is None:
+        yield args
+        return
+
+    with _PROFILER.span(name, category, **args) as span_args:
+        yield span_args
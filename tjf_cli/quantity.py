@@ -0,0 +1,78 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""Parsing of Kubernetes resource quantities, like '512Mi' or '500m'."""
+
+from decimal import Decimal, InvalidOperation
+from typing import Union
+
+from tjf_cli.errors import TjfCliUserError
+
+# ordered so that the longest suffixes are tried first
+QUANTITY_SUFFIXES = [
+    ("Ki", Decimal(2) ** 10),
+    ("Mi", Decimal(2) ** 20),
+    ("Gi", Decimal(2) ** 30),
+    ("Ti", Decimal(2) ** 40),
+    ("Pi", Decimal(2) ** 50),
+    ("Ei", Decimal(2) ** 60),
+    ("n", Decimal(10) ** -9),
+    ("u", Decimal(10) ** -6),
+    ("m", Decimal(10) ** -3),
+    ("k", Decimal(10) ** 3),
+    ("M", Decimal(10) ** 6),
+    ("G", Decimal(10) ** 9),
+    ("T", Decimal(10) ** 12),
+    ("P", Decimal(10) ** 15),
+    ("E", Decimal(10) ** 18),
+]
+
+
+def parse_quantity(quantity: Union[str, int, float]) -> Decimal:
+    """
+    Parses a Kubernetes quantity into a plain number.
+
+    For memory that's the amount of bytes, and for CPU the amount of cores.
+    """
+    if isinstance(quantity, (int, float)):
+        return Decimal(str(quantity))
+
+    value = str(quantity).strip()
+    multiplier = Decimal(1)
+    for suffix, suffix_multiplier in QUANTITY_SUFFIXES:
+        if value.endswith(suffix):
+            value = value[: -len(suffix)]
+            multiplier = suffix_multiplier
+            break
+
+    try:
+        number = Decimal(value)
+    except InvalidOperation as e:
+        raise TjfCliUserError(f"Invalid resource quantity '{quantity}'") from e
+
+    if not number.is_finite():
+        raise TjfCliUserError(f"Invalid resource quantity '{quantity}'")
+
+    return number * multiplier
+
+
+def _format_number(number: Decimal) -> str:
+    text = f"{number.quantize(Decimal('0.01')):f}"
+    return text.rstrip("0").rstrip(".") if "." in text else text
+
+
+def format_memory(amount: Decimal) -> str:
+    """Formats an amount of bytes with the largest binary suffix it's at least one of."""
+    for suffix in ("Ti", "Gi", "Mi", "Ki"):
+        multiplier = dict(QUANTITY_SUFFIXES)[suffix]
+        if abs(amount) >= multiplier:
+            return f"{_format_number(amount / multiplier)}{suffix}"
+    return _format_number(amount)
+
+
+def format_cpu(amount: Decimal) -> str:
+    """Formats an amount of CPU cores."""
+    return _format_number(amount)
@@ -0,0 +1,206 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+The resources requested by jobs, and the tool quota they count against.
+
+Continuous jobs run all the time, so they are what mostly uses the quota of running CPU and
+memory. Cron and one-off jobs only use it while they run.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tjf_cli.errors import TjfCliUserError
+from tjf_cli.loader import config_job_type
+from tjf_cli.normalize import DEFAULT_CPU, DEFAULT_MEMORY
+from tjf_cli.quantity import format_cpu, format_memory, parse_quantity
+from tjf_cli.status import JobStatus
+
+# with usage samples: below this fraction of the request a job is over-provisioned, above the
+# other one under-provisioned
+OVERPROVISIONED_RATIO = Decimal("0.5")
+UNDERPROVISIONED_RATIO = Decimal("0.9")
+
+
+@dataclass
+class QuotaItem:
+    limit: Optional[Decimal] = None
+    used: Optional[Decimal] = None
+
+
+@dataclass
+class QuotaLimits:
+    running_memory: QuotaItem
+    running_cpu: QuotaItem
+    job_memory: QuotaItem
+    job_cpu: QuotaItem
+    cron_jobs: QuotaItem
+    continuous_jobs: QuotaItem
+
+
+def _find_item(data: Dict[str, Any], category: str, item: str) -> QuotaItem:
+    for quota_category in data.get("categories", []):
+        if category not in quota_category["name"].lower():
+            continue
+        for quota_item in quota_category["items"]:
+            if not quota_item["name"].lower().startswith(item):
+                continue
+            try:
+                return QuotaItem(
+                    limit=parse_quantity(quota_item["limit"]) if "limit" in quota_item else None,
+                    used=parse_quantity(quota_item["used"]) if "used" in quota_item else None,
+                )
+            except TjfCliUserError:
+                # for example, unlimited
+                return QuotaItem()
+    return QuotaItem()
+
+
+def parse_quota(data: Dict[str, Any]) -> QuotaLimits:
+    """Finds the limits relevant to job resources in the /quota/ API response."""
+    return QuotaLimits(
+        running_memory=_find_item(data, "running", "memory"),
+        running_cpu=_find_item(data, "running", "cpu"),
+        job_memory=_find_item(data, "per-job", "memory"),
+        job_cpu=_find_item(data, "per-job", "cpu"),
+        cron_jobs=_find_item(data, "definitions", "cron"),
+        continuous_jobs=_find_item(data, "definitions", "continuous"),
+    )
+
+
+@dataclass
+class JobResources:
+    name: str
+    type: str
+    memory: Decimal
+    cpu: Decimal
+
+
+def config_resources(job_config: Dict[str, Any]) -> JobResources:
+    """Returns the resources requested by a job, from its configuration."""
+    return JobResources(
+        name=job_config["name"],
+        type=config_job_type(job_config),
+        memory=parse_quantity(job_config.get("mem", None) or DEFAULT_MEMORY),
+        cpu=parse_quantity(job_config.get("cpu", None) or DEFAULT_CPU),
+    )
+
+
+def job_resources(api_obj: Dict[str, Any]) -> JobResources:
+    """Returns the resources requested by a job, from its API object."""
+    return config_resources(
+        {
+            "name": api_obj["name"],
+            "schedule": api_obj.get("schedule", None),
+            "continuous": api_obj.get("continuous", False),
+            "mem": api_obj.get("memory", None),
+            "cpu": api_obj.get("cpu", None),
+        }
+    )
+
+
+def provisioning_notes(
+    job: JobResources,
+    limits: QuotaLimits,
+    usage: Optional[Dict[str, Any]] = None,
+    status: Optional[JobStatus] = None,
+) -> List[str]:
+    """
+    Returns the problems found with the resources requested by a job. The usage, if known, is
+    a dict with the memory and/or cpu the job actually uses.
+    """
+    notes = []
+    oom_killed = status is not None and status.reason == "OOMKilled"
+    if oom_killed:
+        notes.append("under-provisioned memory (OOMKilled)")
+
+    for kind, requested, limit in (
+        ("memory", job.memory, limits.job_memory.limit),
+        ("cpu", job.cpu, limits.job_cpu.limit),
+    ):
+        if limit is not None and requested > limit:
+            notes.append(f"{kind} above the per-job limit")
+
+        if not usage or usage.get(kind, None) is None:
+            continue
+
+        used = parse_quantity(usage[kind])
+        if kind == "memory" and oom_killed:
+            continue
+        if used > requested * UNDERPROVISIONED_RATIO:
+            notes.append(f"under-provisioned {kind}")
+        elif used < requested * OVERPROVISIONED_RATIO:
+            notes.append(f"over-provisioned {kind}")
+
+    return notes
+
+
+def _total(jobs: List[JobResources], kind: str, job_type: Optional[str] = None) -> Decimal:
+    return sum(
+        (getattr(job, kind) for job in jobs if job_type is None or job.type == job_type),
+        Decimal(0),
+    )
+
+
+def quota_problems(
+    limits: QuotaLimits, added: List[JobResources], removed: List[JobResources]
+) -> Tuple[List[str], List[str]]:
+    """
+    Checks if the quota allows replacing the removed jobs with the added ones. Returns the
+    problems that will make the change fail, and the ones that might make jobs not start.
+    """
+    errors = []
+    warnings = []
+    resources: List[Tuple[str, QuotaItem, QuotaItem, Callable[[Decimal], str]]] = [
+        ("memory", limits.job_memory, limits.running_memory, format_memory),
+        ("cpu", limits.job_cpu, limits.running_cpu, format_cpu),
+    ]
+
+    for kind, per_job, running, fmt in resources:
+        for job in added:
+            requested = getattr(job, kind)
+            if per_job.limit is not None and requested > per_job.limit:
+                errors.append(
+                    f"job '{job.name}' requests {fmt(requested)} {kind}, "
+                    f"above the per-job limit of {fmt(per_job.limit)}"
+                )
+
+        if running.limit is None or running.used is None:
+            continue
+
+        continuous = (
+            running.used + _total(added, kind, "continuous") - _total(removed, kind, "continuous")
+        )
+        peak = continuous + _total(added, kind) - _total(added, kind, "continuous")
+        if continuous > running.limit:
+            errors.append(
+                f"continuous jobs would use {fmt(continuous)} {kind}, "
+                f"above the quota of {fmt(running.limit)}"
+            )
+        elif peak > running.limit:
+            warnings.append(
+                f"running all the new jobs at once needs {fmt(peak)} {kind}, "
+                f"above the quota of {fmt(running.limit)}"
+            )
+
+    for job_type, item, label in (
+        ("schedule", limits.cron_jobs, "cron jobs"),
+        ("continuous", limits.continuous_jobs, "continuous jobs"),
+    ):
+        if item.limit is None or item.used is None:
+            continue
+
+        count = (
+            item.used
+            + len([job for job in added if job.type == job_type])
+            - len([job for job in removed if job.type == job_type])
+        )
+        if count > item.limit:
+            errors.append(f"there would be {count} {label}, above the quota of {item.limit}")
+
+    return errors, warnings
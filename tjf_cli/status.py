@@ -0,0 +1,73 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Structured job status.
+
+The jobs API describes the state of a job with the `status_short` string and the free text
+`status_long` hint, like "Last run at 2022-10-08T09:28:37Z. Pod in 'Running' phase. State
+'running'. Started at '2022-10-08T09:28:39Z'.". parse_job_status() turns those into a JobStatus,
+preferring structured fields with the same names if the API object has them.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+HINT_PATTERNS = {
+    "last_run": re.compile(r"Last run at '?(?P<value>[^'\s]+?)'?\.?(?:\s|$)"),
+    "phase": re.compile(r"Pod in '(?P<value>[^']+)' phase"),
+    "container_state": re.compile(r"State '(?P<value>[^']+)'"),
+    "reason": re.compile(r"for reason '(?P<value>[^']+)'"),
+    "started_at": re.compile(r"Started at '(?P<value>[^']+)'"),
+    "restart_count": re.compile(
+        r"(?:Restarted '?(?P<value>\d+)'? times?|Restart count:? '?(?P<count>\d+)'?)"
+    ),
+}
+
+
+@dataclass
+class JobStatus:
+    status: str
+    phase: Optional[str] = None
+    container_state: Optional[str] = None
+    reason: Optional[str] = None
+    last_run: Optional[str] = None
+    started_at: Optional[str] = None
+    restart_count: Optional[int] = None
+
+    @property
+    def completed(self) -> bool:
+        return self.status == "Completed" or self.phase == "Succeeded"
+
+    @property
+    def failed(self) -> bool:
+        return self.status == "Failed" or self.phase == "Failed"
+
+    @property
+    def running(self) -> bool:
+        return self.status == "Running" or self.container_state == "running"
+
+
+def _from_hint(hint: str, field: str) -> Optional[str]:
+    match = HINT_PATTERNS[field].search(hint)
+    if not match:
+        return None
+    return next(value for value in match.groups() if value is not None)
+
+
+def parse_job_status(job: Dict[str, Any]) -> JobStatus:
+    """Returns the status of a job API object."""
+    hint = job.get("status_long", None) or ""
+    values: Dict[str, Any] = {}
+    for field in HINT_PATTERNS:
+        value = job.get(field, None)
+        values[field] = value if value is not None else _from_hint(hint, field)
+
+    if values["restart_count"] is not None:
+        values["restart_count"] = int(values["restart_count"])
+
+    return JobStatus(status=job.get("status_short", None) or "Unknown", **values)
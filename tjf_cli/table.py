@@ -0,0 +1,129 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Formatting of job data for display.
+
+The job list is rendered column by column: every cell is formatted once, the column widths are
+computed in the same pass, and the rows are then written out one by one. The output is the same
+as tabulate's "pretty" format, which is used as a fallback for cells this renderer can't measure
+(multi-line or non-ASCII text).
+"""
+
+import textwrap
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from tabulate import tabulate
+
+from tjf_cli.cron import format_time, next_runs
+from tjf_cli.errors import TjfCliUserError
+
+
+def _job_type(job: Dict[str, Any], suppress_hints: bool) -> str:
+    schedule = job.get("schedule", None)
+    if schedule is not None:
+        return f"schedule: {schedule}"
+    if job.get("continuous", None) is not None:
+        return "continuous"
+    return "normal"
+
+
+def _job_filelog(job: Dict[str, Any], suppress_hints: bool) -> str:
+    return "yes" if job.get("filelog", "false") == "True" else "no"
+
+
+def _job_retry(job: Dict[str, Any], suppress_hints: bool) -> str:
+    retry = job.get("retry")
+    return "no" if retry == 0 else f"yes: {retry} time(s)"
+
+
+def _job_resources(job: Dict[str, Any], suppress_hints: bool) -> str:
+    mem = job.get("memory", "default")
+    cpu = job.get("cpu", "default")
+    if mem == "default" and cpu == "default":
+        return "default"
+    return f"mem: {mem}, cpu: {cpu}"
+
+
+def _job_image(job: Dict[str, Any], suppress_hints: bool) -> Any:
+    if job["image_state"] != "stable":
+        return "{} ({})".format(job["image"], job["image_state"])
+    return job.get("image", "Unknown")
+
+
+def _job_status_long(job: Dict[str, Any], suppress_hints: bool) -> Optional[str]:
+    if suppress_hints:
+        return None
+    return textwrap.fill(job.get("status_long", "Unknown"))
+
+
+def _job_next_run(job: Dict[str, Any], suppress_hints: bool) -> str:
+    schedule = job.get("schedule", None)
+    if not schedule:
+        return ""
+    try:
+        runs = next_runs(schedule, 1)
+    except TjfCliUserError:
+        return "Unknown"
+    return format_time(runs[0]) if runs else "never"
+
+
+JOB_FIELD_FORMATTERS: Dict[str, Callable[[Dict[str, Any], bool], Any]] = {
+    "type": _job_type,
+    "filelog": _job_filelog,
+    "retry": _job_retry,
+    "resources": _job_resources,
+    "image": _job_image,
+    "status_long": _job_status_long,
+    "next_run": _job_next_run,
+}
+
+
+def format_job_field(job: Dict[str, Any], key: str, suppress_hints: bool = True) -> Any:
+    """Returns the value to display for the given field of a job API object."""
+    formatter = JOB_FIELD_FORMATTERS.get(key, None)
+    if formatter is not None:
+        return formatter(job, suppress_hints)
+    return job.get(key, "Unknown")
+
+
+def _cell(value: Any) -> str:
+    # same as tabulate: missing values are empty, and surrounding whitespace is not kept
+    return "" if value is None else str(value).strip()
+
+
+def job_table_columns(jobs: List[Dict[str, Any]], keys: List[str]) -> List[List[str]]:
+    """Formats the given fields of all jobs, one list of cells per field."""
+    return [[_cell(format_job_field(job, key)) for job in jobs] for key in keys]
+
+
+def _is_simple(text: str) -> bool:
+    return text.isascii() and "\n" not in text
+
+
+def write_pretty_table(headers: List[str], columns: List[List[str]], stream: TextIO) -> None:
+    """Writes a table in the same format as tabulate(tablefmt="pretty"), row by row."""
+    if not all(_is_simple(cell) for column in [headers, *columns] for cell in column):
+        rows = [list(row) for row in zip(*columns)]
+        print(tabulate(rows, headers=headers, tablefmt="pretty"), file=stream)
+        return
+
+    widths = [
+        max(len(header), max((len(cell) for cell in column), default=0)) + 2
+        for header, column in zip(headers, columns)
+    ]
+    formats = ["{:^%d}" % width for width in widths]
+    separator = "+" + "+".join("-" * width for width in widths) + "+\n"
+
+    def line(cells) -> str:
+        return "|" + "|".join(fmt.format(cell) for fmt, cell in zip(formats, cells)) + "|\n"
+
+    stream.write(separator)
+    stream.write(line(headers))
+    stream.write(separator)
+    for row in zip(*columns):
+        stream.write(line(row))
+    stream.write(separator)
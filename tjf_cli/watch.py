@@ -0,0 +1,80 @@
+# (C) 2024 Wikimedia Foundation, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+"""
+Waiting for changes to the jobs file, for `load --watch`.
+
+Changes are detected by comparing the modification time, size and inode of the files. With the
+inotify_simple module installed, inotify wakes the watcher up as soon as one of their directories
+changes, otherwise they are checked every few seconds.
+"""
+
+import os
+import time
+from logging import getLogger
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LOGGER = getLogger(__name__)
+
+FileSignature = Dict[str, Optional[Tuple[int, int, int]]]
+
+
+def file_signature(paths: Iterable[str]) -> FileSignature:
+    """Returns what identifies the current version of each file, None if it doesn't exist."""
+    signature: FileSignature = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature[path] = None
+        else:
+            signature[path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    return signature
+
+
+class FileWatcher:
+    def __init__(self, use_inotify: bool = True) -> None:
+        self._inotify = None
+        self._directories: List[str] = []
+        self._use_inotify = use_inotify
+
+    def _watch(self, directories: List[str]) -> None:
+        if not self._use_inotify or directories == self._directories:
+            return
+
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            LOGGER.debug("inotify_simple is not installed, polling the jobs file for changes")
+            self._use_inotify = False
+            return
+
+        self.close()
+        self._inotify = INotify()
+        # editors often write a new file and rename it over the old one
+        mask = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.DELETE | flags.MODIFY
+        for directory in directories:
+            try:
+                self._inotify.add_watch(directory, mask)
+            except OSError as e:
+                LOGGER.debug(f"unable to watch '{directory}', polling it: {e}")
+        self._directories = directories
+
+    def wait(self, paths: Iterable[str], timeout: float) -> None:
+        """Waits until one of the directories of the paths changes, or for the timeout."""
+        self._watch(sorted({os.path.dirname(os.path.abspath(path)) for path in paths}))
+        if self._inotify is None:
+            time.sleep(timeout)
+            return
+
+        events = self._inotify.read(timeout=int(timeout * 1000))
+        LOGGER.debug(f"{len(events)} change(s) in the watched directories")
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            self._directories = []
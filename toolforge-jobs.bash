@@ -15,7 +15,7 @@ _toolforge_jobs() {
 			if [[ $cur == -* ]]; then
 				COMPREPLY=($(compgen -W "--help" -- ${cur}))
 			else
-				COMPREPLY=($(compgen -W "images run show logs list delete flush load restart quota" -- ${cur}))
+				COMPREPLY=($(compgen -W "images run show logs list delete flush load check history rollback restart quota dump export-metrics resources schedule-report events" -- ${cur}))
 			fi
 			;;
 		**)
@@ -51,7 +51,7 @@ _toolforge_jobs() {
 							COMPREPLY=()
 							;;
 						**)
-							local options="--command --image --no-filelog -o --filelog-stdout -e --filelog-stderr --retry --mem --cpu --emails --schedule --continuous --wait"
+							local options="--command --image --no-filelog -o --filelog-stdout -e --filelog-stderr --retry --mem --cpu --emails --schedule --continuous --wait --no-quota-check"
 							local i=$((subcmd_index + 1))
 							while ((i<COMP_CWORD)); do
 								if [[ "${COMP_WORDS[i]}" == "--command" ]]; then
@@ -94,19 +94,49 @@ _toolforge_jobs() {
 						esac
 					;;
 				show)
-					if [ "$cur_index" = "2" ]; then
-						COMPREPLY=($(compgen -W "$(toolforge jobs list -o name)" -- ${cur}))
+					case "$prev" in
+						--next)
+							COMPREPLY=()
+							;;
+						**)
+							if [[ $cur == -* ]]; then
+								COMPREPLY=($(compgen -W "--json --next" -- ${cur}))
+							else
+								COMPREPLY=($(compgen -W "$(toolforge jobs list -o name)" -- ${cur}))
+							fi
+							;;
+					esac
+					;;
+				resources)
+					case "$prev" in
+						--usage)
+							COMPREPLY=($(compgen -A file -- ${cur}))
+							;;
+						**)
+							COMPREPLY=($(compgen -W "--usage" -- ${cur}))
+							;;
+					esac
+					;;
+				schedule-report)
+					if [[ $cur == -* ]]; then
+						COMPREPLY=($(compgen -W "--hours" -- ${cur}))
 					else
 						COMPREPLY=()
 					fi
 					;;
 				logs)
 					case "$prev" in
-						-l|--last)
+						-l|--last|--grep|--since|--until|--pod|--max-matches|--rotate-size|--rotate-interval|--keep)
 							COMPREPLY=()
 							;;
+						--output-file)
+							COMPREPLY=($(compgen -A file -- ${cur}))
+							;;
+						--compress)
+							COMPREPLY=($(compgen -W "gzip zstd none" -- ${cur}))
+							;;
 						**)
-							local options="-f --follow -l --last"
+							local options="-f --follow -l --last --grep --since --until --pod --max-matches --output-file --compress --rotate-size --rotate-interval --keep"
 							local i=$((subcmd_index + 1))
 
 							local last_was_arg_with_param=0
@@ -120,6 +150,9 @@ _toolforge_jobs() {
 									last_was_arg_with_param=1
 									options="${options/-l/}"
 									options="${options/--last/}"
+								elif [[ "${COMP_WORDS[i]}" == --grep || "${COMP_WORDS[i]}" == --since || "${COMP_WORDS[i]}" == --until || "${COMP_WORDS[i]}" == --pod || "${COMP_WORDS[i]}" == --max-matches || "${COMP_WORDS[i]}" == --output-file || "${COMP_WORDS[i]}" == --compress || "${COMP_WORDS[i]}" == --rotate-* || "${COMP_WORDS[i]}" == --keep ]]; then
+									last_was_arg_with_param=1
+									options="${options/${COMP_WORDS[i]}/}"
 								elif [[ "$last_was_arg_with_param" == "0" ]]; then
 									had_job_name=1
 								fi
@@ -141,13 +174,16 @@ _toolforge_jobs() {
 							COMPREPLY=($(compgen -W "normal long name" -- ${cur}))
 							;;
 						**)
-							local options="-o --output"
+							local options="-o --output --next-run"
 							local i=$((subcmd_index + 1))
 							while ((i<COMP_CWORD)); do
 								if [[ "${COMP_WORDS[i]}" == "-o" || "${COMP_WORDS[i]}" == "--output" ]]; then
-									options="${options/-o/}"
+									options="${options/-o /}"
 									options="${options/--output/}"
 								fi
+								if [[ "${COMP_WORDS[i]}" == "--next-run" ]]; then
+									options="${options/--next-run/}"
+								fi
 
 								((++i))
 							done
@@ -157,32 +193,118 @@ _toolforge_jobs() {
 						esac
 					;;
 				delete)
-					if [ "$cur_index" = "2" ]; then
-						COMPREPLY=($(compgen -W "$(toolforge jobs list -o name)" -- ${cur}))
-					else
-						COMPREPLY=()
-					fi
+					case "$prev" in
+						--selector)
+							COMPREPLY=()
+							;;
+						--type)
+							COMPREPLY=($(compgen -W "normal schedule continuous" -- ${cur}))
+							;;
+						**)
+							if [[ $cur == -* ]]; then
+								COMPREPLY=($(compgen -W "--selector --type --wait" -- ${cur}))
+							else
+								COMPREPLY=($(compgen -W "$(toolforge jobs list -o name)" -- ${cur}))
+							fi
+							;;
+					esac
 					;;
 				flush)
 					COMPREPLY=()
 					;;
 				load)
-					if [ "$cur_index" = "2" ]; then
+					case "$prev" in
+						--job|--selector|--resync-interval)
+							COMPREPLY=()
+							;;
+						**)
+							if [[ $cur == -* ]]; then
+								COMPREPLY=($(compgen -W "--job --selector --transactional --spread-schedules --no-quota-check --watch --resync-interval" -- ${cur}))
+							else
+								COMPREPLY=($(compgen -A file -- ${cur}))
+							fi
+							;;
+					esac
+					;;
+				restart)
+					case "$prev" in
+						--selector)
+							COMPREPLY=()
+							;;
+						--type)
+							COMPREPLY=($(compgen -W "normal schedule continuous" -- ${cur}))
+							;;
+						**)
+							if [[ $cur == -* ]]; then
+								COMPREPLY=($(compgen -W "--selector --type --wait" -- ${cur}))
+							else
+								COMPREPLY=($(compgen -W "$(toolforge jobs list -o name)" -- ${cur}))
+							fi
+							;;
+					esac
+					;;
+				quota)
+					COMPREPLY=()
+					;;
+				export-metrics)
+					case "$prev" in
+						--interval)
+							COMPREPLY=()
+							;;
+						**)
+							if [[ $cur == -* ]]; then
+								COMPREPLY=($(compgen -W "--interval" -- ${cur}))
+							else
+								COMPREPLY=($(compgen -A file -- ${cur}))
+							fi
+							;;
+					esac
+					;;
+				check)
+					if [[ $cur == -* ]]; then
+						COMPREPLY=($(compgen -W "--spread-schedules" -- ${cur}))
+					else
 						COMPREPLY=($(compgen -A file -- ${cur}))
+					fi
+					;;
+				history)
+					case "$prev" in
+						--limit)
+							COMPREPLY=()
+							;;
+						**)
+							COMPREPLY=($(compgen -W "--limit" -- ${cur}))
+							;;
+					esac
+					;;
+				rollback)
+					if [[ $cur == -* ]]; then
+						COMPREPLY=($(compgen -W "--dry-run" -- ${cur}))
 					else
 						COMPREPLY=()
 					fi
 					;;
-				restart)
+				events)
+					case "$prev" in
+						--interval)
+							COMPREPLY=()
+							;;
+						**)
+							if [[ $cur == -* ]]; then
+								COMPREPLY=($(compgen -W "--follow --interval --json" -- ${cur}))
+							else
+								COMPREPLY=($(compgen -W "$(toolforge jobs list -o name)" -- ${cur}))
+							fi
+							;;
+					esac
+					;;
+				dump)
 					if [ "$cur_index" = "2" ]; then
-						COMPREPLY=($(compgen -W "$(toolforge jobs list -o name)" -- ${cur}))
+						COMPREPLY=($(compgen -A file -- ${cur}))
 					else
 						COMPREPLY=()
 					fi
 					;;
-				quota)
-					COMPREPLY=()
-					;;
 				**)
 					COMPREPLY=()
 					;;